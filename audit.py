@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user TEXT NOT NULL,
+    command TEXT NOT NULL,
+    result TEXT NOT NULL,
+    response TEXT,
+    duration_ms REAL
+);
+CREATE INDEX IF NOT EXISTS commands_user ON commands (user, id);
+CREATE INDEX IF NOT EXISTS commands_ts ON commands (ts);
+"""
+COLUMNS = ("id", "ts", "user", "command", "result", "response", "duration_ms")
+
+AuditRow = Tuple[int, float, str, str, str, Optional[str], Optional[float]]
+
+
+def row_to_entry(row: AuditRow) -> Dict[str, Any]:
+    entry = dict(zip(COLUMNS, row))
+    entry["timestamp"] = datetime.fromtimestamp(entry.pop("ts")).isoformat()
+    return entry
+
+
+class AuditLog:
+    """Command history: a deque of the newest entries plus an append-only SQLite journal.
+
+    Appending is O(1) and never touches the disk; pending rows are committed
+    in batches by a background task. The journal runs in WAL mode so queries
+    don't block the writer.
+    """
+
+    def __init__(self, path: str, recent_size: int = 1000):
+        self.path = path
+        self.recent: Deque[AuditRow] = deque(maxlen=recent_size)
+        self._pending: List[AuditRow] = []
+        self._lock = threading.Lock()
+        self._job: Optional[PeriodicJob] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        rows = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM commands ORDER BY id DESC LIMIT ?",
+                                (recent_size,)).fetchall()
+        self.recent.extend(reversed(rows))
+        self._next_id = rows[0][0] + 1 if rows else 1
+
+    def record(self, user: str, command: str, result: str = "success", response: Optional[str] = None,
+               duration: Optional[float] = None) -> int:
+        """Append an entry (duration in seconds) and return its id."""
+        row = (self._next_id, time.time(), user, command, result, response,
+               round(duration * 1000, 2) if duration is not None else None)
+        self._next_id += 1
+        self.recent.append(row)
+        self._pending.append(row)
+        return row[0]
+
+    def flush(self):
+        """Commit pending entries in one transaction (runs in a thread)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            with self._db:
+                self._db.executemany(f"INSERT OR IGNORE INTO commands VALUES ({', '.join('?' * len(COLUMNS))})",
+                                     pending)
+
+    async def query(self, user: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None,
+                    before: Optional[int] = None, limit: int = 10) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Return up to `limit` matching entries oldest first, and the cursor for the page before them.
+
+        The newest entries come from memory; older pages and filtered
+        queries use the indexed journal in a worker thread.
+        """
+        if user is None and start is None and end is None:
+            rows = [row for row in self.recent if before is None or row[0] < before][-limit:]
+            if len(rows) == limit or len(self.recent) < self.recent.maxlen:
+                return self._page(rows, limit)
+
+        rows = await asyncio.to_thread(self._select, user, start, end, before, limit)
+        return self._page(rows, limit)
+
+    def _select(self, user: Optional[str], start: Optional[float], end: Optional[float],
+                before: Optional[int], limit: int) -> List[AuditRow]:
+        self.flush()
+        where, params = [], []
+        for clause, value in (("id < ?", before), ("user = ?", user), ("ts >= ?", start), ("ts <= ?", end)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM commands"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return list(reversed(rows))
+
+    @staticmethod
+    def _page(rows: List[AuditRow], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        # A short page means there is nothing older left
+        return [row_to_entry(row) for row in rows], rows[0][0] if rows and len(rows) == limit else None
+
+    def start(self, scheduler: PeriodicScheduler, flush_interval: float = 1.0):
+        if self._job is None:
+            self._job = scheduler.add(f"command journal {self.path}", flush_interval, self._flush,
+                                      delay=flush_interval)
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush(self):
+        await asyncio.to_thread(self.flush)
@@ -0,0 +1,137 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from fastapi import Request
+
+import perf
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Ordered from least to most privileged; each role includes the ones before it
+ROLES = ["viewer", "operator", "admin"]
+ROLE_LEVELS = {role: level for level, role in enumerate(ROLES, start=1)}
+# Environment variables listing the members of each role
+ROLE_ENV = {"viewer": "VIEWER_USERS", "operator": "AUTHORIZED_USERS", "admin": "ADMIN_USERS"}
+
+UNAUTHENTICATED = {"status": "Необходима авторизация"}
+FORBIDDEN = {"status": "Доступ запрещен"}
+
+
+class ApiError(Exception):
+    """Raised by route dependencies; rendered as a JSON response with the given status code."""
+
+    def __init__(self, status_code: int, content: Dict[str, Any]):
+        super().__init__(content)
+        self.status_code = status_code
+        self.content = content
+
+
+class AuthError(ApiError):
+    """Raised by the auth dependencies."""
+
+
+def parse_emails(value: str) -> FrozenSet[str]:
+    return frozenset(email.strip().lower() for email in value.split(",") if email.strip())
+
+
+class AccessControl:
+    """Role membership computed once from the environment and an optional JSON file.
+
+    The file maps role names to lists of emails, e.g. {"viewer": ["a@b.c"]},
+    and is merged with the environment variables. It is reloaded in the
+    background when it changes, so requests only do set lookups.
+    """
+
+    def __init__(self, config_file: Optional[str] = None, poll_interval: float = 2.0):
+        self.config_file = config_file
+        self.poll_interval = poll_interval
+        self.members: Dict[str, FrozenSet[str]] = {role: frozenset() for role in ROLES}
+        # With nobody configured every signed-in user is an operator, as before roles existed
+        self.open_access = True
+        self._file_state: Optional[Tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.load()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.config_file)
+        except (OSError, TypeError):
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def load(self):
+        """Rebuild the role sets; a broken config file keeps the previous sets."""
+        members = {role: parse_emails(os.getenv(ROLE_ENV[role], "")) for role in ROLES}
+        file_state = self._stat()
+        if file_state is not None:
+            try:
+                with open(self.config_file, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+                for role in ROLES:
+                    members[role] |= frozenset(email.strip().lower() for email in config.get(role, []))
+            except (OSError, ValueError, AttributeError, TypeError) as e:
+                logger.error(f"Error loading access config {self.config_file}: {str(e)}")
+                self._file_state = file_state  # don't retry until the file changes again
+                return
+        self._file_state = file_state
+        self.members = members
+        # Any configured member of any role, admins included, closes the API to everyone else
+        self.open_access = not any(members.values())
+        logger.info("Access control loaded: " + ", ".join(f"{len(members[role])} {role}" for role in ROLES))
+
+    def role_of(self, email: str) -> Optional[str]:
+        """Return the highest role of the user, or None if they have no access."""
+        email = email.lower()
+        for role in reversed(ROLES):
+            if email in self.members[role]:
+                return role
+        return "operator" if self.open_access else None
+
+    def resolve(self, request: Request) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return (session user, role), computed at most once per request."""
+        cached = getattr(request.state, "auth", None)
+        if cached is not None:
+            return cached
+        with perf.span("auth"):
+            user = request.session.get("user")
+            result = (user, self.role_of(user["email"]) if user else None)
+        request.state.auth = result
+        return result
+
+    def require(self, role: str, unauthenticated: Dict[str, Any] = UNAUTHENTICATED) -> Callable:
+        """Build a dependency returning the session user if they have at least `role`."""
+        level = ROLE_LEVELS[role]
+
+        async def dependency(request: Request) -> Dict[str, Any]:
+            user, user_role = self.resolve(request)
+            if not user:
+                raise AuthError(401, unauthenticated)
+            if user_role is None or ROLE_LEVELS[user_role] < level:
+                raise AuthError(403, FORBIDDEN)
+            return user
+
+        return dependency
+
+    # ----- Hot reload -----
+    def start(self):
+        if self._task is None and self.config_file:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._stat() != self._file_state:
+                logger.info(f"Access config {self.config_file} changed, reloading")
+                self.load()
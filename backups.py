@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import hashlib
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from region import CHUNK_PREFIX_BYTES, HEADER_BYTES, SECTOR_BYTES, chunk_locations, world_names
+
+logger = logging.getLogger("minecraft-server-api")
+
+READ_BLOCK_BYTES = 1024 * 1024
+FILE_COMPRESSION_LEVEL = 6
+# Chunk data is already zlib-compressed by the server, so it only gets a cheap pass
+CHUNK_COMPRESSION_LEVEL = 1
+# Held by the running server and meaningless in a copy
+SKIPPED_FILES = {"session.lock"}
+
+FileEntry = Dict[str, Any]
+
+
+class BackupError(Exception):
+    """A backup operation could not be started or completed."""
+
+
+# ----- Content-addressed object store (these run in worker processes) -----
+def object_path(store_dir: str, digest: str) -> str:
+    return os.path.join(store_dir, "objects", digest[:2], digest)
+
+
+def _commit_object(store_dir: str, digest: str, tmp_path: str) -> int:
+    """Move a written temporary object into place; returns the bytes added to the store."""
+    path = object_path(store_dir, digest)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return 0
+    size = os.path.getsize(tmp_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)  # atomic, another worker storing the same object wins harmlessly
+    return size
+
+
+def _tmp_path(store_dir: str) -> str:
+    tmp_dir = os.path.join(store_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, f"{os.getpid()}-{time.monotonic_ns()}")
+
+
+def put_bytes(store_dir: str, data: bytes, level: int) -> Tuple[str, int]:
+    """Store a small object unless it's already there; returns (digest, bytes added)."""
+    digest = hashlib.sha256(data).hexdigest()
+    if os.path.exists(object_path(store_dir, digest)):
+        return digest, 0
+    tmp_path = _tmp_path(store_dir)
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(data, level))
+    return digest, _commit_object(store_dir, digest, tmp_path)
+
+
+def put_file(store_dir: str, path: str) -> Tuple[str, int]:
+    """Stream a file into the store, hashing and compressing it block by block."""
+    hasher = hashlib.sha256()
+    compressor = zlib.compressobj(FILE_COMPRESSION_LEVEL)
+    tmp_path = _tmp_path(store_dir)
+    with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+        for block in iter(lambda: src.read(READ_BLOCK_BYTES), b""):
+            hasher.update(block)
+            dst.write(compressor.compress(block))
+        dst.write(compressor.flush())
+    digest = hasher.hexdigest()
+    return digest, _commit_object(store_dir, digest, tmp_path)
+
+
+def read_object(store_dir: str, digest: str) -> bytes:
+    with open(object_path(store_dir, digest), "rb") as f:
+        return zlib.decompress(f.read())
+
+
+def copy_object(store_dir: str, digest: str, dst) -> None:
+    decompressor = zlib.decompressobj()
+    with open(object_path(store_dir, digest), "rb") as src:
+        for block in iter(lambda: src.read(READ_BLOCK_BYTES), b""):
+            dst.write(decompressor.decompress(block))
+    dst.write(decompressor.flush())
+
+
+def snapshot_file(store_dir: str, root: str, rel_path: str) -> Tuple[FileEntry, int]:
+    """Store one world file; region files are split into their header and individual chunks.
+
+    Most chunks of a region don't change between backups, so storing them
+    separately means only the chunks that were saved since take new space.
+    """
+    path = os.path.join(root, rel_path)
+    stat = os.stat(path)
+    entry: FileEntry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if not rel_path.endswith(".mca") or stat.st_size < HEADER_BYTES:
+        entry["object"], added = put_file(store_dir, path)
+        return entry, added
+
+    with open(path, "rb") as f:
+        data = f.read()
+    header = data[:HEADER_BYTES]
+    entry["header"], added = put_bytes(store_dir, header, FILE_COMPRESSION_LEVEL)
+    chunks = []
+    for index, offset, count in chunk_locations(header):
+        start = offset * SECTOR_BYTES
+        if start + CHUNK_PREFIX_BYTES > len(data):
+            continue  # points past the end of a truncated file
+        length = int.from_bytes(data[start:start + 4], "big")
+        chunk = data[start:start + min(4 + length, count * SECTOR_BYTES)]
+        digest, chunk_added = put_bytes(store_dir, chunk, CHUNK_COMPRESSION_LEVEL)
+        chunks.append([index, digest])
+        added += chunk_added
+    entry["chunks"] = chunks
+    return entry, added
+
+
+def restore_file(store_dir: str, entry: FileEntry, path: str):
+    """Write a file from its snapshot entry. Unused sectors of a region come back zeroed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        if "object" in entry:
+            copy_object(store_dir, entry["object"], f)
+        else:
+            header = read_object(store_dir, entry["header"])
+            f.write(header)
+            offsets = {index: offset for index, offset, _ in chunk_locations(header)}
+            for index, digest in entry["chunks"]:
+                f.seek(offsets[index] * SECTOR_BYTES)
+                f.write(read_object(store_dir, digest))
+            f.truncate(entry["size"])
+    os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+
+def referenced_objects(entries: List[FileEntry]) -> Set[str]:
+    objects = set()
+    for entry in entries:
+        if "object" in entry:
+            objects.add(entry["object"])
+        else:
+            objects.add(entry["header"])
+            objects.update(digest for _, digest in entry["chunks"])
+    return objects
+
+
+# ----- Snapshots -----
+def backup_summary(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in manifest.items() if key != "files"}
+
+
+class WorldBackups:
+    """Incremental, deduplicated snapshots of a server's world directories.
+
+    A snapshot is a JSON manifest mapping every world file to objects in a
+    content-addressed store (objects/<sha256>), so unchanged files and
+    region chunks are shared by all snapshots. Files whose size and mtime
+    match the previous snapshot aren't even read again. Hashing and
+    compression run in a process pool; while a running server's world is
+    being copied, automatic saving is turned off (save-off / save-all flush
+    / save-on), which doesn't pause the game itself.
+    """
+
+    def __init__(self, server_dir: str, backup_dir: str, command: Callable[[str], Awaitable[str]],
+                 is_running: Callable[[], bool], workers: int = 2, keep: int = 10):
+        self.server_dir = server_dir
+        self.backup_dir = backup_dir
+        self.command = command
+        self.is_running = is_running
+        self.workers = workers
+        self.keep = keep
+        self.snapshot_dir = os.path.join(backup_dir, "snapshots")
+        # The backup or restore in progress, if any
+        self.current: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def stop(self):
+        if self._task is not None:
+            # Let a backup finish its manifest and turn saving back on rather than cutting it off
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ----- Manifests -----
+    def _manifest_path(self, backup_id: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{backup_id}.json")
+
+    def _backup_ids(self) -> List[str]:
+        """Ids of the complete snapshots, oldest first (ids sort by time)."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.snapshot_dir) if name.endswith(".json"))
+
+    def _load(self, backup_id: str) -> Dict[str, Any]:
+        with open(self._manifest_path(backup_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, manifest: Dict[str, Any]):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._manifest_path(manifest["id"])
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of all snapshots, newest first, after the operation in progress."""
+        backups = []
+        for backup_id in reversed(self._backup_ids()):
+            try:
+                backups.append(backup_summary(self._load(backup_id)))
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable backup manifest {backup_id}: {str(e)}")
+        return ([dict(self.current)] if self.current is not None else []) + backups
+
+    # ----- Operations -----
+    def _check_idle(self):
+        if self._task is not None and not self._task.done():
+            # A finished backup still prunes old snapshots after clearing `current`
+            operation = self.current["operation"] if self.current is not None else "prune"
+            raise BackupError(f"Уже выполняется операция: {operation}")
+
+    def _begin(self, operation: Dict[str, Any]):
+        self._check_idle()
+        self.current = operation
+
+    def create(self) -> Dict[str, Any]:
+        """Start a snapshot in the background and return its summary."""
+        backup_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if os.path.exists(self._manifest_path(backup_id)):
+            raise BackupError("Резервная копия уже создаётся")
+        self._begin({"operation": "backup", "id": backup_id, "status": "running", "created": time.time()})
+        self._task = asyncio.create_task(self._run_backup(backup_id))
+        return dict(self.current)
+
+    async def _run_backup(self, backup_id: str):
+        started = time.monotonic()
+        paused = False
+        try:
+            if self.is_running():
+                # Keep the server from writing region files while they are read; the world is
+                # consistent on disk once the flush returns
+                await self.command("save-off")
+                paused = True
+                await self.command("save-all flush")
+            manifest = await self._snapshot(backup_id)
+        except Exception as e:
+            logger.error(f"Backup {backup_id} failed: {str(e)}")
+            self.current = {**self.current, "status": "failed", "error": str(e)}
+            return
+        finally:
+            if paused:
+                try:
+                    await self.command("save-on")
+                except Exception as e:
+                    logger.error(f"Could not turn saving back on after backup {backup_id}: {str(e)}")
+
+        manifest["seconds"] = round(time.monotonic() - started, 3)
+        await asyncio.to_thread(self._save, manifest)
+        self.current = None
+        logger.info(f"Backup {backup_id}: {manifest['files_changed']} of {manifest['file_count']} files changed, "
+                    f"{manifest['bytes_added']} bytes added in {manifest['seconds']}s")
+        try:
+            await asyncio.to_thread(self._prune, self.keep)
+        except Exception as e:
+            logger.error(f"Error pruning backups: {str(e)}")
+
+    async def _snapshot(self, backup_id: str) -> Dict[str, Any]:
+        worlds = world_names(self.server_dir)
+        if not worlds:
+            raise BackupError("Папка мира не найдена")
+        previous = await asyncio.to_thread(self._latest_files)
+        paths = await asyncio.to_thread(self._world_files, worlds)
+
+        files: Dict[str, FileEntry] = {}
+        changed = []
+        for rel_path, size, mtime_ns in paths:
+            old = previous.get(rel_path)
+            if old is not None and (old["size"], old["mtime_ns"]) == (size, mtime_ns):
+                files[rel_path] = old
+            else:
+                changed.append(rel_path)
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, snapshot_file, self.backup_dir, self.server_dir, rel_path)
+            for rel_path in changed
+        ))
+        for rel_path, (entry, _) in zip(changed, results):
+            files[rel_path] = entry
+
+        return {
+            "id": backup_id,
+            "status": "complete",
+            "created": self.current["created"],
+            "worlds": worlds,
+            "file_count": len(files),
+            "files_changed": len(changed),
+            "size": sum(entry["size"] for entry in files.values()),
+            "bytes_added": sum(added for _, added in results),
+            "files": files,
+        }
+
+    def _latest_files(self) -> Dict[str, FileEntry]:
+        ids = self._backup_ids()
+        return self._load(ids[-1])["files"] if ids else {}
+
+    def _world_files(self, worlds: List[str]) -> List[Tuple[str, int, int]]:
+        paths = []
+        for world in worlds:
+            for root, _, names in os.walk(os.path.join(self.server_dir, world)):
+                for name in names:
+                    if name in SKIPPED_FILES:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    paths.append((os.path.relpath(path, self.server_dir), stat.st_size, stat.st_mtime_ns))
+        return paths
+
+    async def restore(self, backup_id: str):
+        """Replace the world directories with a snapshot; the server must be stopped.
+
+        The current worlds are kept next to them as <name>.pre-restore until
+        the next restore.
+        """
+        if self.is_running():
+            raise BackupError("Остановите сервер перед восстановлением резервной копии")
+        if backup_id not in self._backup_ids():
+            raise BackupError(f"Резервная копия не найдена: {backup_id}")
+        self._begin({"operation": "restore", "id": backup_id, "status": "running", "created": time.time()})
+        # Its own task, so a dropped request can't leave the worlds half swapped
+        self._task = asyncio.create_task(self._run_restore(backup_id))
+        await asyncio.shield(self._task)
+
+    async def _run_restore(self, backup_id: str):
+        try:
+            manifest = await asyncio.to_thread(self._load, backup_id)
+            staging = os.path.join(self.server_dir, f".restore-{backup_id}")
+            await asyncio.to_thread(shutil.rmtree, staging, True)
+
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._executor, restore_file, self.backup_dir, entry,
+                                     os.path.join(staging, rel_path))
+                for rel_path, entry in manifest["files"].items()
+            ))
+            await asyncio.to_thread(self._swap_worlds, staging, manifest["worlds"])
+            logger.info(f"Restored backup {backup_id}")
+        finally:
+            self.current = None
+            self._task = None
+
+    def _swap_worlds(self, staging: str, worlds: List[str]):
+        for world in worlds:
+            path = os.path.join(self.server_dir, world)
+            kept = f"{path}.pre-restore"
+            if os.path.exists(path):
+                shutil.rmtree(kept, ignore_errors=True)
+                os.replace(path, kept)
+            restored = os.path.join(staging, world)
+            if os.path.isdir(restored):
+                os.replace(restored, path)
+            else:
+                os.makedirs(path)  # the world was empty when the snapshot was taken
+        shutil.rmtree(staging, ignore_errors=True)
+
+    async def prune(self, keep: int) -> List[str]:
+        """Delete all but the `keep` newest snapshots, then the objects no snapshot uses anymore."""
+        if keep < 1:
+            raise BackupError("Нужно оставить хотя бы одну резервную копию")
+        # A running backup adds objects that no manifest lists yet
+        self._check_idle()
+        return await asyncio.to_thread(self._prune, keep)
+
+    def _prune(self, keep: int) -> List[str]:
+        ids = self._backup_ids()
+        removed = ids[:-keep]
+        for backup_id in removed:
+            os.remove(self._manifest_path(backup_id))
+
+        # Mark and sweep the objects, and drop temporary files left by an interrupted backup
+        referenced = set()
+        for backup_id in ids[-keep:]:
+            referenced |= referenced_objects(list(self._load(backup_id)["files"].values()))
+        freed = 0
+        for root, _, names in os.walk(os.path.join(self.backup_dir, "objects")):
+            for name in names:
+                if name not in referenced:
+                    path = os.path.join(root, name)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        shutil.rmtree(os.path.join(self.backup_dir, "tmp"), ignore_errors=True)
+        if removed:
+            logger.info(f"Pruned backups {', '.join(removed)}, freed {freed} bytes")
+        return removed
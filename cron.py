@@ -0,0 +1,109 @@
+"""Five-field cron expressions (minute hour day-of-month month day-of-week) in local time.
+
+Fields accept *, numbers, ranges (1-5), steps (*/15, 0-30/10), lists (1,15)
+and month/day names (jan, mon). Day 0 and 7 are Sunday. As in Vixie cron,
+when both day fields are restricted a day matching either one is enough.
+The macros @hourly, @daily/@midnight, @weekly, @monthly and @yearly are
+understood too.
+"""
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Tuple
+
+MACROS = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+}
+MONTH_NAMES = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+DAY_NAMES = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+# (name, lowest, highest, names for lowest..)
+FIELDS: List[Tuple[str, int, int, List[str]]] = [
+    ("minute", 0, 59, []),
+    ("hour", 0, 23, []),
+    ("day of month", 1, 31, []),
+    ("month", 1, 12, MONTH_NAMES),
+    ("day of week", 0, 7, DAY_NAMES),
+]
+# Long enough to reach the next February 29th
+SEARCH_DAYS = 366 * 8
+
+
+def _value(text: str, low: int, high: int, names: List[str]) -> int:
+    text = text.lower()
+    if text in names:
+        return names.index(text) + low
+    if not text.isdigit() or not low <= int(text) <= high:
+        raise ValueError(f"{text!r} is not between {low} and {high}")
+    return int(text)
+
+
+def parse_field(text: str, name: str, low: int, high: int, names: List[str]) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        spec, _, step_text = part.partition("/")
+        step = 1
+        if step_text:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"Invalid step in {name}: {part!r}")
+            step = int(step_text)
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            first, _, last = spec.partition("-")
+            start, end = _value(first, low, high, names), _value(last, low, high, names)
+            if start > end:
+                raise ValueError(f"Invalid range in {name}: {part!r}")
+        else:
+            start = _value(spec, low, high, names)
+            # "5/15" means from 5 to the end in steps of 15
+            end = high if step_text else start
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpression:
+    def __init__(self, expression: str):
+        self.expression = expression
+        parts = MACROS.get(expression.strip().lower(), expression).split()
+        if len(parts) != len(FIELDS):
+            raise ValueError(f"A cron expression has {len(FIELDS)} fields: {expression!r}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(part, name, low, high, names) for part, (name, low, high, names) in zip(parts, FIELDS)
+        )
+        self.weekdays = frozenset(day % 7 for day in weekdays)
+        self.days_restricted = not parts[2].startswith("*")
+        self.weekdays_restricted = not parts[4].startswith("*")
+        self._sorted_hours = sorted(self.hours)
+        self._sorted_minutes = sorted(self.minutes)
+
+    def __str__(self) -> str:
+        return self.expression
+
+    def matches_day(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        # datetime counts from Monday = 0, cron from Sunday = 0
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, ts: float) -> float:
+        """The first matching minute strictly after the timestamp `ts`."""
+        start = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(SEARCH_DAYS):
+            if self.matches_day(day):
+                for hour in self._sorted_hours:
+                    for minute in self._sorted_minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        # Local times skipped or repeated by a DST change can map to the past
+                        if candidate >= start and candidate.timestamp() > ts:
+                            return candidate.timestamp()
+            day += timedelta(days=1)
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
@@ -0,0 +1,367 @@
+"""Supervisor daemon: owns the Minecraft servers so the API can run several workers.
+
+Start it once per host, then run uvicorn with any number of workers and the
+same SUPERVISOR_SOCKET (and SERVERS_CONFIG, if there are several servers):
+
+    SUPERVISOR_SOCKET=data/supervisor.sock python daemon.py
+    SUPERVISOR_SOCKET=data/supervisor.sock SESSION_SECRET=... uvicorn main:app --workers 4
+
+Workers call ServerControl methods over a Unix socket using newline-delimited
+JSON: {"id": 1, "server": "lobby", "method": "status", "params": {}} ->
+{"id": 1, "result": ...}.
+"""
+import os
+import json
+import signal
+import asyncio
+import logging
+import itertools
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from backups import BackupError
+from diagnostics import DiagnosticsError
+from pregen import PregenError
+from scheduler import PeriodicScheduler
+from schedules import ScheduleError
+from server_control import ServerControl, create_rcon_client, load_server_configs
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Methods of ServerControl that workers may call
+RPC_METHODS = {
+    "status", "start_server", "stop_server", "console_lines", "query_events", "query_metrics",
+    "latest_metrics", "record_command", "command_history", "create_backup", "list_backups", "restore_backup",
+    "prune_backups", "world_stats", "list_players", "player_info", "list_schedules", "create_schedule",
+    "update_schedule", "delete_schedule", "launch_info", "set_launch_profile", "clear_cds_archives",
+    "pregen_status", "start_pregen", "pause_pregen", "resume_pregen", "cancel_pregen",
+    "list_diagnostics", "capture_diagnostics", "get_diagnostics", "diagnostics_output", "diff_diagnostics",
+    "delete_diagnostics",
+}
+# Long-running changes that must finish even if the worker that asked for them goes away
+DETACHED_METHODS = {"start_server", "stop_server", "create_backup", "restore_backup", "prune_backups",
+                    "start_pregen", "set_launch_profile", "clear_cds_archives"}
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+RESTORE_TIMEOUT = 3600
+WORLD_STATS_TIMEOUT = 600
+
+
+class DaemonError(Exception):
+    """The daemon reported an error or could not be reached."""
+
+
+# Errors that the API handles, re-raised as themselves in the workers
+REMOTE_ERRORS = {"BackupError": BackupError, "ScheduleError": ScheduleError, "PregenError": PregenError,
+                 "DiagnosticsError": DiagnosticsError}
+
+
+class DaemonServer:
+    """Serves the ServerControl of every server on a Unix socket; requests on a connection run concurrently."""
+
+    def __init__(self, controls: Dict[str, ServerControl], path: str):
+        self.controls = controls
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left over from a previous run
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle, self.path, limit=MAX_MESSAGE_BYTES)
+        os.chmod(self.path, 0o600)
+        logger.info(f"Supervisor daemon listening on {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._dispatch(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            method = request["method"]
+            if method not in RPC_METHODS:
+                raise DaemonError(f"Unknown method: {method}")
+            control = self.controls.get(request.get("server"))
+            if control is None:
+                raise DaemonError(f"Unknown server: {request.get('server')}")
+            call = getattr(control, method)(**request.get("params", {}))
+            if method in DETACHED_METHODS:
+                # A dropped connection cancels this dispatch, but not the operation itself
+                result = await asyncio.shield(call)
+            else:
+                result = await call
+            reply = {"id": request_id, "result": result}
+        except Exception as e:
+            logger.error(f"Daemon request failed: {str(e)}")
+            reply = {"id": request_id, "error": str(e) or type(e).__name__, "type": type(e).__name__}
+
+        async with lock:
+            writer.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+
+class DaemonClient:
+    """Worker-side stand-in for the ServerControl of one server that forwards every call to the daemon.
+
+    A single connection carries concurrent requests, matched to replies by id;
+    it is reopened on the next call if the daemon restarts.
+    """
+
+    def __init__(self, path: str, server_id: str, timeout: float = 60.0):
+        self.path = path
+        self.server_id = server_id
+        self.timeout = timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_BYTES)
+            except OSError as e:
+                raise DaemonError(f"Supervisor daemon is not reachable at {self.path}: {str(e)}")
+            self._reader_task = asyncio.create_task(self._read_replies(reader))
+
+    async def _read_replies(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                future = self._pending.pop(reply.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in reply:
+                    future.set_exception(REMOTE_ERRORS.get(reply.get("type"), DaemonError)(reply["error"]))
+                else:
+                    future.set_result(reply.get("result"))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(DaemonError("Connection to the supervisor daemon was lost"))
+            self._pending.clear()
+
+    async def call(self, method: str, timeout: Optional[float] = None, **params) -> Any:
+        await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps({"id": request_id, "server": self.server_id, "method": method,
+                                           "params": params}).encode("utf-8")
+                               + b"\n")
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except (ConnectionError, AttributeError) as e:
+            raise DaemonError(f"Connection to the supervisor daemon was lost: {str(e)}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def start(self, scheduler: PeriodicScheduler):
+        """Nothing to do, the connection is opened by the first call."""
+
+    async def shutdown(self):
+        """Disconnect; the server keeps running under the daemon."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+
+    # ----- ServerControl interface -----
+    async def status(self) -> Dict[str, Any]:
+        return await self.call("status")
+
+    async def start_server(self) -> bool:
+        return await self.call("start_server")
+
+    async def stop_server(self) -> bool:
+        # A graceful stop can take a while; the daemon escalates to terminate/kill itself
+        return await self.call("stop_server", timeout=120)
+
+    async def console_lines(self, after: Optional[int] = None, max_lines: int = 50) -> Dict[str, Any]:
+        return await self.call("console_lines", after=after, max_lines=max_lines)
+
+    async def query_events(self, kinds=None, player=None, level=None, after=0, start=None, end=None,
+                           limit=100) -> Dict[str, Any]:
+        return await self.call("query_events", kinds=kinds, player=player, level=level, after=after,
+                               start=start, end=end, limit=limit)
+
+    async def list_players(self, include_offline: bool = False, limit: int = 100) -> Dict[str, Any]:
+        return await self.call("list_players", include_offline=include_offline, limit=limit)
+
+    async def player_info(self, name: str) -> Optional[Dict[str, Any]]:
+        return await self.call("player_info", name=name)
+
+    async def list_schedules(self) -> List[Dict[str, Any]]:
+        return await self.call("list_schedules")
+
+    async def create_schedule(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call("create_schedule", task=task)
+
+    async def update_schedule(self, task_id: str, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.call("update_schedule", task_id=task_id, task=task)
+
+    async def delete_schedule(self, task_id: str) -> bool:
+        return await self.call("delete_schedule", task_id=task_id)
+
+    async def query_metrics(self, resolution: str = "1m", window: Optional[float] = None) -> Dict[str, Any]:
+        return await self.call("query_metrics", resolution=resolution, window=window)
+
+    async def latest_metrics(self) -> Dict[str, Optional[float]]:
+        return await self.call("latest_metrics")
+
+    async def record_command(self, user, command, result="success", response=None, duration=None) -> int:
+        return await self.call("record_command", user=user, command=command, result=result,
+                               response=response, duration=duration)
+
+    async def command_history(self, user=None, start=None, end=None, before=None, limit=10):
+        return await self.call("command_history", user=user, start=start, end=end, before=before, limit=limit)
+
+    async def create_backup(self) -> Dict[str, Any]:
+        return await self.call("create_backup")
+
+    async def list_backups(self) -> List[Dict[str, Any]]:
+        return await self.call("list_backups")
+
+    async def restore_backup(self, backup_id: str):
+        # Restoring writes out the whole world
+        return await self.call("restore_backup", timeout=RESTORE_TIMEOUT, backup_id=backup_id)
+
+    async def prune_backups(self, keep: int) -> List[str]:
+        return await self.call("prune_backups", keep=keep)
+
+    async def world_stats(self, inhabited_below: int = 0) -> Dict[str, Any]:
+        # The first analysis of a large world reads every region file
+        return await self.call("world_stats", timeout=WORLD_STATS_TIMEOUT, inhabited_below=inhabited_below)
+
+    async def pregen_status(self) -> Dict[str, Any]:
+        return await self.call("pregen_status")
+
+    async def start_pregen(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.call("start_pregen", request=request)
+
+    async def pause_pregen(self) -> Dict[str, Any]:
+        return await self.call("pause_pregen")
+
+    async def resume_pregen(self) -> Dict[str, Any]:
+        return await self.call("resume_pregen")
+
+    async def cancel_pregen(self) -> Dict[str, Any]:
+        return await self.call("cancel_pregen")
+
+    async def list_diagnostics(self) -> Dict[str, Any]:
+        return await self.call("list_diagnostics")
+
+    async def capture_diagnostics(self) -> Dict[str, Any]:
+        return await self.call("capture_diagnostics")
+
+    async def get_diagnostics(self, capture_id: str) -> Dict[str, Any]:
+        return await self.call("get_diagnostics", capture_id=capture_id)
+
+    async def diagnostics_output(self, capture_id: str, kind: str) -> str:
+        return await self.call("diagnostics_output", capture_id=capture_id, kind=kind)
+
+    async def diff_diagnostics(self, old_id: str, new_id: str) -> Dict[str, Any]:
+        return await self.call("diff_diagnostics", old_id=old_id, new_id=new_id)
+
+    async def delete_diagnostics(self, capture_id: str):
+        return await self.call("delete_diagnostics", capture_id=capture_id)
+
+    async def launch_info(self) -> Dict[str, Any]:
+        return await self.call("launch_info")
+
+    async def set_launch_profile(self, name: str) -> bool:
+        return await self.call("set_launch_profile", name=name)
+
+    async def clear_cds_archives(self) -> List[str]:
+        return await self.call("clear_cds_archives")
+
+
+async def run_daemon(socket_path: str, servers_config: Optional[str], data_dir: str):
+    controls = {
+        config.id: ServerControl(config, create_rcon_client(config))
+        for config in load_server_configs(servers_config, data_dir)
+    }
+    scheduler = PeriodicScheduler()
+    server = DaemonServer(controls, socket_path)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+
+    scheduler.start()
+    for control in controls.values():
+        await control.start(scheduler)
+    await server.start()
+    await stopped.wait()
+
+    logger.info("Supervisor daemon shutting down")
+    await server.stop()
+    await asyncio.gather(*(control.shutdown() for control in controls.values()))
+    await scheduler.stop()
+    for control in controls.values():
+        await control.rcon_client.close()
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler("daemon.log")
+        ]
+    )
+    data_dir = os.getenv("DATA_DIR", "data")
+    asyncio.run(run_daemon(
+        os.getenv("SUPERVISOR_SOCKET", os.path.join(data_dir, "supervisor.sock")),
+        os.getenv("SERVERS_CONFIG", os.path.join(data_dir, "servers.json")),
+        data_dir
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import os
+import re
+import gzip
+import json
+import time
+import shutil
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("minecraft-server-api")
+
+# What a capture collects, in this order: the thread dump first, while the lag is still going on.
+# "-all" makes the histogram count unreachable objects too instead of forcing a full GC first
+JCMD_COMMANDS = {
+    "threads": ["Thread.print"],
+    "heap": ["GC.heap_info"],
+    "histogram": ["GC.class_histogram", "-all"],
+}
+COMPRESSION_LEVEL = 6
+MAIN_THREAD = "Server thread"
+MAIN_THREAD_FRAMES = 25
+TOP_CLASSES = 30
+
+THREAD_PATTERN = re.compile(r'^"(.+?)"')
+STATE_PATTERN = re.compile(r"^\s+java\.lang\.Thread\.State: (\w+)")
+FRAME_PATTERN = re.compile(r"^\s+(at|- \w[\w ]*) ")
+HEAP_PATTERN = re.compile(r"total (\d+)K, used (\d+)K")
+HISTOGRAM_PATTERN = re.compile(r"^\s*\d+:\s+(\d+)\s+(\d+)\s+(\S+)")
+
+
+class DiagnosticsError(Exception):
+    """A diagnostics capture could not be taken or read."""
+
+
+# ----- jcmd output parsing -----
+def parse_threads(text: str) -> Dict[str, Any]:
+    """Thread count, threads per state and the stack of the main server thread from Thread.print."""
+    states: Dict[str, int] = {}
+    count = 0
+    current: Optional[str] = None
+    main: Optional[Dict[str, Any]] = None
+    for line in text.splitlines():
+        match = THREAD_PATTERN.match(line)
+        if match:
+            count += 1
+            current = match.group(1)
+            if current == MAIN_THREAD:
+                main = {"state": None, "frames": []}
+            continue
+        match = STATE_PATTERN.match(line)
+        if match:
+            states[match.group(1)] = states.get(match.group(1), 0) + 1
+            if current == MAIN_THREAD:
+                main["state"] = match.group(1)
+        elif current == MAIN_THREAD and FRAME_PATTERN.match(line) and len(main["frames"]) < MAIN_THREAD_FRAMES:
+            main["frames"].append(line.strip())
+    return {"count": count, "states": states, "main_thread": main}
+
+
+def parse_heap(text: str) -> Dict[str, Any]:
+    """Committed and used heap in bytes from GC.heap_info (the first line names the collector)."""
+    match = HEAP_PATTERN.search(text)
+    if match is None:
+        return {"total_bytes": None, "used_bytes": None}
+    return {"total_bytes": int(match.group(1)) * 1024, "used_bytes": int(match.group(2)) * 1024}
+
+
+def parse_histogram(text: str) -> Dict[str, Tuple[int, int]]:
+    """class name -> (instances, bytes) from GC.class_histogram."""
+    classes = {}
+    for line in text.splitlines():
+        match = HISTOGRAM_PATTERN.match(line)
+        if match:
+            instances, size, name = match.groups()
+            # The same name can appear once per class loader
+            old = classes.get(name, (0, 0))
+            classes[name] = (old[0] + int(instances), old[1] + int(size))
+    return classes
+
+
+def summarize(outputs: Dict[str, str]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    if "threads" in outputs:
+        summary["threads"] = parse_threads(outputs["threads"])
+    if "heap" in outputs:
+        summary["heap"] = parse_heap(outputs["heap"])
+    if "histogram" in outputs:
+        classes = parse_histogram(outputs["histogram"])
+        top = sorted(classes.items(), key=lambda item: item[1][1], reverse=True)[:TOP_CLASSES]
+        summary["histogram"] = {
+            "classes": len(classes),
+            "instances": sum(instances for instances, _ in classes.values()),
+            "bytes": sum(size for _, size in classes.values()),
+            "top": [{"class": name, "instances": instances, "bytes": size} for name, (instances, size) in top],
+        }
+    return summary
+
+
+class LagDiagnostics:
+    """JVM diagnostics of the server, captured with jcmd when it logs that it can't keep up.
+
+    A capture runs Thread.print, GC.heap_info and GC.class_histogram against
+    the server's PID one after another and stores the gzipped outputs with
+    a summary (threads per state, the main thread's stack, heap use, the
+    largest classes) in its own directory. Automatic captures are at least
+    `interval` seconds apart; the oldest captures are deleted beyond `keep`
+    captures or `max_bytes` on disk. Two captures can be diffed to see which
+    classes grew and what the main thread was doing in each.
+    """
+
+    def __init__(self, jcmd_path: str, store_dir: str, get_pid: Callable[[], Optional[int]],
+                 interval: float = 600.0, min_behind_ms: int = 2000, keep: int = 30,
+                 max_bytes: int = 500 * 1024 * 1024, timeout: float = 60.0):
+        self.jcmd_path = jcmd_path
+        self.store_dir = store_dir
+        self.get_pid = get_pid
+        self.interval = interval
+        self.min_behind_ms = min_behind_ms
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.last_capture: Optional[float] = None
+        self.suppressed = 0  # lag warnings that came too soon after a capture
+        self.current: Optional[Dict[str, Any]] = None  # the capture in progress
+        self._task: Optional[asyncio.Task] = None
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # ----- Capturing -----
+    def on_lag(self, behind_ms: int):
+        """A "Can't keep up!" warning; captures unless one was taken recently."""
+        if behind_ms < self.min_behind_ms or self.get_pid() is None:
+            return
+        if self._busy() or (self.last_capture is not None and time.time() - self.last_capture < self.interval):
+            self.suppressed += 1
+            return
+        self._begin(f"Сервер отстаёт на {behind_ms} мс")
+
+    def capture(self, reason: str = "manual") -> Dict[str, Any]:
+        """Start a capture now, whatever the interval; returns its id and status."""
+        if self.get_pid() is None:
+            raise DiagnosticsError("Сервер не запущен")
+        if self._busy():
+            raise DiagnosticsError("Снимок диагностики уже создаётся")
+        return self._begin(reason)
+
+    def _busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _begin(self, reason: str) -> Dict[str, Any]:
+        capture_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        if os.path.exists(os.path.join(self.store_dir, capture_id)):
+            capture_id += f"-{int(time.time() * 1000) % 1000:03d}"
+        self.last_capture = time.time()
+        self.current = {"id": capture_id, "reason": reason, "status": "running", "created": self.last_capture}
+        self._task = asyncio.create_task(self._capture(capture_id, reason, self.get_pid()))
+        return dict(self.current)
+
+    async def _jcmd(self, pid: int, args: List[str]) -> Tuple[str, Optional[str]]:
+        """(output, error) of one jcmd command."""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.jcmd_path, str(pid), *args,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            return "", f"Could not run {self.jcmd_path}: {str(e)}"
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            process.kill()
+            await process.wait()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "", f"Timed out after {self.timeout:.0f}s"
+        text = output.decode("utf-8", errors="replace")
+        if process.returncode != 0:
+            return text, text.strip().splitlines()[-1] if text.strip() else f"Exit code {process.returncode}"
+        return text, None
+
+    async def _capture(self, capture_id: str, reason: str, pid: int):
+        started = time.monotonic()
+        outputs: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        durations: Dict[str, float] = {}
+        for kind, args in JCMD_COMMANDS.items():
+            command_started = time.monotonic()
+            output, error = await self._jcmd(pid, args)
+            durations[kind] = round(time.monotonic() - command_started, 3)
+            if error is not None:
+                errors[kind] = error
+            if output:
+                outputs[kind] = output
+
+        meta = {
+            "id": capture_id, "reason": reason, "pid": pid, "created": self.current["created"],
+            "seconds": round(time.monotonic() - started, 3), "durations": durations, "errors": errors,
+        }
+        try:
+            meta = await asyncio.to_thread(self._store, meta, outputs)
+            await asyncio.to_thread(self._prune)
+        except OSError as e:
+            logger.error(f"Could not store diagnostics {capture_id}: {str(e)}")
+            self.current = {**self.current, "status": "failed", "error": str(e)}
+            return
+        if errors:
+            logger.warning(f"Diagnostics {capture_id} incomplete: {errors}")
+        logger.info(f"Diagnostics {capture_id} captured ({reason}) in {meta['seconds']}s, {meta['bytes']} bytes")
+        self.current = None
+
+    def _store(self, meta: Dict[str, Any], outputs: Dict[str, str]) -> Dict[str, Any]:
+        """Compress the outputs and write them with the summary (runs in a thread)."""
+        directory = os.path.join(self.store_dir, meta["id"])
+        os.makedirs(directory, exist_ok=True)
+        sizes = {}
+        for kind, text in outputs.items():
+            data = gzip.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+            with open(os.path.join(directory, f"{kind}.txt.gz"), "wb") as f:
+                f.write(data)
+            sizes[kind] = {"bytes": len(text), "compressed": len(data)}
+        meta = {**meta, "outputs": sizes, "bytes": sum(size["compressed"] for size in sizes.values()),
+                "summary": summarize(outputs)}
+        # The summary is written last, so a directory without it is an incomplete capture
+        with open(os.path.join(directory, "meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+        return meta
+
+    # ----- Stored captures -----
+    def _capture_ids(self) -> List[str]:
+        """Ids of the stored captures, oldest first (ids sort by time)."""
+        if not os.path.isdir(self.store_dir):
+            return []
+        return sorted(name for name in os.listdir(self.store_dir)
+                      if os.path.exists(os.path.join(self.store_dir, name, "meta.json")))
+
+    def _load(self, capture_id: str) -> Dict[str, Any]:
+        # Ids come from URLs; only plain directory names of the store are accepted
+        if capture_id in ("", ".", "..") or os.path.basename(capture_id) != capture_id:
+            raise DiagnosticsError(f"Снимок диагностики не найден: {capture_id}")
+        try:
+            with open(os.path.join(self.store_dir, capture_id, "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise DiagnosticsError(f"Снимок диагностики не найден: {capture_id}")
+
+    def _prune(self):
+        ids = self._capture_ids()
+        sizes = {}
+        for capture_id in ids:
+            directory = os.path.join(self.store_dir, capture_id)
+            sizes[capture_id] = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        total = sum(sizes.values())
+        # The newest capture always stays
+        while len(ids) > 1 and (len(ids) > self.keep or total > self.max_bytes):
+            capture_id = ids.pop(0)
+            shutil.rmtree(os.path.join(self.store_dir, capture_id), ignore_errors=True)
+            total -= sizes[capture_id]
+            logger.info(f"Removed diagnostics {capture_id}")
+
+    def list(self) -> Dict[str, Any]:
+        """The capture in progress and the stored ones, newest first, without their stacks and class tables."""
+        captures = []
+        for capture_id in reversed(self._capture_ids()):
+            try:
+                meta = self._load(capture_id)
+            except (OSError, ValueError, DiagnosticsError) as e:
+                logger.error(f"Unreadable diagnostics {capture_id}: {str(e)}")
+                continue
+            summary = meta.pop("summary", {})
+            threads = summary.get("threads") or {}
+            meta["threads"] = {"count": threads.get("count"), "states": threads.get("states")}
+            meta["main_thread_state"] = (threads.get("main_thread") or {}).get("state")
+            meta["heap"] = summary.get("heap")
+            captures.append(meta)
+        return {
+            "current": dict(self.current) if self.current is not None else None,
+            "last_capture": self.last_capture,
+            "suppressed": self.suppressed,
+            "interval": self.interval,
+            "captures": captures,
+        }
+
+    def get(self, capture_id: str) -> Dict[str, Any]:
+        return self._load(capture_id)
+
+    def output(self, capture_id: str, kind: str) -> str:
+        """The full jcmd output of one command of a capture."""
+        self._load(capture_id)
+        try:
+            with gzip.open(os.path.join(self.store_dir, capture_id, f"{kind}.txt.gz"), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise DiagnosticsError(f"Снимок {capture_id} не содержит {kind}")
+
+    def delete(self, capture_id: str):
+        self._load(capture_id)
+        shutil.rmtree(os.path.join(self.store_dir, capture_id))
+
+    def diff(self, old_id: str, new_id: str, limit: int = TOP_CLASSES) -> Dict[str, Any]:
+        """What changed between two captures: heap use, thread states and the classes that grew most."""
+        old, new = self._load(old_id), self._load(new_id)
+        result: Dict[str, Any] = {"old": old_id, "new": new_id, "seconds": new["created"] - old["created"]}
+
+        old_heap, new_heap = old["summary"].get("heap") or {}, new["summary"].get("heap") or {}
+        if old_heap.get("used_bytes") is not None and new_heap.get("used_bytes") is not None:
+            result["heap_used_delta"] = new_heap["used_bytes"] - old_heap["used_bytes"]
+
+        old_threads, new_threads = old["summary"].get("threads") or {}, new["summary"].get("threads") or {}
+        states = set(old_threads.get("states", {})) | set(new_threads.get("states", {}))
+        result["threads"] = {
+            "count_delta": new_threads.get("count", 0) - old_threads.get("count", 0),
+            "states": {state: new_threads.get("states", {}).get(state, 0) - old_threads.get("states", {}).get(state, 0)
+                       for state in sorted(states)},
+        }
+        result["main_thread"] = {"old": old_threads.get("main_thread"), "new": new_threads.get("main_thread")}
+
+        if "histogram" in old.get("outputs", {}) and "histogram" in new.get("outputs", {}):
+            old_classes = parse_histogram(self.output(old_id, "histogram"))
+            new_classes = parse_histogram(self.output(new_id, "histogram"))
+            changes = []
+            for name in old_classes.keys() | new_classes.keys():
+                old_instances, old_bytes = old_classes.get(name, (0, 0))
+                new_instances, new_bytes = new_classes.get(name, (0, 0))
+                if new_bytes != old_bytes or new_instances != old_instances:
+                    changes.append({"class": name, "instances": new_instances, "bytes": new_bytes,
+                                    "instances_delta": new_instances - old_instances,
+                                    "bytes_delta": new_bytes - old_bytes})
+            changes.sort(key=lambda change: change["bytes_delta"], reverse=True)
+            result["grown"] = [change for change in changes if change["bytes_delta"] > 0][:limit]
+            result["shrunk"] = [change for change in reversed(changes) if change["bytes_delta"] < 0][:limit]
+        return result
@@ -77,11 +77,16 @@ async function sendCustomCommand() {
 }
 
 let logErrorShown = false; // Флаг, чтобы не спамить ошибку
+let logPosition = null; // Последняя полученная позиция в логе: {after: seq} или {since: cursor}
+let logEtag = null; // ETag последнего ответа, чтобы сервер мог ответить 304
 
 async function loadLogs() {
     try {
-        const response = await fetch(API_URL + "/logs", {
-            credentials: "include" // Важно для отправки cookie сессии
+        const query = logPosition ? "?" + new URLSearchParams(logPosition) : "";
+        const response = await fetch(API_URL + "/logs" + query, {
+            credentials: "include", // Важно для отправки cookie сессии
+            cache: "no-store", // Кэш браузера подменил бы 304 старым ответом
+            headers: logEtag ? {"If-None-Match": logEtag} : {}
         });
 
         if (response.status === 401 || response.status === 403) {
@@ -93,10 +98,23 @@ async function loadLogs() {
             return;
         }
 
+        // 304: новых строк нет, 204: лог пока пуст
+        if (response.status === 304 || response.status === 204) {
+            logErrorShown = false;
+            return;
+        }
+
         if (!response.ok) throw new Error("Сервер вернул ошибку");
 
+        // Сервер присылает только строки после нашей позиции, дописываем их в конец
         const data = await response.json();
-        updateConsole(data.logs ? data.logs.join("\n") : "Логи пусты");
+        appendConsoleLines(data.logs || []);
+        if (data.seq !== undefined) {
+            logPosition = {after: data.seq};
+        } else if (data.cursor) {
+            logPosition = {since: data.cursor};
+        }
+        logEtag = response.headers.get("ETag");
 
         logErrorShown = false; // Сбрасываем флаг, если логи загрузились
     } catch (error) {
@@ -107,17 +125,21 @@ async function loadLogs() {
     }
 }
 
+const MAX_CONSOLE_CHUNKS = 1000; // Столько последних порций строк хранится в консоли
+
 function updateConsole(message) {
-    const consoleOutput = document.getElementById("console-output");
+    appendConsoleLines([message]);
+}
 
-    // Добавляем анимацию для новых сообщений
-    const messageElement = document.createElement("div");
-    messageElement.className = "console-message";
-    messageElement.textContent = message;
-    messageElement.style.opacity = "0";
+function appendConsoleLines(lines) {
+    if (!lines.length) return;
+    const consoleOutput = document.getElementById("console-output");
 
-    // Добавляем сообщение с сохранением формата переноса строк
-    consoleOutput.innerText += `\n${message}`;
+    // Добавляем текстовый узел вместо перезаписи innerText, чтобы браузер не перерисовывал всю консоль
+    consoleOutput.appendChild(document.createTextNode("\n" + lines.join("\n")));
+    while (consoleOutput.childNodes.length > MAX_CONSOLE_CHUNKS) {
+        consoleOutput.removeChild(consoleOutput.firstChild);
+    }
 
     // Прокручиваем вниз с плавной анимацией
     consoleOutput.scrollTo({
@@ -263,6 +285,40 @@ document.addEventListener('DOMContentLoaded', function() {
     document.getElementById("console-output").innerText = "[Система]: Консоль загружается...";
 });
 
-setInterval(loadLogs, 2000);
-loadLogs();
+let logSource = null; // Поток логов (Server-Sent Events)
+let logPollTimer = null; // Таймер опроса логов, если поток недоступен
+
+// Запасной вариант: опрашиваем логи каждые 2 секунды
+function startLogPolling() {
+    if (logPollTimer) return;
+    logPollTimer = setInterval(loadLogs, 2000);
+    loadLogs();
+}
+
+// Подписываемся на поток логов, при неудаче переходим на опрос
+function startLogStream() {
+    if (!window.EventSource) {
+        startLogPolling();
+        return;
+    }
+
+    logSource = new EventSource(API_URL + "/api/server/logs/stream", {
+        withCredentials: true // Важно для отправки cookie сессии
+    });
+
+    logSource.onmessage = function(event) {
+        updateConsole(event.data);
+        logErrorShown = false;
+    };
+
+    logSource.onerror = function() {
+        // CLOSED означает, что браузер не будет переподключаться (например, 401/403)
+        if (logSource.readyState === EventSource.CLOSED) {
+            logSource = null;
+            startLogPolling();
+        }
+    };
+}
+
+startLogStream();
 checkUserLogin();
\ No newline at end of file
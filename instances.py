@@ -0,0 +1,71 @@
+import os
+from typing import Dict, Iterator, List, Optional, Union
+
+from daemon import DaemonClient
+from log_index import LogArchiveIndex
+from log_stream import LogBroadcaster
+from scheduler import PeriodicScheduler
+from server_control import ServerConfig, ServerControl, create_rcon_client
+
+
+class ServerInstance:
+    """What the API keeps for one registered server.
+
+    The RCON pool and the log file tail live in every worker; the process,
+    console, metrics and command journal live in a ServerControl, in this
+    process or, with a supervisor socket, in the daemon.
+    """
+
+    def __init__(self, config: ServerConfig, supervisor_socket: Optional[str] = None):
+        self.config = config
+        self.rcon_client = create_rcon_client(config)
+        self.server: Union[ServerControl, DaemonClient] = (
+            DaemonClient(supervisor_socket, config.id) if supervisor_socket
+            else ServerControl(config, self.rcon_client)
+        )
+        self.log_broadcaster = LogBroadcaster(config.log_file)
+        # The daemon builds the archive indexes, workers only search them
+        self.log_index = self.server.log_index if isinstance(self.server, ServerControl) else LogArchiveIndex(
+            config.log_dir,
+            os.path.join(config.data_dir, "log_index"),
+            build=False
+        )
+
+    @property
+    def id(self) -> str:
+        return self.config.id
+
+    @property
+    def name(self) -> str:
+        return self.config.name or self.config.id
+
+    async def start(self, scheduler: PeriodicScheduler):
+        await self.server.start(scheduler)
+        self.log_broadcaster.start(scheduler)
+        self.log_index.start(scheduler)
+
+    async def shutdown(self):
+        await self.log_broadcaster.stop()
+        await self.log_index.stop()
+        # Stops the Minecraft server too, unless it belongs to the supervisor daemon
+        await self.server.shutdown()
+        await self.rcon_client.close()
+
+
+class ServerRegistry:
+    """The configured servers by id; the first one is the default."""
+
+    def __init__(self, configs: List[ServerConfig], supervisor_socket: Optional[str] = None):
+        self.instances: Dict[str, ServerInstance] = {
+            config.id: ServerInstance(config, supervisor_socket) for config in configs
+        }
+        self.default = self.instances[configs[0].id]
+
+    def __iter__(self) -> Iterator[ServerInstance]:
+        return iter(self.instances.values())
+
+    def __len__(self) -> int:
+        return len(self.instances)
+
+    def get(self, server_id: Optional[str]) -> Optional[ServerInstance]:
+        return self.instances.get(server_id) if server_id else self.default
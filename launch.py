@@ -0,0 +1,319 @@
+import os
+import re
+import json
+import time
+import hashlib
+import asyncio
+import subprocess
+import logging
+import statistics
+from collections import deque
+from typing import Any, Deque, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Aikar's G1 flags (https://mcflags.emc.gs); the second set is for heaps of 12 GB and more
+AIKAR_FLAGS = [
+    "-XX:+UseG1GC", "-XX:+ParallelRefProcEnabled", "-XX:MaxGCPauseMillis=200", "-XX:+UnlockExperimentalVMOptions",
+    "-XX:+DisableExplicitGC", "-XX:+AlwaysPreTouch", "-XX:G1HeapWastePercent=5", "-XX:G1MixedGCCountTarget=4",
+    "-XX:G1MixedGCLiveThresholdPercent=90", "-XX:G1RSetUpdatingPauseTimePercent=5", "-XX:SurvivorRatio=32",
+    "-XX:+PerfDisableSharedMem", "-XX:MaxTenuringThreshold=1",
+    "-Dusing.aikars.flags=https://mcflags.emc.gs", "-Daikars.new.flags=true",
+]
+AIKAR_SMALL_HEAP = ["-XX:G1NewSizePercent=30", "-XX:G1MaxNewSizePercent=40", "-XX:G1HeapRegionSize=8M",
+                    "-XX:G1ReservePercent=20", "-XX:InitiatingHeapOccupancyPercent=15"]
+AIKAR_LARGE_HEAP = ["-XX:G1NewSizePercent=40", "-XX:G1MaxNewSizePercent=50", "-XX:G1HeapRegionSize=16M",
+                    "-XX:G1ReservePercent=15", "-XX:InitiatingHeapOccupancyPercent=20"]
+AIKAR_LARGE_HEAP_BYTES = 12 * 1024 ** 3
+GC_FLAGS = {
+    "g1": ["-XX:+UseG1GC"],
+    "zgc": ["-XX:+UseZGC"],
+    "shenandoah": ["-XX:+UseShenandoahGC"],
+    "parallel": ["-XX:+UseParallelGC"],
+}
+# Dynamic CDS archives (ArchiveClassesAtExit) exist since JDK 13
+MIN_CDS_JAVA = 13
+JAVA_VERSION_PATTERN = re.compile(r'version "(\d+)(?:\.(\d+))?')
+# The JVM only warns and runs without the archive when it can't use it
+CDS_PROBLEM_PATTERN = re.compile(r"\[(?:warning|error)\s*\]\[cds|error has occurred while processing the shared archive",
+                                 re.IGNORECASE)
+HISTORY_SIZE = 200
+# <profile>-<fingerprint>.jsa; profile names may contain dashes themselves ("aikar-large")
+ARCHIVE_PATTERN = re.compile(r"^(.+)-([0-9a-f]{16})\.jsa$")
+
+
+class LaunchProfile(BaseModel):
+    """JVM settings a server can be started with (ServerConfig.launch_profiles)."""
+    description: str = ""
+    # -Xms and -Xmx, e.g. "6G"; empty keeps the -Xmx/-Xms of java_args
+    heap: str = Field(default="", pattern=r"^(\d+[KkMmGg])?$")
+    gc: Literal["", "g1", "zgc", "shenandoah", "parallel"] = ""
+    # Aikar's G1 tuning, sized for the heap
+    aikar: bool = False
+    args: List[str] = []
+    # Dump the loaded classes into a CDS archive on the first run and map it on the next starts
+    cds: bool = True
+
+
+BUILTIN_PROFILES = {
+    "aikar": LaunchProfile(description="G1 with Aikar's flags", aikar=True),
+    "zgc": LaunchProfile(description="Generational ZGC (Java 21+)", gc="zgc"),
+}
+
+
+def heap_bytes(flag: str) -> int:
+    """-Xmx6G -> 6 GiB in bytes."""
+    value = flag[4:]
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    if value and value[-1].lower() in units:
+        return int(value[:-1]) * units[value[-1].lower()]
+    return int(value) if value.isdigit() else 0
+
+
+def jvm_args(profile: LaunchProfile, java_args: List[str], java_version: Optional[int]) -> List[str]:
+    """The JVM options of a profile; heap flags come from java_args unless the profile sets the heap."""
+    if profile.heap:
+        args = [f"-Xms{profile.heap}", f"-Xmx{profile.heap}"]
+    else:
+        args = [arg for arg in java_args if arg.startswith(("-Xms", "-Xmx"))]
+    if profile.aikar:
+        max_heap = max((heap_bytes(arg) for arg in args if arg.startswith("-Xmx")), default=0)
+        args += AIKAR_FLAGS + (AIKAR_LARGE_HEAP if max_heap >= AIKAR_LARGE_HEAP_BYTES else AIKAR_SMALL_HEAP)
+    elif profile.gc:
+        args += GC_FLAGS[profile.gc]
+        # ZGC is generational by default from Java 23, and the flag is unknown before 21
+        if profile.gc == "zgc" and java_version is not None and 21 <= java_version < 23:
+            args.append("-XX:+ZGenerational")
+    return args + profile.args
+
+
+def detect_java_version(java_path: str, timeout: float = 15.0) -> Tuple[Optional[int], str]:
+    """(feature version, version line) of a JVM, e.g. (17, 'openjdk version "17.0.8" 2023-07-18')."""
+    try:
+        result = subprocess.run([java_path, "-version"], stdin=subprocess.DEVNULL, capture_output=True,
+                                timeout=timeout, text=True, errors="replace")
+    except (OSError, subprocess.SubprocessError) as e:
+        return None, str(e)
+    output = (result.stderr or result.stdout).strip()
+    match = JAVA_VERSION_PATTERN.search(output)
+    if match is None:
+        return None, output.splitlines()[0] if output else ""
+    major = int(match.group(1))
+    # "1.8.0_382" is Java 8
+    return (int(match.group(2) or 0) if major == 1 else major), output.splitlines()[0]
+
+
+class LaunchManager:
+    """Builds the server's command line from the active launch profile and manages its CDS archive.
+
+    The archive is a dynamic AppCDS archive of the classes the server loads:
+    the first start of a profile runs with -XX:ArchiveClassesAtExit, which
+    writes it when the JVM exits, and later starts map it with
+    -XX:SharedArchiveFile instead of loading and verifying those classes again.
+    Its name includes a fingerprint of the JVM, the options, the server JAR
+    and the mods folder, so changing any of them makes a new one. Each start
+    is recorded with its time to "Done" so profiles can be compared.
+    """
+
+    def __init__(self, java_path: str, java_args: List[str], server_dir: str, server_jar: str,
+                 profiles: Dict[str, LaunchProfile], default_profile: str, data_dir: str):
+        self.java_path = java_path
+        self.java_args = java_args
+        self.server_dir = server_dir
+        self.server_jar = server_jar
+        # The "default" profile is java_args as configured
+        self.profiles = {"default": LaunchProfile(description="java_args from the server configuration",
+                                                  args=[arg for arg in java_args
+                                                        if not arg.startswith(("-Xms", "-Xmx"))]),
+                         **BUILTIN_PROFILES, **profiles}
+        self.active = default_profile if default_profile in self.profiles else "default"
+        self.cds_dir = os.path.join(data_dir, "cds")
+        self.state_path = os.path.join(data_dir, "launch.json")
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=HISTORY_SIZE)
+        self.java_version: Optional[int] = None
+        self.java_version_text = ""
+        self._java_key: Optional[Tuple[str, float]] = None
+        self.current: Optional[Dict[str, Any]] = None  # the start in progress
+        self._archive: Optional[str] = None
+        self._cds_problem = False
+
+    def load(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading {self.state_path}: {str(e)}")
+            return
+        if state.get("profile") in self.profiles:
+            self.active = state["profile"]
+        self.history.extend(state.get("history", []))
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        with open(f"{self.state_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"profile": self.active, "history": list(self.history)}, f)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    async def prepare(self):
+        """Detect the Java version (again, if the binary changed) before a start."""
+        try:
+            key = (self.java_path, os.path.getmtime(self.java_path))
+        except OSError:
+            key = (self.java_path, 0.0)  # a command on the PATH
+        if key != self._java_key:
+            self.java_version, self.java_version_text = await asyncio.to_thread(detect_java_version, self.java_path)
+            self._java_key = key
+            logger.info(f"Java at {self.java_path}: {self.java_version_text or 'version unknown'}")
+
+    def set_profile(self, name: str) -> bool:
+        if name not in self.profiles:
+            return False
+        self.active = name
+        self._save()
+        return True
+
+    # ----- CDS archive -----
+    def fingerprint(self, args: List[str]) -> str:
+        """Hash of everything a CDS archive depends on: JVM, options, server JAR and mods."""
+        digest = hashlib.sha256()
+        digest.update(f"{self.java_path}\0{self.java_version_text}\0{' '.join(args)}\0".encode())
+        paths = [os.path.join(self.server_dir, self.server_jar)]
+        mods_dir = os.path.join(self.server_dir, "mods")
+        if os.path.isdir(mods_dir):
+            paths += sorted(os.path.join(mods_dir, name) for name in os.listdir(mods_dir) if name.endswith(".jar"))
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.basename(path)}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+        return digest.hexdigest()[:16]
+
+    def archive_path(self, profile: str, fingerprint: str) -> str:
+        return os.path.join(self.cds_dir, f"{profile}-{fingerprint}.jsa")
+
+    def _remove_archives(self, profile: Optional[str] = None, keep: Optional[str] = None) -> List[str]:
+        removed = []
+        if not os.path.isdir(self.cds_dir):
+            return removed
+        for name in os.listdir(self.cds_dir):
+            path = os.path.join(self.cds_dir, name)
+            match = ARCHIVE_PATTERN.match(name)
+            if path == keep or match is None or (profile is not None and match.group(1) != profile):
+                continue
+            try:
+                os.remove(path)
+                removed.append(name)
+            except OSError as e:
+                logger.error(f"Error removing CDS archive {name}: {str(e)}")
+        return removed
+
+    def clear_archives(self) -> List[str]:
+        """Delete every CDS archive, so the next start of each profile makes a new one."""
+        return self._remove_archives()
+
+    # ----- Starts -----
+    def command(self) -> List[str]:
+        """The command line for the next start (the supervisor's build_command)."""
+        profile = self.profiles[self.active]
+        args = jvm_args(profile, self.java_args, self.java_version)
+        cds, archive = "off", None
+        if profile.cds and self.java_version is not None and self.java_version >= MIN_CDS_JAVA:
+            archive = self.archive_path(self.active, self.fingerprint(args))
+            # Archives of this profile for an older JAR, mods or JVM can never be used again
+            self._remove_archives(self.active, keep=archive)
+            if os.path.exists(archive):
+                cds = "use"
+                args = args + [f"-XX:SharedArchiveFile={archive}"]
+            else:
+                cds = "create"
+                os.makedirs(self.cds_dir, exist_ok=True)
+                args = args + [f"-XX:ArchiveClassesAtExit={archive}"]
+
+        self.current = {"started": time.time(), "profile": self.active, "cds": cds, "seconds": None}
+        self._archive = archive
+        self._cds_problem = False
+        return [self.java_path] + args + ["-jar", self.server_jar, "nogui"]
+
+    def check_line(self, line: str):
+        """Watch the console of a start that maps an archive for the JVM rejecting it."""
+        current = self.current
+        # The JVM reports archive problems while it starts, long before "Done"
+        if current is None or current["cds"] != "use" or current["seconds"] is not None or self._cds_problem:
+            return
+        if CDS_PROBLEM_PATTERN.search(line):
+            logger.warning(f"CDS archive rejected by the JVM, it will be recreated: {line.strip()}")
+            self._cds_problem = True
+
+    def ready(self, seconds: float):
+        if self.current is None or self.current["seconds"] is not None:
+            return
+        self.current["seconds"] = round(seconds, 2)
+        self.history.append(dict(self.current))
+        self._save()
+        logger.info(f"Start with profile {self.current['profile']} (CDS {self.current['cds']}) "
+                    f"took {seconds:.1f}s to Done")
+
+    def exited(self, exit_code: Optional[int]):
+        current, self.current = self.current, None
+        if current is None:
+            return
+        if current["seconds"] is None:
+            # Never got to Done
+            self.history.append({**current, "exit_code": exit_code})
+            self._save()
+        archive = self._archive
+        if archive is None:
+            return
+        if current["cds"] == "create" and os.path.exists(archive):
+            logger.info(f"CDS archive created: {archive} ({os.path.getsize(archive) / 1024 ** 2:.0f} MB)")
+        elif current["cds"] == "use" and self._cds_problem:
+            self._remove_archives(current["profile"])
+
+    # ----- Reporting -----
+    def summary(self) -> Dict[str, Any]:
+        profile = self.profiles[self.active]
+        args = jvm_args(profile, self.java_args, self.java_version)
+        archive = None
+        if self.java_version is not None and self.java_version >= MIN_CDS_JAVA and profile.cds:
+            archive = self.archive_path(self.active, self.fingerprint(args))
+        return {
+            "active": self.active,
+            "profiles": {
+                name: {**p.model_dump(), "jvm_args": jvm_args(p, self.java_args, self.java_version)}
+                for name, p in self.profiles.items()
+            },
+            "java": {"path": self.java_path, "version": self.java_version, "version_text": self.java_version_text},
+            "cds": {
+                "enabled": archive is not None,
+                "archive": os.path.basename(archive) if archive else None,
+                "ready": archive is not None and os.path.exists(archive),
+                "size": os.path.getsize(archive) if archive and os.path.exists(archive) else None,
+            },
+            "stats": self.stats(),
+            "history": list(self.history)[-20:],
+        }
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Time to Done per profile and CDS mode, over the recorded starts."""
+        groups: Dict[Tuple[str, str], List[float]] = {}
+        failed: Dict[Tuple[str, str], int] = {}
+        for start in self.history:
+            key = (start["profile"], start["cds"])
+            if start["seconds"] is None:
+                failed[key] = failed.get(key, 0) + 1
+            else:
+                groups.setdefault(key, []).append(start["seconds"])
+        return [
+            {
+                "profile": profile, "cds": cds, "starts": len(times), "failed": failed.get((profile, cds), 0),
+                "median": statistics.median(times) if times else None,
+                "best": min(times) if times else None,
+                "last": times[-1] if times else None,
+            }
+            for (profile, cds), times in sorted({**{key: [] for key in failed}, **groups}.items())
+        ]
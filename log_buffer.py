@@ -0,0 +1,163 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple
+
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Approximate per-line overhead of a str plus its slot, used for the memory bound
+LINE_OVERHEAD = 64
+SEGMENT_SUFFIX = ".seg"
+
+
+class LogRingBuffer:
+    """Fixed-size in-memory ring of console lines with monotonically increasing sequence numbers.
+
+    Lines live in a circular array indexed by seq % capacity, so reading the
+    last N lines or resuming after a sequence number is O(lines returned).
+    Appended lines are also spilled to disk in bulk-written segment files so
+    the history survives an API restart.
+    """
+
+    def __init__(self, capacity: int = 20000, max_bytes: int = 16 * 1024 * 1024,
+                 spool_dir: Optional[str] = None, segment_bytes: int = 4 * 1024 * 1024, max_segments: int = 20):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.spool_dir = spool_dir
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+
+        self._slots: List[Optional[str]] = [None] * capacity
+        self.first_seq = 1  # oldest sequence number still in memory
+        self.next_seq = 1  # sequence number of the next appended line
+        self._bytes = 0
+
+        self._pending: List[Tuple[int, str]] = []
+        # Called with (seq, line) for every new line, e.g. to parse it into events
+        self.listeners: List[Callable[[int, str], None]] = []
+        self._flush_lock = threading.Lock()
+        self._job: Optional[PeriodicJob] = None
+
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest line (0 if nothing was ever appended)."""
+        return self.next_seq - 1
+
+    def append(self, line: str) -> int:
+        """Add a line, notify the listeners and return its sequence number."""
+        line = line.rstrip("\r\n")
+        seq = self._store(line)
+        if self.spool_dir is not None:
+            self._pending.append((seq, line))
+        for listener in self.listeners:
+            listener(seq, line)
+        return seq
+
+    def _store(self, line: str) -> int:
+        seq = self.next_seq
+        if len(self) == self.capacity:
+            self._evict()
+        self._slots[seq % self.capacity] = line
+        self._bytes += len(line) + LINE_OVERHEAD
+        self.next_seq += 1
+        while self._bytes > self.max_bytes and len(self) > 1:
+            self._evict()
+        return seq
+
+    def _evict(self):
+        index = self.first_seq % self.capacity
+        self._bytes -= len(self._slots[index]) + LINE_OVERHEAD
+        self._slots[index] = None
+        self.first_seq += 1
+
+    def _range(self, start: int, end: int) -> List[Tuple[int, str]]:
+        return [(seq, self._slots[seq % self.capacity]) for seq in range(start, end)]
+
+    def tail(self, max_lines: int) -> List[Tuple[int, str]]:
+        """Return the newest max_lines lines as (seq, line), oldest first."""
+        start = max(self.first_seq, self.next_seq - max(max_lines, 0))
+        return self._range(start, self.next_seq)
+
+    def since(self, after_seq: int, max_lines: int) -> Tuple[List[Tuple[int, str]], bool]:
+        """Return up to max_lines lines after after_seq, and whether the client lost track.
+
+        If after_seq was already evicted (or comes from before a reset) the
+        newest lines are returned instead and the second value is True.
+        """
+        if self.first_seq - 1 <= after_seq < self.next_seq:
+            start = after_seq + 1
+            return self._range(start, min(self.next_seq, start + max(max_lines, 0))), False
+        return self.tail(max_lines), True
+
+    # ----- Disk spill -----
+    def _segment_paths(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.spool_dir, n) for n in names]
+
+    def flush(self):
+        """Write pending lines to the current segment in a single write (runs in a thread)."""
+        if self.spool_dir is None:
+            return
+        with self._flush_lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            os.makedirs(self.spool_dir, exist_ok=True)
+            segments = self._segment_paths()
+            if not segments or os.path.getsize(segments[-1]) >= self.segment_bytes:
+                # Segment names are the first sequence number they contain, zero padded to sort
+                segments.append(os.path.join(self.spool_dir, f"{pending[0][0]:020d}{SEGMENT_SUFFIX}"))
+
+            data = "".join(f"{seq}\t{line}\n" for seq, line in pending)
+            with open(segments[-1], "a", encoding="utf-8") as f:
+                f.write(data)
+
+            for path in segments[:-self.max_segments]:
+                os.remove(path)
+
+    def load(self):
+        """Restore the newest lines and the sequence counter from disk."""
+        if self.spool_dir is None or not os.path.isdir(self.spool_dir):
+            return
+        lines: List[Tuple[int, str]] = []
+        for path in reversed(self._segment_paths()):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                chunk = []
+                for raw in f:
+                    seq, _, line = raw.rstrip("\n").partition("\t")
+                    if seq.isdigit():
+                        chunk.append((int(seq), line))
+            lines = chunk + lines
+            if len(lines) >= self.capacity:
+                break
+
+        if not lines:
+            return
+        lines = lines[-self.capacity:]
+        self.first_seq = self.next_seq = lines[0][0]
+        self._slots = [None] * self.capacity
+        self._bytes = 0
+        for _, line in lines:
+            self._store(line)
+        logger.info(f"Restored {len(self)} console lines (up to #{self.last_seq})")
+
+    def start(self, scheduler: PeriodicScheduler, flush_interval: float = 1.0):
+        if self._job is None and self.spool_dir is not None:
+            self._job = scheduler.add(f"console spool in {self.spool_dir}", flush_interval, self._flush,
+                                      delay=flush_interval)
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush(self):
+        await asyncio.to_thread(self.flush)
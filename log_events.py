@@ -0,0 +1,189 @@
+import re
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Event kinds, stored as small integers in the columnar buffer
+KINDS = ["other", "join", "leave", "chat", "command", "lag", "crash"]
+KIND_IDS = {kind: i for i, kind in enumerate(KINDS)}
+LEVELS = ["", "DEBUG", "INFO", "WARN", "ERROR", "FATAL"]
+LEVEL_IDS = {level: i for i, level in enumerate(LEVELS)}
+
+# Vanilla/Forge: "[12:34:56] [Server thread/INFO]: msg"; Paper console: "[12:34:56 INFO]: msg"
+HEADER_PATTERN = re.compile(
+    r"^\[(\d{2}:\d{2}:\d{2})(?:\] \[([^\]]*?)/(\w+)\]| (\w+)\])(?: \[[^\]]*\])?: (.*)$"
+)
+JOIN_PATTERN = re.compile(r"^(\w{1,16})(?:\[[^\]]*\])? joined the game")
+LEAVE_PATTERN = re.compile(r"^(\w{1,16}) left the game")
+CHAT_PATTERN = re.compile(r"^(?:\[Not Secure\] )?<(\w{1,16})> (.*)$")
+# Bukkit/Paper log player commands explicitly, vanilla only logs command feedback as "[Name: ...]"
+COMMAND_PATTERN = re.compile(r"^(\w{1,16}) issued server command: (.*)$")
+FEEDBACK_PATTERN = re.compile(r"^\[(\w{1,16}): (.*)\]$")
+# Feedback of commands run from the console or over RCON; command blocks ("[@: ...]") don't match \w
+NON_PLAYER_SOURCES = {"Rcon", "Server"}
+LAG_PATTERN = re.compile(r"^Can't keep up! Is the server overloaded\? Running (\d+)ms or (\d+) ticks behind")
+CRASH_PATTERN = re.compile(
+    r"^(?:This crash report has been saved to: .*|Encountered an unexpected exception.*|"
+    r"---- Minecraft Crash Report ----|Preparing crash report.*)$"
+)
+
+ParsedEvent = Tuple[int, int, str, Optional[str], int, str]  # kind, level, thread, player, value, message
+
+
+def parse_line(line: str) -> Optional[ParsedEvent]:
+    """Turn a console line into (kind, level, thread, player, value, message), or None if it has no header."""
+    header = HEADER_PATTERN.match(line.rstrip("\r\n"))
+    if header is None:
+        return None
+    _, thread, level, paper_level, message = header.groups()
+    level_id = LEVEL_IDS.get((level or paper_level).upper(), 0)
+    thread = thread or ""
+
+    # Cheap substring checks decide which (if any) pattern is worth running
+    if "the game" in message:
+        match = JOIN_PATTERN.match(message)
+        if match:
+            return KIND_IDS["join"], level_id, thread, match.group(1), 0, message
+        match = LEAVE_PATTERN.match(message)
+        if match:
+            return KIND_IDS["leave"], level_id, thread, match.group(1), 0, message
+    if message.startswith("<") or message.startswith("[Not Secure]"):
+        match = CHAT_PATTERN.match(message)
+        if match:
+            return KIND_IDS["chat"], level_id, thread, match.group(1), 0, match.group(2)
+    if "issued server command" in message:
+        match = COMMAND_PATTERN.match(message)
+        if match:
+            return KIND_IDS["command"], level_id, thread, match.group(1), 0, match.group(2)
+    if message.startswith("[") and message.endswith("]"):
+        match = FEEDBACK_PATTERN.match(message)
+        if match:
+            source = match.group(1)
+            player = None if source in NON_PLAYER_SOURCES else source
+            return KIND_IDS["command"], level_id, thread, player, 0, match.group(2)
+    if message.startswith("Can't keep up!"):
+        match = LAG_PATTERN.match(message)
+        if match:
+            return KIND_IDS["lag"], level_id, thread, None, int(match.group(1)), message
+    if "crash" in message or "Crash" in message or "unexpected exception" in message:
+        if CRASH_PATTERN.match(message):
+            return KIND_IDS["crash"], level_id, thread, None, 0, message
+    return KIND_IDS["other"], level_id, thread, None, 0, message
+
+
+class EventStore:
+    """Ring buffer of parsed events stored column by column.
+
+    Numeric fields live in typed arrays and repeated strings (threads, player
+    names) are interned to small ids, so an event costs a few bytes plus its
+    message. Sequence numbers increase monotonically; slot = seq % capacity.
+    """
+
+    def __init__(self, capacity: int = 100000, keep_other: bool = False):
+        self.capacity = capacity
+        self.keep_other = keep_other
+        self.ts = array("d", [0.0]) * capacity
+        self.kind = array("B", [0]) * capacity
+        self.level = array("B", [0]) * capacity
+        self.thread = array("I", [0]) * capacity
+        self.player = array("I", [0]) * capacity
+        self.value = array("i", [0]) * capacity
+        self.message: List[Optional[str]] = [None] * capacity
+
+        self._strings: List[Optional[str]] = [None]  # id 0 means "none"
+        self._string_ids: Dict[str, int] = {}
+        self.first_seq = 1
+        self.next_seq = 1
+
+    def __len__(self) -> int:
+        return self.next_seq - self.first_seq
+
+    def _intern(self, value: Optional[str]) -> int:
+        if not value:
+            return 0
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def add(self, event: ParsedEvent, ts: Optional[float] = None) -> Optional[int]:
+        """Store a parsed event and return its sequence number."""
+        kind, level, thread, player, value, message = event
+        if kind == 0 and not self.keep_other:
+            return None
+        seq = self.next_seq
+        if len(self) == self.capacity:
+            self.first_seq += 1
+        i = seq % self.capacity
+        self.ts[i] = time.time() if ts is None else ts
+        self.kind[i] = kind
+        self.level[i] = level
+        self.thread[i] = self._intern(thread)
+        self.player[i] = self._intern(player)
+        self.value[i] = value
+        self.message[i] = message
+        self.next_seq += 1
+        return seq
+
+    def feed(self, line: str, ts: Optional[float] = None) -> Optional[int]:
+        """Parse a console line and store it if it is an interesting event."""
+        event = parse_line(line)
+        if event is None:
+            return None
+        return self.add(event, ts)
+
+    def feed_many(self, lines: Iterable[str], ts: Optional[float] = None) -> int:
+        count = 0
+        for line in lines:
+            if self.feed(line, ts) is not None:
+                count += 1
+        return count
+
+    def query(self, kinds: Optional[Iterable[str]] = None, player: Optional[str] = None,
+              level: Optional[str] = None, after: int = 0, start: Optional[float] = None,
+              end: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Return matching events oldest first.
+
+        Without `after` these are the newest `limit` matches; with `after` the
+        first `limit` matches following that sequence number, so polling
+        clients can page forward without gaps.
+        """
+        kind_ids = {KIND_IDS[k] for k in kinds if k in KIND_IDS} if kinds else None
+        player_id = self._string_ids.get(player, -1) if player else None
+        level_id = LEVEL_IDS.get(level.upper(), -1) if level else None
+        if player_id == -1 or level_id == -1:
+            return []
+
+        result = []
+        first = max(self.first_seq, after + 1)
+        forward = after > 0
+        # Walk towards the requested end so only `limit` matches are materialized
+        seqs = range(first, self.next_seq) if forward else range(self.next_seq - 1, first - 1, -1)
+        for seq in seqs:
+            i = seq % self.capacity
+            if kind_ids is not None and self.kind[i] not in kind_ids:
+                continue
+            if player_id is not None and self.player[i] != player_id:
+                continue
+            if level_id is not None and self.level[i] != level_id:
+                continue
+            ts = self.ts[i]
+            if (end is not None and ts > end) or (start is not None and ts < start):
+                continue
+            result.append({
+                "seq": seq,
+                "time": ts,
+                "kind": KINDS[self.kind[i]],
+                "level": LEVELS[self.level[i]] or None,
+                "thread": self._strings[self.thread[i]],
+                "player": self._strings[self.player[i]],
+                "value": self.value[i],
+                "message": self.message[i],
+            })
+            if len(result) >= limit:
+                break
+        if not forward:
+            result.reverse()
+        return result
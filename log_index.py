@@ -0,0 +1,326 @@
+import os
+import re
+import gzip
+import json
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Rotated logs are named like 2024-05-17-3.log.gz
+ARCHIVE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})-(\d+)\.log\.gz$")
+# [12:34:56] [Server thread/INFO]: message
+LINE_PATTERN = re.compile(r"^\[(\d{2}):(\d{2}):(\d{2})\] \[[^\]]*/(\w+)\]")
+# Indexed terms: whole words of 3-16 word characters, which covers Minecraft player names
+TERM_PATTERN = re.compile(r"(?<!\w)\w{3,16}(?!\w)")
+WORD_PATTERN = re.compile(r"\w+")
+
+BUCKET_SECONDS = 600
+MAX_BLOCK_LINES = 5000
+INDEX_VERSION = 1
+
+
+def archive_sort_key(name: str) -> Tuple[str, int]:
+    match = ARCHIVE_PATTERN.match(name)
+    return (match.group(1), int(match.group(2))) if match else (name, 0)
+
+
+def index_terms(text: str) -> Set[str]:
+    """Words that go into the inverted index (digits-only tokens are skipped)."""
+    return {term.lower() for term in TERM_PATTERN.findall(text) if not term.isdigit()}
+
+
+def build_archive_index(archive_path: str, index_dir: str) -> str:
+    """Index one rotated log archive (runs in a worker process).
+
+    The archive is decompressed once and its lines are regrouped into blocks
+    of at most BUCKET_SECONDS; every block is written as an independent gzip
+    member, so queries can decompress single blocks instead of whole archives.
+    Returns the archive name.
+    """
+    file_name = os.path.basename(archive_path)
+    name = file_name[:-len(".log.gz")]
+    day = datetime.strptime(ARCHIVE_PATTERN.match(file_name).group(1), "%Y-%m-%d")
+    stat = os.stat(archive_path)
+
+    blocks: List[List[float]] = []
+    terms: Dict[str, Set[int]] = defaultdict(set)
+    levels: Dict[str, Set[int]] = defaultdict(set)
+
+    blocks_path = os.path.join(index_dir, f"{name}.blocks")
+    current: List[str] = []
+    block_start = block_end = None
+    bucket = None
+    last_ts = day.timestamp()
+    day_offset = 0
+    last_seconds = -1
+
+    with gzip.open(archive_path, "rt", encoding="utf-8", errors="replace") as src, \
+            open(blocks_path + ".tmp", "wb") as out:
+
+        def flush_block():
+            data = gzip.compress("".join(current).encode("utf-8"), compresslevel=6)
+            blocks.append([block_start, block_end, out.tell(), len(data), len(current)])
+            out.write(data)
+            current.clear()
+
+        for line in src:
+            level = None
+            match = LINE_PATTERN.match(line)
+            if match:
+                seconds = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3))
+                if seconds < last_seconds:
+                    # Clock went backwards: the log crossed midnight
+                    day_offset += 1
+                last_seconds = seconds
+                last_ts = (day + timedelta(days=day_offset, seconds=seconds)).timestamp()
+                level = match.group(4).upper()
+            # Continuation lines (stack traces) keep the previous timestamp
+
+            line_bucket = int(last_ts // BUCKET_SECONDS)
+            if current and (line_bucket != bucket or len(current) >= MAX_BLOCK_LINES):
+                flush_block()
+            if not current:
+                block_start = last_ts
+                bucket = line_bucket
+            block_end = last_ts
+
+            if not line.endswith("\n"):
+                line += "\n"
+            block_id = len(blocks)
+            current.append(f"{last_ts:.0f}\t{line}")
+            if level:
+                levels[level].add(block_id)
+            for term in index_terms(line):
+                terms[term].add(block_id)
+
+        if current:
+            flush_block()
+
+    # The first line is a small header so staleness checks don't have to parse the postings
+    header = {
+        "version": INDEX_VERSION,
+        "name": name,
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+    }
+    meta = {
+        "name": name,
+        "blocks": blocks,
+        "levels": {level: sorted(ids) for level, ids in levels.items()},
+        "terms": {term: sorted(ids) for term, ids in terms.items()},
+    }
+    meta_path = os.path.join(index_dir, f"{name}.json")
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        json.dump(meta, f, separators=(",", ":"))
+    os.replace(blocks_path + ".tmp", blocks_path)
+    os.replace(meta_path + ".tmp", meta_path)
+    return name
+
+
+def read_block(blocks_path: str, offset: int, length: int) -> List[Tuple[float, str]]:
+    """Decompress a single block and return its (timestamp, line) pairs."""
+    with open(blocks_path, "rb") as f:
+        f.seek(offset)
+        data = gzip.decompress(f.read(length)).decode("utf-8", errors="replace")
+    result = []
+    for raw in data.splitlines():
+        ts, _, line = raw.partition("\t")
+        result.append((float(ts), line))
+    return result
+
+
+class ArchiveMeta:
+    """Loaded index of one archive with the postings turned into sets."""
+
+    def __init__(self, meta: Dict[str, Any]):
+        self.name = meta["name"]
+        self.blocks = meta["blocks"]
+        self.levels = {level: set(ids) for level, ids in meta["levels"].items()}
+        self.terms = {term: set(ids) for term, ids in meta["terms"].items()}
+
+
+class LogArchiveIndex:
+    """Background-built index over rotated server/logs/*.log.gz files."""
+
+    def __init__(self, log_dir: str, index_dir: str, workers: int = 1, scan_interval: float = 60.0,
+                 cache_size: int = 16, build: bool = True):
+        self.log_dir = log_dir
+        # Without build only indexes written by another process (the supervisor daemon) are used
+        self.build = build
+        self.index_dir = index_dir
+        self.workers = workers
+        self.scan_interval = scan_interval
+        self.cache_size = cache_size
+        self.indexed: Dict[str, Tuple[int, float]] = {}  # archive name -> (size, mtime) of the source
+        self._cache: "OrderedDict[str, ArchiveMeta]" = OrderedDict()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._job: Optional[PeriodicJob] = None
+
+    # ----- Background indexing -----
+    def start(self, scheduler: PeriodicScheduler):
+        if self._job is None:
+            if self.build:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._job = scheduler.add(f"log archive scan of {self.log_dir}", self.scan_interval, self.refresh)
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _scan(self) -> List[str]:
+        """Find archives whose index is missing or stale and remember the up-to-date ones."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        pending = []
+        if not os.path.isdir(self.log_dir):
+            return pending
+        for file_name in sorted(os.listdir(self.log_dir), key=archive_sort_key):
+            if not ARCHIVE_PATTERN.match(file_name):
+                continue
+            name = file_name[:-len(".log.gz")]
+            stat = os.stat(os.path.join(self.log_dir, file_name))
+            if self.indexed.get(name) == (stat.st_size, stat.st_mtime):
+                continue
+            meta_path = os.path.join(self.index_dir, f"{name}.json")
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        header = json.loads(f.readline())
+                    source = (header["source_size"], header["source_mtime"])
+                    if header["version"] == INDEX_VERSION and source == (stat.st_size, stat.st_mtime):
+                        self.indexed[name] = source
+                        continue
+                except (KeyError, ValueError, OSError):
+                    pass
+            pending.append(os.path.join(self.log_dir, file_name))
+        return pending
+
+    async def refresh(self):
+        """Index new or changed archives in the process pool."""
+        pending = await asyncio.to_thread(self._scan)
+        if not self.build:
+            return
+        loop = asyncio.get_running_loop()
+        for path in pending:
+            try:
+                name = await loop.run_in_executor(self._executor, build_archive_index, path, self.index_dir)
+            except Exception as e:
+                logger.error(f"Error indexing log archive {path}: {str(e)}")
+                continue
+            stat = os.stat(path)
+            self.indexed[name] = (stat.st_size, stat.st_mtime)
+            self._cache.pop(name, None)
+            logger.info(f"Indexed log archive {name}")
+
+    # ----- Queries -----
+    async def _meta(self, name: str) -> ArchiveMeta:
+        meta = self._cache.get(name)
+        if meta is not None:
+            self._cache.move_to_end(name)
+            return meta
+
+        def load():
+            with open(os.path.join(self.index_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+                f.readline()  # header
+                return ArchiveMeta(json.load(f))
+
+        meta = await asyncio.to_thread(load)
+        self._cache[name] = meta
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return meta
+
+    @staticmethod
+    def _candidate_blocks(meta: ArchiveMeta, words: List[str], level: Optional[str],
+                          start: Optional[float], end: Optional[float]) -> List[int]:
+        candidates: Optional[Set[int]] = None
+        for word in words:
+            if TERM_PATTERN.fullmatch(word) and not word.isdigit():
+                postings = meta.terms.get(word, set())
+                candidates = postings if candidates is None else candidates & postings
+        if level:
+            postings = meta.levels.get(level, set())
+            candidates = postings if candidates is None else candidates & postings
+
+        ids = sorted(candidates) if candidates is not None else range(len(meta.blocks))
+        return [
+            block_id for block_id in ids
+            if (start is None or meta.blocks[block_id][1] >= start)
+            and (end is None or meta.blocks[block_id][0] <= end)
+        ]
+
+    async def search(self, q: str = "", start: Optional[float] = None, end: Optional[float] = None,
+                     level: Optional[str] = None, player: Optional[str] = None,
+                     cursor: Optional[str] = None, limit: int = 100) -> AsyncIterator[Dict[str, Any]]:
+        """Yield matching lines in chronological order, then a final {"next": cursor} record.
+
+        `q` and `player` match whole words (case-insensitive). The cursor has
+        the form "<archive>:<block>:<line>" and points at the next line to examine.
+        """
+        words = [word.lower() for word in WORD_PATTERN.findall(q or "")]
+        if player:
+            words.append(player.lower())
+        level = level.upper() if level else None
+
+        resume_name, resume_block, resume_line = None, 0, 0
+        if cursor:
+            try:
+                resume_name, block, line = cursor.rsplit(":", 2)
+                resume_block, resume_line = int(block), int(line)
+            except ValueError:
+                resume_name = None
+
+        names = sorted(self.indexed, key=lambda n: archive_sort_key(f"{n}.log.gz"))
+        if resume_name is not None:
+            names = [n for n in names if archive_sort_key(f"{n}.log.gz") >= archive_sort_key(f"{resume_name}.log.gz")]
+
+        found = 0
+        for name in names:
+            # File names carry the date, so whole archives outside the range are skipped
+            day = datetime.strptime(ARCHIVE_PATTERN.match(f"{name}.log.gz").group(1), "%Y-%m-%d").timestamp()
+            if end is not None and day > end:
+                break
+            meta = await self._meta(name)
+            blocks_path = os.path.join(self.index_dir, f"{name}.blocks")
+
+            for block_id in self._candidate_blocks(meta, words, level, start, end):
+                if name == resume_name and block_id < resume_block:
+                    continue
+                _, _, offset, length, _ = meta.blocks[block_id]
+                lines = await asyncio.to_thread(read_block, blocks_path, offset, length)
+
+                first_line = resume_line if (name == resume_name and block_id == resume_block) else 0
+                for line_no in range(first_line, len(lines)):
+                    ts, line = lines[line_no]
+                    if (start is not None and ts < start) or (end is not None and ts > end):
+                        continue
+                    match = LINE_PATTERN.match(line)
+                    if level and (not match or match.group(4).upper() != level):
+                        continue
+                    if words:
+                        line_words = {word.lower() for word in WORD_PATTERN.findall(line)}
+                        if not all(word in line_words for word in words):
+                            continue
+
+                    if found == limit:
+                        yield {"next": f"{name}:{block_id}:{line_no}"}
+                        return
+                    found += 1
+                    yield {
+                        "time": datetime.fromtimestamp(ts).isoformat(),
+                        "file": name,
+                        "level": match.group(4).upper() if match else None,
+                        "line": line,
+                    }
+        yield {"next": None}
@@ -0,0 +1,121 @@
+import os
+import base64
+import binascii
+from typing import List, Optional, Tuple, NamedTuple
+
+# Size of the blocks read backwards from the end of the file
+BLOCK_SIZE = 64 * 1024
+# Upper bound for a single incremental read so one request can't pull in the whole file
+MAX_CHUNK_BYTES = 1024 * 1024
+
+
+class LogCursor(NamedTuple):
+    """Position in a specific log file (identified by inode)."""
+    inode: int
+    offset: int
+
+
+class LogChunk(NamedTuple):
+    lines: List[str]
+    cursor: Optional[str]
+    reset: bool  # True if the file was rotated/truncated since the given cursor
+
+
+def encode_cursor(cursor: LogCursor) -> str:
+    """Encode a cursor into an opaque URL-safe token."""
+    raw = f"{cursor.inode}:{cursor.offset}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[LogCursor]:
+    """Decode a cursor token, returning None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        inode, offset = raw.split(":", 1)
+        cursor = LogCursor(int(inode), int(offset))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if cursor.offset < 0:
+        return None
+    return cursor
+
+
+def _decode_lines(data: bytes) -> List[str]:
+    """Decode raw bytes into lines the same way text-mode readlines() would."""
+    text = data.decode("utf-8", errors="replace").replace("\r\n", "\n")
+    return text.splitlines(keepends=True)
+
+
+def tail_lines(path: str, max_lines: int, end: Optional[int] = None) -> LogChunk:
+    """Return the last max_lines lines before `end` (default EOF) by seeking backwards in blocks."""
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        end = st.st_size if end is None else min(end, st.st_size)
+        pos = end
+        blocks: List[bytes] = []
+        newlines = 0
+
+        # One extra newline is needed so that the first returned line is complete
+        while pos > 0 and newlines <= max_lines:
+            size = min(BLOCK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+
+    data = b"".join(reversed(blocks))
+    lines = _decode_lines(data)
+    if pos > 0 and lines:
+        # The first line started before the data we read
+        lines = lines[1:]
+
+    cursor = encode_cursor(LogCursor(st.st_ino, end))
+    return LogChunk(lines[-max_lines:] if max_lines > 0 else [], cursor, False)
+
+
+def read_since(path: str, token: str, max_lines: int, end: Optional[int] = None) -> LogChunk:
+    """Return complete lines appended after the cursor, detecting rotation and truncation."""
+    cursor = decode_cursor(token)
+    if cursor is None:
+        return tail_lines(path, max_lines, end)
+
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        reset = st.st_ino != cursor.inode or st.st_size < cursor.offset
+        offset = 0 if reset else cursor.offset
+
+        end = st.st_size if end is None else min(max(end, offset), st.st_size)
+        f.seek(offset)
+        data = f.read(min(end - offset, MAX_CHUNK_BYTES))
+
+    # Only hand out complete lines; a partial last line is returned on the next read
+    last_newline = data.rfind(b"\n")
+    if last_newline == -1:
+        consumed = 0 if len(data) < MAX_CHUNK_BYTES else len(data)
+    else:
+        consumed = last_newline + 1
+
+    # Stop after the first max_lines lines; the cursor points right after them, so the rest
+    # comes with the next read instead of being skipped
+    if max_lines > 0:
+        end_of_line = 0
+        for _ in range(max_lines):
+            newline = data.find(b"\n", end_of_line, consumed)
+            if newline == -1:
+                break
+            end_of_line = newline + 1
+        else:
+            consumed = end_of_line
+
+    lines = _decode_lines(data[:consumed]) if max_lines > 0 else []
+    return LogChunk(lines, encode_cursor(LogCursor(st.st_ino, offset + consumed)), reset)
+
+
+def read_log(path: str, max_lines: int, since: Optional[str] = None, end: Optional[int] = None) -> LogChunk:
+    """Read the tail of the log, or only what was appended after `since` if given."""
+    if since:
+        return read_since(path, since, max_lines, end)
+    return tail_lines(path, max_lines, end)
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+from log_reader import decode_cursor, read_log, tail_lines
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Maximum number of lines picked up from the file in one poll
+READ_BATCH_LINES = 1000
+# Batches read in one poll before yielding; the rest of a burst comes with the next poll
+MAX_POLL_BATCHES = 50
+
+LogBatch = Tuple[str, List[str]]
+
+
+class LogSubscription:
+    """A single client's bounded queue of log batches."""
+
+    def __init__(self, max_batches: int):
+        self.queue: "asyncio.Queue[Optional[LogBatch]]" = asyncio.Queue(maxsize=max_batches)
+        self.dropped = False
+
+    def push(self, batch: LogBatch) -> bool:
+        """Queue a batch without waiting; returns False if the client can't keep up."""
+        try:
+            self.queue.put_nowait(batch)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        """Mark the subscription as dropped and wake up its reader."""
+        self.dropped = True
+        # Make room for the sentinel so the reader always sees it
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> Optional[LogBatch]:
+        """Wait for the next batch; raises asyncio.TimeoutError if nothing arrives in time."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class LogBroadcaster:
+    """Tails a log file once and fans new lines out to all subscribers."""
+
+    def __init__(self, path: str, poll_interval: float = 0.5, max_batches: int = 100):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_batches = max_batches
+        self.subscribers: Set[LogSubscription] = set()
+        self.cursor: Optional[str] = None
+        self._job: Optional[PeriodicJob] = None
+        self._lock = asyncio.Lock()
+
+    def start(self, scheduler: PeriodicScheduler):
+        if self._job is None:
+            self._job = scheduler.add(f"log tail of {self.path}", self.poll_interval, self._poll)
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        for sub in list(self.subscribers):
+            sub.close()
+        self.subscribers.clear()
+
+    async def subscribe(self, max_lines: int, since: Optional[str] = None) -> Tuple[LogSubscription, LogBatch]:
+        """Register a subscriber and return it with its initial lines (tail, or resume from `since`).
+
+        The initial lines end exactly at the broadcaster's cursor, so batches
+        published afterwards continue without gaps or duplicates.
+        """
+        async with self._lock:
+            if self.cursor is None or since:
+                await self._advance()
+
+            lines: List[str] = []
+            if self.cursor is not None:
+                end = decode_cursor(self.cursor).offset
+                chunk = await asyncio.to_thread(read_log, self.path, max_lines, since, end)
+                if chunk.cursor != self.cursor:
+                    # The client is more than max_lines behind: it gets the latest lines instead
+                    chunk = await asyncio.to_thread(tail_lines, self.path, max_lines, end)
+                lines = chunk.lines
+
+            sub = LogSubscription(self.max_batches)
+            self.subscribers.add(sub)
+            return sub, (self.cursor or "", lines)
+
+    def unsubscribe(self, sub: LogSubscription):
+        self.subscribers.discard(sub)
+
+    def publish(self, batch: LogBatch):
+        """Hand a batch to every subscriber, dropping the ones whose queue is full."""
+        for sub in list(self.subscribers):
+            if not sub.push(batch):
+                logger.warning("Dropping slow log stream subscriber")
+                self.unsubscribe(sub)
+                sub.close()
+
+    async def _advance(self):
+        """Read whatever was appended since the cursor and publish it."""
+        if not os.path.exists(self.path):
+            return
+
+        if self.cursor is None:
+            chunk = await asyncio.to_thread(tail_lines, self.path, 0)
+            self.cursor = chunk.cursor
+            return
+
+        # A burst (startup, stack traces) can be larger than one batch; keep reading until caught up
+        for _ in range(MAX_POLL_BATCHES):
+            chunk = await asyncio.to_thread(read_log, self.path, READ_BATCH_LINES, self.cursor)
+            if chunk.cursor == self.cursor:
+                return
+            self.cursor = chunk.cursor
+            if chunk.lines:
+                self.publish((chunk.cursor, chunk.lines))
+
+    async def _poll(self):
+        async with self._lock:
+            if not self.subscribers:
+                # Nobody is listening: forget the position so we don't replay stale lines later
+                self.cursor = None
+                return
+            await self._advance()
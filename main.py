@@ -1,21 +1,39 @@
 import os
+import time
 import asyncio
-import subprocess
 import secrets
+import json
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime, timedelta
 
 import httpx
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Response, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
 from starlette.middleware.sessions import SessionMiddleware
 from pydantic import BaseModel, EmailStr
-from mcrcon import MCRcon
+
+from auth import AccessControl, ApiError
+from backups import BackupError
+from diagnostics import DiagnosticsError
+from instances import ServerInstance, ServerRegistry
+from log_reader import LogChunk, decode_cursor, read_log
+from log_stream import LogSubscription
+from metrics import RESOLUTIONS, prometheus_text
+from oauth import GOOGLE_DISCOVERY_URL, OAuthError, OpenIDProvider, create_http_client, email_verified
+import perf
+from perf import InstrumentedExecutor, PerfMiddleware, SpanMiddleware
+from pregen import PregenError, PregenRequest
+from rcon import RconBatchError, RconUnavailableError
+from scheduler import PeriodicScheduler
+from schedules import ScheduleError, ScheduledTask
+from state_store import TokenBucketLimiter, open_store
+from server_control import load_server_configs
+from static_assets import StaticAssets
 
 # Configure logging
 logging.basicConfig(
@@ -32,12 +50,61 @@ logger = logging.getLogger("minecraft-server-api")
 load_dotenv()
 
 # Constants
-SERVER_DIR = "server"
-LOG_FILE = os.path.join(SERVER_DIR, "logs", "latest.log")
+DATA_DIR = os.getenv("DATA_DIR", "data")
+# JSON list of servers (see ServerConfig); without it one server is configured by SERVER_DIR, RCON_HOST...
+SERVERS_CONFIG = os.getenv("SERVERS_CONFIG", os.path.join(DATA_DIR, "servers.json"))
 SESSION_LIFETIME = 7  # days
 MAX_RECENT_COMMANDS = 10
-COMMAND_COOLDOWN = 1  # seconds
+STATE_TOKEN_TTL = 10 * 60  # seconds
+# Token buckets: commands per second and burst size, per user and for all users together
+COMMAND_RATE = float(os.getenv("COMMAND_RATE", "1"))
+COMMAND_BURST = float(os.getenv("COMMAND_BURST", "1"))
+GLOBAL_COMMAND_RATE = float(os.getenv("GLOBAL_COMMAND_RATE", "20"))
+GLOBAL_COMMAND_BURST = float(os.getenv("GLOBAL_COMMAND_BURST", "40"))
+# With a supervisor daemon (see daemon.py) the API is stateless and may run several workers
+SUPERVISOR_SOCKET = os.getenv("SUPERVISOR_SOCKET")
+# "sqlite" shares login state and rate limits between several API workers on one host
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite" if SUPERVISOR_SOCKET else "memory")
+LOG_STREAM_KEEPALIVE = 15  # seconds
+MAX_BATCH_COMMANDS = int(os.getenv("MAX_BATCH_COMMANDS", "50"))
+# Only enable for servers that accept several RCON packets per socket read
+RCON_PIPELINE = os.getenv("RCON_PIPELINE", "false").lower() == "true"
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://minecraft.bohdan.lol/")
+MAX_PROFILE_SECONDS = 300
+# JSON responses (logs, metrics, history...) larger than this are gzipped
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+# Regions whose every chunk saw players for less than this many ticks are pruning candidates
+PRUNE_INHABITED_TICKS = int(os.getenv("PRUNE_INHABITED_TICKS", str(20 * 60)))
+
+# Request instrumentation is off unless enabled here or at runtime via /api/debug/perf
+perf.enabled = os.getenv("PERF_INSTRUMENTATION", "false").lower() == "true"
+
+
+def load_session_secret() -> str:
+    """Return SESSION_SECRET, or a generated secret persisted in DATA_DIR.
+
+    Every worker (and every restart) must sign cookies with the same key, so
+    the secret is created once; os.link makes the creation atomic when
+    several workers start at the same time.
+    """
+    secret = os.getenv("SESSION_SECRET")
+    if secret:
+        return secret
+    path = os.path.join(DATA_DIR, "session_secret")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(secrets.token_urlsafe(32))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass  # another worker won the race
+        finally:
+            os.remove(tmp_path)
+    with open(path, "r") as f:
+        return f.read().strip()
+
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -46,10 +113,12 @@ app = FastAPI(
     version="2.0.0"
 )
 
-# Add session middleware with proper configuration
+# Add session middleware with proper configuration (cookie decoding is timed as the "session" span)
 app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.getenv("SESSION_SECRET", secrets.token_urlsafe(32)),
+    SpanMiddleware,
+    wrapped=SessionMiddleware,
+    span_name="session",
+    secret_key=load_session_secret(),
     max_age=SESSION_LIFETIME * 24 * 60 * 60,  # Convert days to seconds
     same_site="lax",  # Prevent CSRF
     https_only=True  # Ensure secure cookies
@@ -67,17 +136,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-# Mount static files with caching headers
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
-app.mount("/img", StaticFiles(directory="frontend/img"), name="img")
+# Static assets are precompressed and carry their own Content-Encoding, which this leaves alone
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6)
+
+# Outermost, so route latency includes every other middleware
+app.add_middleware(PerfMiddleware)
+
+# Frontend files, compressed once on startup and served from memory with caching headers
+static_assets = StaticAssets("frontend", {"/static": "", "/img": "img"})
+
+# Role membership (AUTHORIZED_USERS, VIEWER_USERS, ADMIN_USERS and the optional
+# ACCESS_CONFIG_FILE), computed once and reloaded when the file changes
+access_control = AccessControl(os.getenv("ACCESS_CONFIG_FILE", os.path.join(DATA_DIR, "access.json")))
+require_viewer = access_control.require("viewer")
+require_operator = access_control.require("operator")
+require_admin = access_control.require("admin")
+# The status endpoint has always answered anonymous requests with {"authenticated": false}
+require_status_viewer = access_control.require("viewer", unauthenticated={"authenticated": False})
+
+
+@app.exception_handler(ApiError)
+async def api_error_handler(request: Request, exc: ApiError):
+    return JSONResponse(exc.content, status_code=exc.status_code)
+
 
 # Global variables
-server_process: Optional[subprocess.Popen] = None
-state_tokens: Dict[str, Dict[str, Any]] = {}
-recent_commands: List[Dict[str, Any]] = []
-last_command_time: Dict[str, datetime] = {}
+state_db = os.path.join(DATA_DIR, "state.db")
+state_tokens = open_store(STATE_BACKEND, "oauth_state", state_db, max_size=10000)
+command_limiter = TokenBucketLimiter(
+    open_store(STATE_BACKEND, "rate_limit", state_db, max_size=10000),
+    COMMAND_RATE, COMMAND_BURST, GLOBAL_COMMAND_RATE, GLOBAL_COMMAND_BURST
+)
+# Shared outgoing HTTP client and cached OpenID metadata, created on startup
+http_client: Optional[httpx.AsyncClient] = None
+openid_provider: Optional[OpenIDProvider] = None
+# Default executor of the event loop, so asyncio.to_thread usage shows up in /api/debug/perf
+thread_executor = InstrumentedExecutor(thread_name_prefix="asyncio")
+
+# Log tails, metrics sampling, spool flushes and archive scans of every server run from one task
+scheduler = PeriodicScheduler()
+
+# Every server's process, console, events, metrics and command journal exist once per host:
+# in this process, or in the supervisor daemon when workers share it
+servers = ServerRegistry(load_server_configs(SERVERS_CONFIG, DATA_DIR), SUPERVISOR_SOCKET)
+
+
+def get_instance(server_id: Optional[str] = None) -> ServerInstance:
+    """The server of /api/servers/{server_id}/...; the /api/server/... routes use the default one."""
+    instance = servers.get(server_id)
+    if instance is None:
+        raise ApiError(status.HTTP_404_NOT_FOUND, {"status": "Сервер не найден"})
+    return instance
 
 
 # ----- Models -----
@@ -85,6 +197,10 @@ class CommandRequest(BaseModel):
     command: str
 
 
+class BatchCommandRequest(BaseModel):
+    commands: List[str]
+
+
 class UserInfo(BaseModel):
     email: EmailStr
     name: str
@@ -94,6 +210,7 @@ class UserInfo(BaseModel):
 class UserResponse(BaseModel):
     authenticated: bool
     authorized: bool = False
+    role: Optional[str] = None
     name: Optional[str] = None
     email: Optional[str] = None
     picture: Optional[str] = None
@@ -101,122 +218,77 @@ class UserResponse(BaseModel):
 
 
 # ----- Helper functions -----
-def get_authorized_emails() -> List[str]:
-    """Get list of authorized email addresses from environment variable."""
-    auth_emails = os.getenv("AUTHORIZED_USERS", "")
-    if not auth_emails:
-        return []
-    return [email.strip().lower() for email in auth_emails.split(",")]
-
-
-async def send_command(command: str) -> str:
-    """Send command to Minecraft server via RCON with proper error handling."""
-    try:
-        host = os.getenv("RCON_HOST", "localhost")
-        password = os.getenv("RCON_PASSWORD", "")
-        port = int(os.getenv("RCON_PORT", "25575"))
-
-        # Execute in thread pool to avoid blocking
-        def execute_rcon():
-            with MCRcon(host, password, port) as mcr:
-                return mcr.command(command)
-
-        return await asyncio.to_thread(execute_rcon)
-    except ConnectionRefusedError:
+def rcon_error_message(error: BaseException) -> str:
+    """Turn an RCON failure into a message for the console."""
+    if isinstance(error, (ConnectionRefusedError, RconUnavailableError)):
         logger.error(f"RCON connection refused. Is the server running?")
         return "[Система]: Сервер не принимает RCON-подключения. Возможно, сервер не запущен."
-    except TimeoutError:
+    if isinstance(error, TimeoutError):
         logger.error(f"RCON connection timed out")
         return "[Система]: Превышено время ожидания RCON-соединения."
-    except Exception as e:
-        logger.error(f"RCON error: {str(e)}")
-        return f"[Система]: Ошибка RCON: {str(e)}"
-
-
-async def get_current_user(request: Request) -> Optional[Dict[str, Any]]:
-    """Check user authorization from session data."""
-    if "user" not in request.session:
-        return None
+    logger.error(f"RCON error: {str(error)}")
+    return f"[Система]: Ошибка RCON: {str(error)}"
 
-    user = request.session["user"]
 
-    # Check if user email is in the list of authorized emails
-    authorized_emails = get_authorized_emails()
+async def send_command(instance: ServerInstance, command: str) -> str:
+    """Send command to Minecraft server via RCON with proper error handling."""
+    try:
+        # Uses the persistent connection pool instead of connecting per command
+        with perf.span("rcon"):
+            return await instance.rcon_client.command(command)
+    except Exception as e:
+        return rcon_error_message(e)
 
-    # If no authorized emails are specified, consider all users authorized
-    if not authorized_emails:
-        return user
 
-    if user["email"].lower() in authorized_emails:
-        return user
+async def read_log_file(instance: ServerInstance, max_lines: int = 50, since: Optional[str] = None) -> LogChunk:
+    """Read the tail of the log file, or only the lines appended after the `since` cursor."""
+    log_file = instance.config.log_file
+    if not os.path.exists(log_file):
+        return LogChunk([], since, False)
 
-    # If email is not in the list, user is not authorized
-    return user  # Return user info but authorization check will be done separately
+    try:
+        # Seek from the end in a worker thread instead of reading the whole file
+        with perf.span("file_io"):
+            return await asyncio.to_thread(read_log, log_file, max_lines, since)
+    except Exception as e:
+        logger.error(f"Error reading log file: {str(e)}")
+        return LogChunk([f"[Система]: Ошибка чтения логов: {str(e)}"], since, False)
 
 
-async def check_command_rate_limit(email: str) -> bool:
-    """Check if the user has sent a command too recently."""
-    now = datetime.now()
-    if email in last_command_time:
-        time_since_last = (now - last_command_time[email]).total_seconds()
-        if time_since_last < COMMAND_COOLDOWN:
-            return False
+def log_etag(instance: ServerInstance, *position) -> str:
+    return '"' + "-".join(str(part) for part in (instance.id, *position)) + '"'
 
-    last_command_time[email] = now
-    return True
 
+def etag_matches(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
 
-async def read_log_file(max_lines: int = 50) -> List[str]:
-    """Read the latest log file asynchronously."""
-    if not os.path.exists(LOG_FILE):
-        return []
 
-    try:
-        # Use async file operations to avoid blocking
-        def read_logs():
-            with open(LOG_FILE, "r", encoding="utf-8", errors="replace") as f:
-                lines = f.readlines()
-                return lines[-max_lines:] if lines else []
-
-        return await asyncio.to_thread(read_logs)
-    except Exception as e:
-        logger.error(f"Error reading log file: {str(e)}")
-        return [f"[Система]: Ошибка чтения логов: {str(e)}"]
+# ----- Routes -----
+@app.api_route("/", methods=["GET", "HEAD"])
+async def get_index(request: Request):
+    """Serve the main page."""
+    return static_assets.response(request, "index.html")
 
 
-async def clean_expired_tokens():
-    """Remove expired state tokens."""
-    now = datetime.now()
-    expired = [
-        token for token, data in state_tokens.items()
-        if now - data["created"] > timedelta(minutes=10)
-    ]
-    for token in expired:
-        state_tokens.pop(token, None)
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def get_static(request: Request, path: str):
+    return static_assets.response(request, path)
 
 
-# ----- Routes -----
-@app.get("/")
-async def get_index():
-    """Serve the main page."""
-    return FileResponse("frontend/index.html")
+@app.api_route("/img/{path:path}", methods=["GET", "HEAD"])
+async def get_image(request: Request, path: str):
+    return static_assets.response(request, f"img/{path}")
 
 
 @app.get("/api/user")
 async def get_user_info(request: Request) -> UserResponse:
     """Return information about the current user."""
-    # First check if user exists in session
-    if "user" not in request.session:
+    user, role = access_control.resolve(request)
+    if not user:
         return UserResponse(authenticated=False)
 
-    user = request.session["user"]
-    authorized_emails = get_authorized_emails()
-
-    # Check if user is authorized
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-
     # Return appropriate response
-    if not is_authorized:
+    if role is None:
         return UserResponse(
             authenticated=True,
             authorized=False,
@@ -229,6 +301,7 @@ async def get_user_info(request: Request) -> UserResponse:
     return UserResponse(
         authenticated=True,
         authorized=True,
+        role=role,
         name=user["name"],
         email=user["email"],
         picture=user["picture"]
@@ -242,71 +315,53 @@ async def logout_user(request: Request):
     return JSONResponse({"status": "success", "message": "Вы вышли из системы"})
 
 
-@app.get("/api/server/status")
-async def server_status(request: Request):
-    """Check if the server is running."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"authenticated": False}, status_code=401)
+@app.get("/api/servers")
+async def list_servers(request: Request, user: Dict[str, Any] = Depends(require_viewer)):
+    """List the registered servers with their state."""
+    states = await asyncio.gather(*(instance.server.status() for instance in servers), return_exceptions=True)
+    return JSONResponse({
+        "servers": [
+            {
+                "id": instance.id,
+                "name": instance.name,
+                "default": instance is servers.default,
+                "status": ("unknown" if isinstance(state, Exception)
+                           else "running" if state["running"] else "stopped"),
+                "server": None if isinstance(state, Exception) else state["server"],
+            }
+            for instance, state in zip(servers, states)
+        ]
+    })
 
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
 
-    global server_process
-    is_running = server_process is not None and server_process.poll() is None
+@app.get("/api/server/status")
+@app.get("/api/servers/{server_id}/status")
+async def server_status(request: Request, instance: ServerInstance = Depends(get_instance),
+                        user: Dict[str, Any] = Depends(require_status_viewer)):
+    """Check if the server is running."""
+    state = await instance.server.status()
+    uptime = state["uptime"]
 
     return JSONResponse({
-        "status": "running" if is_running else "stopped",
-        "uptime": "Unknown"  # Could be enhanced to track actual uptime
+        "status": "running" if state["running"] else "stopped",
+        "uptime": str(timedelta(seconds=int(uptime))) if uptime is not None else "Unknown",
+        "server": state["server"],
+        "rcon": instance.rcon_client.health()
     })
 
 
 @app.post("/api/server/start")
-async def start_server(request: Request):
+@app.post("/api/servers/{server_id}/start")
+async def start_server(request: Request, instance: ServerInstance = Depends(get_instance),
+                       user: Dict[str, Any] = Depends(require_operator)):
     """Start the Minecraft server."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
-
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
-
-    global server_process
-
-    # Check if server is already running
-    if server_process and server_process.poll() is None:
-        return JSONResponse({"status": "Сервер уже работает"}, status_code=400)
-
     try:
-        # Java path with more flexible configuration
-        java_path = os.getenv("JAVA_PATH", r"server\CustomJAVA\bin\java.exe")
-        java_args = os.getenv("JAVA_ARGS", "-Xmx5000M -Xms5000M").split()
-        server_jar = os.getenv("SERVER_JAR", "server.jar")
-
-        # Build command line arguments
-        cmd = [java_path] + java_args + ["-jar", server_jar, "nogui"]
-
-        # Log the command being executed
-        logger.info(f"Starting server with command: {' '.join(cmd)}")
-
-        # Start server process
-        server_process = subprocess.Popen(
-            cmd,
-            cwd=SERVER_DIR,
-            creationflags=subprocess.CREATE_NEW_CONSOLE
-        )
+        # Start server process; readiness is tracked by the supervisor in the background
+        if not await instance.server.start_server():
+            return JSONResponse({"status": "Сервер уже работает"}, status_code=400)
 
-        # Add to recent commands
-        recent_commands.append({
-            "user": user["email"],
-            "command": "start",
-            "timestamp": datetime.now().isoformat(),
-            "result": "success"
-        })
+        # Add to the command history
+        await instance.server.record_command(user["email"], "start")
 
         return JSONResponse({"status": "Сервер запущен"})
     except Exception as e:
@@ -318,53 +373,23 @@ async def start_server(request: Request):
 
 
 @app.post("/api/server/stop")
-async def stop_server(request: Request):
+@app.post("/api/servers/{server_id}/stop")
+async def stop_server(request: Request, instance: ServerInstance = Depends(get_instance),
+                      user: Dict[str, Any] = Depends(require_operator)):
     """Stop the Minecraft server gracefully."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
-
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
-
-    global server_process
-
-    if not server_process or server_process.poll() is not None:
-        return JSONResponse({"status": "Сервер не запущен"}, status_code=400)
-
     try:
-        # Try to stop server gracefully using RCON
-        stop_result = await send_command("stop")
-        logger.info(f"RCON stop command result: {stop_result}")
+        # Stop gracefully using RCON and wait for the process to exit without blocking the loop
+        if not await instance.server.stop_server():
+            return JSONResponse({"status": "Сервер не запущен"}, status_code=400)
 
-        # Wait for process to terminate (with timeout)
-        try:
-            server_process.wait(timeout=30)
-        except subprocess.TimeoutExpired:
-            logger.warning("Server didn't stop gracefully, forcing termination")
-            server_process.terminate()
-            try:
-                server_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                logger.error("Server process couldn't be terminated, killing it")
-                server_process.kill()
-
-        server_process = None
-
-        # Add to recent commands
-        recent_commands.append({
-            "user": user["email"],
-            "command": "stop",
-            "timestamp": datetime.now().isoformat(),
-            "result": "success"
-        })
+        # Add to the command history
+        await instance.server.record_command(user["email"], "stop")
 
         # Optionally clear logs
-        if os.path.exists(LOG_FILE) and os.getenv("CLEAR_LOGS_ON_STOP").lower() == "true":
+        log_file = instance.config.log_file
+        if os.path.exists(log_file) and os.getenv("CLEAR_LOGS_ON_STOP", "false").lower() == "true":
             try:
-                os.remove(LOG_FILE)
+                os.remove(log_file)
             except Exception as e:
                 logger.error(f"Error removing log file: {str(e)}")
 
@@ -378,37 +403,22 @@ async def stop_server(request: Request):
 
 
 @app.post("/api/server/restart")
-async def restart_server(request: Request):
+@app.post("/api/servers/{server_id}/restart")
+async def restart_server(request: Request, instance: ServerInstance = Depends(get_instance),
+                         user: Dict[str, Any] = Depends(require_operator)):
     """Restart the Minecraft server."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
-
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
-
     try:
         # Try to stop server first
-        stop_response = await stop_server(request)
+        stop_response = await stop_server(request, instance, user)
 
         if stop_response.status_code not in (200, 400):
             return stop_response
 
-        # Wait a bit to ensure server process is fully terminated
-        await asyncio.sleep(2)
-
         # Start server again
-        start_response = await start_server(request)
-
-        # Add to recent commands
-        recent_commands.append({
-            "user": user["email"],
-            "command": "restart",
-            "timestamp": datetime.now().isoformat(),
-            "result": "success"
-        })
+        start_response = await start_server(request, instance, user)
+
+        # Add to the command history
+        await instance.server.record_command(user["email"], "restart")
 
         return start_response
     except Exception as e:
@@ -420,19 +430,12 @@ async def restart_server(request: Request):
 
 
 @app.post("/api/server/command")
-async def execute_command(command_req: CommandRequest, request: Request):
+@app.post("/api/servers/{server_id}/command")
+async def execute_command(command_req: CommandRequest, request: Request, instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_operator)):
     """Execute a command on the Minecraft server via RCON."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
-
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
-
     # Check rate limit
-    if not await check_command_rate_limit(user["email"]):
+    if not await command_limiter.acquire(user["email"]):
         return JSONResponse(
             {"status": "Слишком много команд. Подождите немного."},
             status_code=429
@@ -445,19 +448,12 @@ async def execute_command(command_req: CommandRequest, request: Request):
 
     try:
         # Execute command via RCON
-        response = await send_command(command)
-
-        # Add to recent commands history
-        recent_commands.append({
-            "user": user["email"],
-            "command": command,
-            "timestamp": datetime.now().isoformat(),
-            "result": "success"
-        })
+        started = time.perf_counter()
+        response = await send_command(instance, command)
 
-        # Maintain max length of recent commands
-        if len(recent_commands) > MAX_RECENT_COMMANDS:
-            recent_commands.pop(0)
+        # Add to the command history
+        await instance.server.record_command(user["email"], command, "success", response,
+                                             time.perf_counter() - started)
 
         return JSONResponse({
             "command": command,
@@ -472,27 +468,115 @@ async def execute_command(command_req: CommandRequest, request: Request):
         )
 
 
-@app.get("/api/server/logs")
-async def get_logs(request: Request, lines: int = 50 ):
-    """Return the latest lines from the server log file."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
+@app.post("/api/server/commands/batch")
+@app.post("/api/servers/{server_id}/commands/batch")
+async def execute_command_batch(batch_req: BatchCommandRequest, request: Request,
+                                instance: ServerInstance = Depends(get_instance),
+                                user: Dict[str, Any] = Depends(require_operator)):
+    """Execute an ordered list of commands over a single RCON connection."""
+    commands = [command.strip() for command in batch_req.commands if command.strip()]
+    if not commands:
+        return JSONResponse({"status": "Пустой список команд"}, status_code=400)
+    if len(commands) > MAX_BATCH_COMMANDS:
+        return JSONResponse(
+            {"status": f"Слишком много команд в пакете (максимум {MAX_BATCH_COMMANDS})"},
+            status_code=400
+        )
 
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
+    # The whole batch counts as a single command for rate limiting
+    if not await command_limiter.acquire(user["email"]):
+        return JSONResponse(
+            {"status": "Слишком много команд. Подождите немного."},
+            status_code=429
+        )
+
+    logger.info(f"User {user['email']} executing batch of {len(commands)} commands")
 
+    error_message = None
+    try:
+        with perf.span("rcon"):
+            completed = await instance.rcon_client.batch(commands, pipelined=RCON_PIPELINE)
+    except RconBatchError as e:
+        completed = e.completed
+        error_message = rcon_error_message(e.error)
+    except Exception as e:
+        completed = []
+        error_message = rcon_error_message(e)
+
+    results = []
+    for index, command in enumerate(commands):
+        if index < len(completed):
+            response, duration = completed[index]
+            result = {"command": command, "response": response, "status": "success",
+                      "duration_ms": round(duration * 1000, 2)}
+        else:
+            result = {"command": command, "response": error_message, "status": "error",
+                      "duration_ms": None}
+        results.append(result)
+
+        # Add to the command history
+        await instance.server.record_command(user["email"], command, result["status"], result["response"],
+                                             completed[index][1] if index < len(completed) else None)
+
+    return JSONResponse({
+        "results": results,
+        "status": "success" if error_message is None else "error"
+    })
+
+
+@app.get("/api/server/logs")
+@app.get("/api/servers/{server_id}/logs")
+async def get_logs(request: Request, lines: int = 50, since: Optional[str] = None, after: Optional[int] = None,
+                   instance: ServerInstance = Depends(get_instance), user: Dict[str, Any] = Depends(require_viewer)):
+    """Return the latest server console lines.
+
+    Output captured from the server process is served from memory and can be
+    resumed with `after=<seq>`; otherwise the log file is read, resumable
+    with the `since` cursor.
+
+    The ETag names the position the response brings the client to, so a
+    poll that sends its last position together with If-None-Match gets an
+    empty 304 until new lines arrive.
+    """
     try:
         # Limit maximum lines to prevent abuse
         max_lines = min(lines, 500)
-        log_lines = await read_log_file(max_lines)
 
-        if not log_lines:
+        console = await instance.server.console_lines(after, max_lines) if not since else None
+        if console is not None and console["size"]:
+            current = log_etag(instance, "c", console["last_seq"])
+            if after is not None and etag_matches(request, current):
+                return Response(status_code=304, headers={"ETag": current})
+
+            entries = console["lines"]
+            if not entries and after is None:
+                return Response(status_code=204)  # No content
+
+            seq = entries[-1][0] if entries else console["last_seq"]
+            return perf.JSONResponse({
+                "logs": [line for _, line in entries],
+                "seq": seq,
+                "reset": console["reset"]
+            }, headers={"ETag": log_etag(instance, "c", seq)})
+
+        # Size and mtime change with every write, so an unchanged file is answered without reading it
+        try:
+            st = os.stat(instance.config.log_file)
+            etag = log_etag(instance, "f", st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            st = etag = None
+        if etag is not None and since and etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        chunk = await read_log_file(instance, max_lines, since)
+
+        if not chunk.lines and not since:
             return Response(status_code=204)  # No content
 
-        return JSONResponse({"logs": log_lines})
+        # Without the ETag a client that only got part of the new lines comes back for the rest
+        cursor = decode_cursor(chunk.cursor)
+        headers = {"ETag": etag} if etag is not None and cursor is not None and cursor.offset >= st.st_size else None
+        return perf.JSONResponse({"logs": chunk.lines, "cursor": chunk.cursor, "reset": chunk.reset}, headers=headers)
     except Exception as e:
         logger.error(f"Error reading logs: {str(e)}")
         return JSONResponse(
@@ -501,33 +585,511 @@ async def get_logs(request: Request, lines: int = 50 ):
         )
 
 
+def format_sse_batch(cursor: str, lines: List[str]) -> str:
+    """Format a batch of log lines as one Server-Sent Event."""
+    data = "".join("data: " + line.rstrip("\r\n") + "\n" for line in lines)
+    return f"id: {cursor}\n{data}\n"
+
+
+async def stream_log_events(request: Request, instance: ServerInstance, subscription: LogSubscription,
+                            backlog_cursor: str, backlog: List[str]):
+    """Yield SSE events for a subscriber until it disconnects or is dropped."""
+    try:
+        if backlog:
+            yield format_sse_batch(backlog_cursor, backlog)
+
+        while True:
+            try:
+                batch = await subscription.get(LOG_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            if batch is None:
+                # Dropped for being too slow; the browser reconnects and resumes from its last id
+                yield "event: dropped\ndata: \n\n"
+                break
+
+            cursor, lines = batch
+            yield format_sse_batch(cursor, lines)
+    finally:
+        instance.log_broadcaster.unsubscribe(subscription)
+
+
+@app.get("/api/server/logs/stream")
+@app.get("/api/servers/{server_id}/logs/stream")
+async def stream_logs(request: Request, lines: int = 50, instance: ServerInstance = Depends(get_instance),
+                      user: Dict[str, Any] = Depends(require_viewer)):
+    """Stream new log lines as Server-Sent Events from the shared log tail."""
+    # EventSource sends the id of the last event it saw when reconnecting
+    since = request.headers.get("last-event-id") or None
+    subscription, (cursor, backlog) = await instance.log_broadcaster.subscribe(min(lines, 500), since)
+
+    return StreamingResponse(
+        stream_log_events(request, instance, subscription, cursor, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def parse_search_time(value: Optional[str]) -> Optional[float]:
+    """Parse an ISO date/time query parameter into a timestamp."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+async def stream_search_results(results) -> Any:
+    """Serialize search results as newline-delimited JSON."""
+    async for record in results:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+@app.get("/api/server/logs/search")
+@app.get("/api/servers/{server_id}/logs/search")
+async def search_logs(request: Request, q: str = "", level: Optional[str] = None, player: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = 100, instance: ServerInstance = Depends(get_instance),
+                      user: Dict[str, Any] = Depends(require_viewer)):
+    """Search the rotated log archives through the background-built index.
+
+    `from`/`to` are ISO date/times. Results are streamed as NDJSON; the last
+    record holds the cursor for the next page.
+    """
+    # "from" is a keyword, so the time range is read from the query string directly
+    try:
+        start = parse_search_time(request.query_params.get("from"))
+        end = parse_search_time(request.query_params.get("to"))
+    except ValueError:
+        return JSONResponse({"status": "Неверный формат даты"}, status_code=400)
+
+    results = instance.log_index.search(q, start, end, level, player, cursor, max(1, min(limit, 1000)))
+    return StreamingResponse(stream_search_results(results), media_type="application/x-ndjson")
+
+
+@app.get("/api/server/events")
+@app.get("/api/servers/{server_id}/events")
+async def get_events(request: Request, kind: Optional[str] = None, player: Optional[str] = None,
+                     level: Optional[str] = None, after: int = 0, limit: int = 100,
+                     instance: ServerInstance = Depends(get_instance), user: Dict[str, Any] = Depends(require_viewer)):
+    """Return structured events parsed from the server console, filtered on the server side.
+
+    `kind` is a comma-separated list (join, leave, chat, command, lag, crash);
+    `from`/`to` are ISO date/times.
+    """
+    try:
+        start = parse_search_time(request.query_params.get("from"))
+        end = parse_search_time(request.query_params.get("to"))
+    except ValueError:
+        return JSONResponse({"status": "Неверный формат даты"}, status_code=400)
+
+    kinds = [k.strip() for k in kind.split(",") if k.strip()] if kind else None
+    return perf.JSONResponse(await instance.server.query_events(kinds, player, level, after, start, end,
+                                                          max(1, min(limit, 1000))))
+
+
+@app.get("/api/server/players")
+@app.get("/api/servers/{server_id}/players")
+async def get_players(request: Request, include_offline: bool = False, limit: int = 100,
+                      instance: ServerInstance = Depends(get_instance), user: Dict[str, Any] = Depends(require_viewer)):
+    """Who is online, with session durations, from the in-memory player registry (no RCON call).
+
+    `include_offline=true` adds the players seen most recently, up to `limit`.
+    """
+    return perf.JSONResponse(await instance.server.list_players(include_offline, max(1, min(limit, 1000))))
+
+
+@app.get("/api/server/players/{name}")
+@app.get("/api/servers/{server_id}/players/{name}")
+async def get_player(request: Request, name: str, instance: ServerInstance = Depends(get_instance),
+                     user: Dict[str, Any] = Depends(require_viewer)):
+    """Play time, sessions and activity counts of one player."""
+    player = await instance.server.player_info(name)
+    if player is None:
+        return JSONResponse({"status": "Игрок не найден"}, status_code=404)
+    return JSONResponse(player)
+
+
+@app.get("/api/server/metrics")
+@app.get("/api/servers/{server_id}/metrics")
+async def get_metrics(request: Request, resolution: str = "1m", window: Optional[float] = None,
+                      instance: ServerInstance = Depends(get_instance), user: Dict[str, Any] = Depends(require_viewer)):
+    """Return TPS, MSPT, player count, memory and CPU time series for the dashboard."""
+    if resolution not in [name for name, _, _ in RESOLUTIONS]:
+        return JSONResponse({"status": "Неверное разрешение (1s, 1m или 1h)"}, status_code=400)
+
+    return perf.JSONResponse(await instance.server.query_metrics(resolution, window))
+
+
+@app.get("/metrics")
+async def prometheus_metrics(request: Request):
+    """Expose the latest samples in Prometheus text format (protected by METRICS_TOKEN if set)."""
+    token = os.getenv("METRICS_TOKEN")
+    if token and not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        return PlainTextResponse("Unauthorized\n", status_code=401)
+
+    instances = list(servers)
+    latest = await asyncio.gather(*(instance.server.latest_metrics() for instance in instances))
+    states = await asyncio.gather(*(instance.server.status() for instance in instances))
+
+    # One sample per server, labelled with its id
+    labels = [{"server": instance.id} for instance in instances]
+
+    def gauge(description: str, values: List[Optional[float]]):
+        return description, list(zip(labels, values))
+
+    text = prometheus_text({
+        "minecraft_up": gauge("Whether the server process is running",
+                              [1 if state["running"] else 0 for state in states]),
+        "minecraft_uptime_seconds": gauge("Seconds since the server process was started",
+                                          [state["uptime"] for state in states]),
+        "minecraft_tps": gauge("Ticks per second reported by the server", [m["tps"] for m in latest]),
+        "minecraft_mspt": gauge("Milliseconds per tick reported by the server", [m["mspt"] for m in latest]),
+        "minecraft_players_online": gauge("Number of players online", [m["players"] for m in latest]),
+        "minecraft_process_resident_memory_bytes": gauge("Resident memory of the Java process",
+                                                         [m["rss_bytes"] for m in latest]),
+        "minecraft_process_cpu_percent": gauge("CPU usage of the Java process", [m["cpu_percent"] for m in latest]),
+        "minecraft_rcon_healthy": gauge("Whether the last RCON request succeeded",
+                                        [1 if instance.rcon_client.health()["healthy"] else 0
+                                         for instance in instances]),
+    })
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/server/commands/history")
-async def get_command_history(request: Request):
-    """Return the history of recent commands."""
-    user = await get_current_user(request)
-    if not user:
-        return JSONResponse({"status": "Необходима авторизация"}, status_code=401)
+@app.get("/api/servers/{server_id}/commands/history")
+async def get_command_history(request: Request, email: Optional[str] = None, before: Optional[int] = None,
+                              limit: int = MAX_RECENT_COMMANDS, instance: ServerInstance = Depends(get_instance),
+                              user: Dict[str, Any] = Depends(require_viewer)):
+    """Return the command history, newest page first.
+
+    Entries within a page are oldest first; pass `next` back as `before` for
+    older entries. `email` filters by user, `from`/`to` are ISO date/times.
+    """
+    try:
+        start = parse_search_time(request.query_params.get("from"))
+        end = parse_search_time(request.query_params.get("to"))
+    except ValueError:
+        return JSONResponse({"status": "Неверный формат даты"}, status_code=400)
+
+    commands, next_cursor = await instance.server.command_history(email.lower() if email else None, start, end,
+                                                                  before, max(1, min(limit, 500)))
+    return perf.JSONResponse({"commands": commands, "next": next_cursor})
+
+
+@app.get("/api/server/backups")
+@app.get("/api/servers/{server_id}/backups")
+async def list_backups(request: Request, instance: ServerInstance = Depends(get_instance),
+                       user: Dict[str, Any] = Depends(require_viewer)):
+    """List the world backups, newest first, after the backup or restore in progress."""
+    return JSONResponse({"backups": await instance.server.list_backups()})
+
+
+@app.post("/api/server/backups")
+@app.post("/api/servers/{server_id}/backups")
+async def create_backup(request: Request, instance: ServerInstance = Depends(get_instance),
+                        user: Dict[str, Any] = Depends(require_operator)):
+    """Start an incremental world backup; its progress shows up in the backup list."""
+    try:
+        backup = await instance.server.create_backup()
+    except BackupError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    logger.info(f"User {user['email']} started backup {backup['id']} of {instance.id}")
+    await instance.server.record_command(user["email"], "backup")
+    return JSONResponse({"status": "Резервное копирование запущено", "backup": backup}, status_code=202)
+
+
+@app.post("/api/server/backups/prune")
+@app.post("/api/servers/{server_id}/backups/prune")
+async def prune_backups(request: Request, keep: int, instance: ServerInstance = Depends(get_instance),
+                        user: Dict[str, Any] = Depends(require_admin)):
+    """Delete all but the `keep` newest backups and the data only they used."""
+    try:
+        removed = await instance.server.prune_backups(keep)
+    except BackupError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    await instance.server.record_command(user["email"], f"prune backups {keep}")
+    return JSONResponse({"status": "success", "removed": removed})
+
+
+@app.post("/api/server/backups/{backup_id}/restore")
+@app.post("/api/servers/{server_id}/backups/{backup_id}/restore")
+async def restore_backup(request: Request, backup_id: str, instance: ServerInstance = Depends(get_instance),
+                         user: Dict[str, Any] = Depends(require_admin)):
+    """Replace the world with a backup; the server has to be stopped."""
+    try:
+        await instance.server.restore_backup(backup_id)
+    except BackupError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+    except Exception as e:
+        logger.error(f"Error restoring backup {backup_id}: {str(e)}")
+        return JSONResponse(
+            {"status": f"[Система]: Ошибка восстановления резервной копии: {str(e)}"},
+            status_code=500
+        )
+
+    logger.info(f"User {user['email']} restored backup {backup_id} of {instance.id}")
+    await instance.server.record_command(user["email"], f"restore {backup_id}")
+    return JSONResponse({"status": "Резервная копия восстановлена"})
+
+
+@app.get("/api/server/schedules")
+@app.get("/api/servers/{server_id}/schedules")
+async def list_schedules(request: Request, instance: ServerInstance = Depends(get_instance),
+                         user: Dict[str, Any] = Depends(require_viewer)):
+    """List the scheduled tasks with their next run and the outcome of the last one."""
+    return JSONResponse({"schedules": await instance.server.list_schedules()})
+
+
+@app.post("/api/server/schedules")
+@app.post("/api/servers/{server_id}/schedules")
+async def create_schedule(request: Request, task: ScheduledTask, instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_admin)):
+    """Add a scheduled task (restart, save, broadcast...) driven by a cron expression."""
+    try:
+        created = await instance.server.create_schedule(task.model_dump())
+    except ScheduleError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    logger.info(f"User {user['email']} scheduled {created['action']} ({created['id']}) at {created['cron']}")
+    await instance.server.record_command(user["email"], f"schedule add {created['id']}")
+    return JSONResponse(created, status_code=201)
+
+
+@app.put("/api/server/schedules/{task_id}")
+@app.put("/api/servers/{server_id}/schedules/{task_id}")
+async def update_schedule(request: Request, task_id: str, task: ScheduledTask,
+                          instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_admin)):
+    """Replace a scheduled task; its id stays the same."""
+    updated = await instance.server.update_schedule(task_id, task.model_dump())
+    if updated is None:
+        return JSONResponse({"status": "Задача не найдена"}, status_code=404)
+
+    await instance.server.record_command(user["email"], f"schedule update {task_id}")
+    return JSONResponse(updated)
+
+
+@app.delete("/api/server/schedules/{task_id}")
+@app.delete("/api/servers/{server_id}/schedules/{task_id}")
+async def delete_schedule(request: Request, task_id: str, instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_admin)):
+    """Remove a scheduled task, interrupting its countdown if one is running."""
+    if not await instance.server.delete_schedule(task_id):
+        return JSONResponse({"status": "Задача не найдена"}, status_code=404)
+
+    await instance.server.record_command(user["email"], f"schedule delete {task_id}")
+    return JSONResponse({"status": "success"})
+
+
+@app.get("/api/server/world/stats")
+@app.get("/api/servers/{server_id}/world/stats")
+async def get_world_stats(request: Request, instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_viewer)):
+    """Region file sizes, chunk counts and save times of the world, from the region headers alone."""
+    try:
+        return perf.JSONResponse(await instance.server.world_stats(0))
+    except Exception as e:
+        logger.error(f"Error analyzing world: {str(e)}")
+        return JSONResponse({"status": f"[Система]: Ошибка анализа мира: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/server/world/pruning")
+@app.get("/api/servers/{server_id}/world/pruning")
+async def get_world_pruning(request: Request, inhabited_below: int = PRUNE_INHABITED_TICKS,
+                            instance: ServerInstance = Depends(get_instance),
+                            user: Dict[str, Any] = Depends(require_operator)):
+    """World statistics plus pruning candidates: regions whose chunks all have a low InhabitedTime.
 
-    authorized_emails = get_authorized_emails()
-    is_authorized = not authorized_emails or user["email"].lower() in authorized_emails
-    if not is_authorized:
-        return JSONResponse({"status": "Доступ запрещен"}, status_code=403)
+    This decompresses every chunk of the world on the first call; unchanged
+    region files are answered from the cache afterwards.
+    """
+    try:
+        return perf.JSONResponse(await instance.server.world_stats(max(1, inhabited_below)))
+    except Exception as e:
+        logger.error(f"Error analyzing world: {str(e)}")
+        return JSONResponse({"status": f"[Система]: Ошибка анализа мира: {str(e)}"}, status_code=500)
+
+
+@app.get("/api/server/pregen")
+@app.get("/api/servers/{server_id}/pregen")
+async def get_pregen(request: Request, instance: ServerInstance = Depends(get_instance),
+                     user: Dict[str, Any] = Depends(require_viewer)):
+    """Progress, rate and ETA of the chunk pregeneration job."""
+    return JSONResponse(await instance.server.pregen_status())
+
+
+@app.post("/api/server/pregen")
+@app.post("/api/servers/{server_id}/pregen")
+async def start_pregen(request: Request, job: PregenRequest, instance: ServerInstance = Depends(get_instance),
+                       user: Dict[str, Any] = Depends(require_admin)):
+    """Start generating the chunks around a center; the job waits while the server is down or players are online."""
+    try:
+        status = await instance.server.start_pregen(job.model_dump())
+    except PregenError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    logger.info(f"User {user['email']} started pregeneration of {job.dimension} "
+                f"around {job.center_x}, {job.center_z} with radius {job.radius}")
+    await instance.server.record_command(user["email"], f"pregen {job.dimension} {job.center_x} {job.center_z} "
+                                                        f"{job.radius}")
+    return JSONResponse(status, status_code=202)
+
+
+@app.post("/api/server/pregen/{action}")
+@app.post("/api/servers/{server_id}/pregen/{action}")
+async def control_pregen(request: Request, action: Literal["pause", "resume", "cancel"],
+                         instance: ServerInstance = Depends(get_instance),
+                         user: Dict[str, Any] = Depends(require_operator)):
+    """Pause, resume or cancel the pregeneration job; chunks it force-loaded are released."""
+    try:
+        if action == "pause":
+            status = await instance.server.pause_pregen()
+        elif action == "resume":
+            status = await instance.server.resume_pregen()
+        else:
+            status = await instance.server.cancel_pregen()
+    except PregenError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    await instance.server.record_command(user["email"], f"pregen {action}")
+    return JSONResponse(status)
+
+
+@app.get("/api/server/diagnostics")
+@app.get("/api/servers/{server_id}/diagnostics")
+async def list_diagnostics(request: Request, instance: ServerInstance = Depends(get_instance),
+                           user: Dict[str, Any] = Depends(require_operator)):
+    """List the lag diagnostics captures, newest first, after the capture in progress."""
+    return JSONResponse(await instance.server.list_diagnostics())
+
+
+@app.post("/api/server/diagnostics")
+@app.post("/api/servers/{server_id}/diagnostics")
+async def capture_diagnostics(request: Request, instance: ServerInstance = Depends(get_instance),
+                              user: Dict[str, Any] = Depends(require_operator)):
+    """Take a thread dump, heap summary and class histogram of the running server now."""
+    try:
+        capture = await instance.server.capture_diagnostics()
+    except DiagnosticsError as e:
+        return JSONResponse({"status": str(e)}, status_code=409)
+
+    await instance.server.record_command(user["email"], "diagnostics")
+    return JSONResponse(capture, status_code=202)
+
+
+@app.get("/api/server/diagnostics/diff")
+@app.get("/api/servers/{server_id}/diagnostics/diff")
+async def diff_diagnostics(request: Request, old: str, new: str, instance: ServerInstance = Depends(get_instance),
+                           user: Dict[str, Any] = Depends(require_operator)):
+    """Heap, thread state and per-class changes from capture `old` to capture `new`."""
+    try:
+        return perf.JSONResponse(await instance.server.diff_diagnostics(old, new))
+    except DiagnosticsError as e:
+        return JSONResponse({"status": str(e)}, status_code=404)
+
+
+@app.get("/api/server/diagnostics/{capture_id}")
+@app.get("/api/servers/{server_id}/diagnostics/{capture_id}")
+async def get_diagnostics(request: Request, capture_id: str, instance: ServerInstance = Depends(get_instance),
+                          user: Dict[str, Any] = Depends(require_operator)):
+    """Summary of one capture: threads per state, the main thread's stack, heap use and the largest classes."""
+    try:
+        return perf.JSONResponse(await instance.server.get_diagnostics(capture_id))
+    except DiagnosticsError as e:
+        return JSONResponse({"status": str(e)}, status_code=404)
+
+
+@app.get("/api/server/diagnostics/{capture_id}/{kind}")
+@app.get("/api/servers/{server_id}/diagnostics/{capture_id}/{kind}")
+async def get_diagnostics_output(request: Request, capture_id: str, kind: Literal["threads", "heap", "histogram"],
+                                 instance: ServerInstance = Depends(get_instance),
+                                 user: Dict[str, Any] = Depends(require_operator)):
+    """The full jcmd output of a capture as text."""
+    try:
+        return PlainTextResponse(await instance.server.diagnostics_output(capture_id, kind))
+    except DiagnosticsError as e:
+        return JSONResponse({"status": str(e)}, status_code=404)
+
+
+@app.delete("/api/server/diagnostics/{capture_id}")
+@app.delete("/api/servers/{server_id}/diagnostics/{capture_id}")
+async def delete_diagnostics(request: Request, capture_id: str, instance: ServerInstance = Depends(get_instance),
+                             user: Dict[str, Any] = Depends(require_admin)):
+    """Delete a capture (admins only)."""
+    try:
+        await instance.server.delete_diagnostics(capture_id)
+    except DiagnosticsError as e:
+        return JSONResponse({"status": str(e)}, status_code=404)
+    return JSONResponse({"status": "success"})
+
+
+@app.get("/api/server/launch")
+@app.get("/api/servers/{server_id}/launch")
+async def get_launch(request: Request, instance: ServerInstance = Depends(get_instance),
+                     user: Dict[str, Any] = Depends(require_viewer)):
+    """Launch profiles with their JVM flags, the CDS archive and the time to "Done" of recent starts."""
+    return JSONResponse(await instance.server.launch_info())
+
+
+@app.put("/api/server/launch/profile")
+@app.put("/api/servers/{server_id}/launch/profile")
+async def set_launch_profile(request: Request, name: str, instance: ServerInstance = Depends(get_instance),
+                             user: Dict[str, Any] = Depends(require_admin)):
+    """Choose the launch profile of the next starts (admins only)."""
+    if not await instance.server.set_launch_profile(name):
+        return JSONResponse({"status": "Профиль запуска не найден"}, status_code=404)
+    await instance.server.record_command(user["email"], f"launch profile {name}")
+    return JSONResponse({"status": "Профиль запуска изменён, он будет применён при следующем запуске", "profile": name})
 
-    return JSONResponse({"commands": recent_commands})
+
+@app.delete("/api/server/launch/cds")
+@app.delete("/api/servers/{server_id}/launch/cds")
+async def clear_cds_archives(request: Request, instance: ServerInstance = Depends(get_instance),
+                             user: Dict[str, Any] = Depends(require_admin)):
+    """Delete the CDS archives; the next start of each profile creates a new one (admins only)."""
+    removed = await instance.server.clear_cds_archives()
+    return JSONResponse({"status": "success", "removed": removed})
+
+
+@app.get("/api/debug/perf")
+async def get_perf_report(request: Request, user: Dict[str, Any] = Depends(require_admin)):
+    """Return per-route latency histograms, span breakdowns and worker thread usage (admins only)."""
+    return JSONResponse(perf.report(thread_executor))
+
+
+@app.post("/api/debug/perf")
+async def configure_perf(request: Request, enabled: Optional[bool] = None, reset: bool = False,
+                         profile: Optional[float] = None, user: Dict[str, Any] = Depends(require_admin)):
+    """Toggle instrumentation, clear the collected stats or start the sampling profiler for `profile` seconds."""
+    if enabled is not None:
+        perf.enabled = enabled
+    if reset:
+        perf.reset()
+    if profile is not None:
+        if perf.profiler.running:
+            return JSONResponse({"status": "Профилирование уже запущено"}, status_code=409)
+        perf.profiler.start(max(0.1, min(profile, MAX_PROFILE_SECONDS)))
+        logger.info(f"User {user['email']} started the profiler for {profile}s")
+
+    return JSONResponse(perf.report(thread_executor))
+
+
+@app.get("/api/debug/perf/profile")
+async def get_perf_profile(request: Request, user: Dict[str, Any] = Depends(require_admin)):
+    """Return the stacks collected by the sampling profiler in collapsed (flamegraph.pl) format."""
+    return PlainTextResponse(perf.profiler.collapsed())
 
 
 @app.get("/auth/google")
 async def google_login():
     """Create a login URL for Google OAuth."""
-    # Clean expired tokens periodically
-    await clean_expired_tokens()
-
-    # Generate a secure state token
+    # Generate a secure state token; expired tokens are purged in the background
     state = secrets.token_urlsafe(32)
-    state_tokens[state] = {
-        "created": datetime.now(),
-        "used": False
-    }
+    await state_tokens.set(state, {"used": False}, STATE_TOKEN_TTL)
 
     # Build the OAuth URL
     client_id = os.getenv("google_client_id")
@@ -540,12 +1102,19 @@ async def google_login():
             detail="OAuth configuration is incomplete"
         )
 
+    try:
+        auth_url = (await openid_provider.discovery())["authorization_endpoint"]
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        logger.error(f"OpenID discovery failed, using the default endpoint: {str(e)}")
+        auth_url = "https://accounts.google.com/o/oauth2/auth"
+
+    # "openid" makes the token response include an ID token carrying the profile
     url = (
-        f"https://accounts.google.com/o/oauth2/auth"
+        f"{auth_url}"
         f"?client_id={client_id}"
         f"&redirect_uri={redirect_uri}"
         "&response_type=code"
-        "&scope=email profile"
+        "&scope=openid email profile"
         f"&state={state}"
         "&prompt=select_account"  # Force account selection
     )
@@ -556,23 +1125,24 @@ async def google_login():
 @app.get("/auth/callback")
 async def google_callback(request: Request, code: str, state: str):
     """Handle the callback from Google OAuth."""
-    # Verify state token
-    if state not in state_tokens:
+    # Verify state token; taking it out of the store is atomic, even across workers
+    token = await state_tokens.pop(state)
+    if token is None:
         raise HTTPException(status_code=400, detail="Invalid state token")
 
     # Prevent token reuse
-    if state_tokens[state]["used"]:
+    if token["used"]:
         raise HTTPException(status_code=400, detail="State token already used")
 
     # Mark token as used
-    state_tokens[state]["used"] = True
+    await state_tokens.set(state, {"used": True}, STATE_TOKEN_TTL)
 
     try:
         # Exchange code for access token
         client_id = os.getenv("google_client_id")
         client_secret = os.getenv("google_client_secret")
         redirect_uri = os.getenv("google_redirect_uri")
-        token_url = os.getenv("google_token_url")
+        token_url = os.getenv("google_token_url") or (await openid_provider.discovery()).get("token_endpoint")
 
         if not all([client_id, client_secret, redirect_uri, token_url]):
             logger.error("Missing Google OAuth configuration")
@@ -581,18 +1151,18 @@ async def google_callback(request: Request, code: str, state: str):
                 detail="OAuth configuration is incomplete"
             )
 
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                token_url,
-                data={
-                    "client_id": client_id,
-                    "client_secret": client_secret,
-                    "code": code,
-                    "grant_type": "authorization_code",
-                    "redirect_uri": redirect_uri,
-                },
-                timeout=10.0  # Add timeout for safety
-            )
+        # Reuses the pooled keep-alive connection instead of a new TLS handshake per login
+        token_response = await http_client.post(
+            token_url,
+            data={
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "code": code,
+                "grant_type": "authorization_code",
+                "redirect_uri": redirect_uri,
+            },
+            timeout=10.0  # Add timeout for safety
+        )
 
         token_data = token_response.json()
         if "error" in token_data:
@@ -604,22 +1174,30 @@ async def google_callback(request: Request, code: str, state: str):
 
         access_token = token_data["access_token"]
 
-        # Get user information
-        userinfo_url = os.getenv("google_userinfo_url")
-        if not userinfo_url:
-            raise HTTPException(
-                status_code=500,
-                detail="OAuth configuration is incomplete"
-            )
-
-        async with httpx.AsyncClient() as client:
-            userinfo_response = await client.get(
+        # The verified ID token has the profile, which saves the userinfo round-trip
+        userinfo = {}
+        if "id_token" in token_data:
+            try:
+                userinfo = await openid_provider.verify_id_token(token_data["id_token"])
+            except OAuthError as e:
+                logger.warning(f"ID token rejected, asking the userinfo endpoint: {str(e)}")
+
+        if not all(field in userinfo for field in ("email", "name", "picture")):
+            # Get user information
+            userinfo_url = os.getenv("google_userinfo_url") or (await openid_provider.discovery()).get(
+                "userinfo_endpoint")
+            if not userinfo_url:
+                raise HTTPException(
+                    status_code=500,
+                    detail="OAuth configuration is incomplete"
+                )
+
+            userinfo_response = await http_client.get(
                 userinfo_url,
                 headers={"Authorization": f"Bearer {access_token}"},
                 timeout=10.0
             )
-
-        userinfo = userinfo_response.json()
+            userinfo = userinfo_response.json()
 
         # Validate required user info
         required_fields = ["email", "name", "picture"]
@@ -629,6 +1207,13 @@ async def google_callback(request: Request, code: str, state: str):
                 status_code=400,
                 detail="Incomplete user information received"
             )
+        # Roles are looked up by email, so it has to belong to whoever logged in
+        if not email_verified(userinfo):
+            logger.warning(f"Login with an unverified email rejected: {userinfo['email']}")
+            raise HTTPException(
+                status_code=403,
+                detail="Email address is not verified"
+            )
 
         # Save user data in session
         request.session["user"] = {
@@ -643,6 +1228,8 @@ async def google_callback(request: Request, code: str, state: str):
 
         # Redirect to frontend
         return RedirectResponse(FRONTEND_URL)
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         logger.error(f"Request error during OAuth flow: {str(e)}")
         raise HTTPException(
@@ -657,31 +1244,32 @@ async def google_callback(request: Request, code: str, state: str):
         )
 
 
-# Legacy routes for backward compatibility
+# Legacy routes for backward compatibility, they control the default server
 @app.post("/start")
-async def legacy_start(request: Request):
-    return await start_server(request)
+async def legacy_start(request: Request, user: Dict[str, Any] = Depends(require_operator)):
+    return await start_server(request, servers.default, user)
 
 
 @app.post("/stop")
-async def legacy_stop(request: Request):
-    return await stop_server(request)
+async def legacy_stop(request: Request, user: Dict[str, Any] = Depends(require_operator)):
+    return await stop_server(request, servers.default, user)
 
 
 @app.post("/restart")
-async def legacy_restart(request: Request):
-    return await restart_server(request)
+async def legacy_restart(request: Request, user: Dict[str, Any] = Depends(require_operator)):
+    return await restart_server(request, servers.default, user)
 
 
 @app.post("/command")
-async def legacy_command(command: str, request: Request):
+async def legacy_command(command: str, request: Request, user: Dict[str, Any] = Depends(require_operator)):
     command_req = CommandRequest(command=command)
-    return await execute_command(command_req, request)
+    return await execute_command(command_req, request, servers.default, user)
 
 
 @app.get("/logs")
-async def legacy_get_logs(request: Request):
-    return await get_logs(request)
+async def legacy_get_logs(request: Request, lines: int = 50, since: Optional[str] = None, after: Optional[int] = None,
+                          user: Dict[str, Any] = Depends(require_viewer)):
+    return await get_logs(request, lines, since, after, servers.default, user)
 
 
 @app.get("/google-login")
@@ -697,21 +1285,31 @@ async def legacy_callback(request: Request, code: str, state: str):
 # Server startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
+    global http_client, openid_provider
     logger.info("Server starting up")
+    http_client = create_http_client()
+    openid_provider = OpenIDProvider(
+        http_client,
+        os.getenv("google_client_id", ""),
+        os.getenv("google_discovery_url", GOOGLE_DISCOVERY_URL)
+    )
+    asyncio.get_running_loop().set_default_executor(thread_executor)
+    await asyncio.to_thread(static_assets.load)
+    access_control.start()
+    state_tokens.start()
+    command_limiter.store.start()
+    scheduler.start()
+    for instance in servers:
+        await instance.start(scheduler)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Server shutting down")
-    global server_process
-    if server_process:
-        try:
-            # Try graceful shutdown first
-            await send_command("stop")
-            try:
-                server_process.wait(timeout=10)
-            except subprocess.TimeoutExpired:
-                # Force termination if needed
-                server_process.terminate()
-        except Exception as e:
-            logger.error(f"Error during server shutdown: {str(e)}")
\ No newline at end of file
+    await access_control.stop()
+    await state_tokens.stop()
+    await command_limiter.store.stop()
+    perf.profiler.stop()
+    await asyncio.gather(*(instance.shutdown() for instance in servers))
+    await scheduler.stop()
+    await http_client.aclose()
\ No newline at end of file
@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from array import array
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import psutil
+except ImportError:  # optional, only needed where /proc is not available (Windows)
+    psutil = None
+
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+# (name, seconds per point, number of points kept)
+RESOLUTIONS = [("1s", 1, 3600), ("1m", 60, 1440), ("1h", 3600, 720)]
+METRICS = ["tps", "mspt", "players", "rss_bytes", "cpu_percent"]
+
+COLOR_CODE_PATTERN = re.compile(r"§.")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+FORGE_TPS_PATTERN = re.compile(r"Overall.*?Mean tick time: ([\d.]+) ms\. Mean TPS: ([\d.]+)")
+TICK_QUERY_PATTERN = re.compile(r"Average time per tick: ([\d.]+)ms")
+LIST_PATTERN = re.compile(r"There are (\d+) of a max")
+# Commands understood by different server types, tried in order until one works
+TPS_COMMANDS = ["tps", "forge tps", "tick query"]
+
+
+def parse_tps(response: str) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """Extract (tps, mspt) from the output of one of TPS_COMMANDS, or None if it isn't supported."""
+    text = COLOR_CODE_PATTERN.sub("", response)
+    match = FORGE_TPS_PATTERN.search(text)
+    if match:
+        return float(match.group(2)), float(match.group(1))
+    match = TICK_QUERY_PATTERN.search(text)
+    if match:
+        mspt = float(match.group(1))
+        return min(20.0, 1000.0 / mspt) if mspt > 0 else 20.0, mspt
+    if "TPS from last" in text:
+        # Paper/Spigot: "TPS from last 1m, 5m, 15m: 20.0, 19.98, 19.97" (values may be prefixed with *)
+        values = NUMBER_PATTERN.findall(text.split(":", 1)[1])
+        if values:
+            return float(values[0]), None
+    return None
+
+
+class RollupSeries:
+    """Fixed-size ring of time buckets keeping count/sum/min/max per bucket."""
+
+    def __init__(self, step: int, capacity: int):
+        self.step = step
+        self.capacity = capacity
+        self.bucket = array("q", [-1]) * capacity
+        self.count = array("I", [0]) * capacity
+        self.total = array("d", [0.0]) * capacity
+        self.low = array("d", [0.0]) * capacity
+        self.high = array("d", [0.0]) * capacity
+
+    def add(self, ts: float, value: float):
+        bucket = int(ts // self.step)
+        i = bucket % self.capacity
+        if self.bucket[i] != bucket:
+            # Reusing the slot of a bucket that is `capacity` steps old
+            self.bucket[i] = bucket
+            self.count[i] = 0
+            self.total[i] = 0.0
+            self.low[i] = value
+            self.high[i] = value
+        self.count[i] += 1
+        self.total[i] += value
+        self.low[i] = min(self.low[i], value)
+        self.high[i] = max(self.high[i], value)
+
+    def points(self, since: float, now: float) -> List[List[float]]:
+        """Return [timestamp, avg, min, max] for buckets in [since, now], oldest first."""
+        first = max(int(since // self.step), int(now // self.step) - self.capacity + 1)
+        result = []
+        for bucket in range(first, int(now // self.step) + 1):
+            i = bucket % self.capacity
+            if self.bucket[i] == bucket and self.count[i]:
+                result.append([bucket * self.step, self.total[i] / self.count[i], self.low[i], self.high[i]])
+        return result
+
+
+class ProcessSampler:
+    """Reads RSS and CPU usage of a process from /proc, or psutil where there is no /proc."""
+
+    def __init__(self):
+        self._last: Optional[Tuple[int, float, float]] = None  # pid, cpu seconds, wall time
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _read(self, pid: int) -> Tuple[int, float]:
+        """Return (rss bytes, cpu seconds) of the process."""
+        if os.path.exists(f"/proc/{pid}/stat"):
+            with open(f"/proc/{pid}/stat", "r") as f:
+                # Fields after the command name, which may contain spaces, start after the last ")"
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu = (int(fields[11]) + int(fields[12])) / self._clock_ticks
+            rss = int(fields[21]) * self._page_size
+            return rss, cpu
+        if psutil is not None:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return process.memory_info().rss, times.user + times.system
+        raise OSError("Process statistics are not available on this platform")
+
+    def sample(self, pid: int) -> Tuple[int, Optional[float]]:
+        """Return (rss bytes, cpu percent since the previous sample of the same pid)."""
+        rss, cpu = self._read(pid)
+        now = time.monotonic()
+        cpu_percent = None
+        if self._last is not None and self._last[0] == pid and now > self._last[2]:
+            cpu_percent = (cpu - self._last[1]) / (now - self._last[2]) * 100
+        self._last = (pid, cpu, now)
+        return rss, cpu_percent
+
+
+class MetricsCollector:
+    """Background sampler of server health with 1s/1m/1h rollups in fixed memory."""
+
+    def __init__(self, command: Callable[[str], Awaitable[str]], get_pid: Callable[[], Optional[int]],
+                 interval: float = 1.0, rcon_interval: float = 10.0):
+        self.command = command
+        self.get_pid = get_pid
+        self.interval = interval
+        self.rcon_interval = rcon_interval
+        self.series: Dict[str, Dict[str, RollupSeries]] = {
+            metric: {name: RollupSeries(step, capacity) for name, step, capacity in RESOLUTIONS}
+            for metric in METRICS
+        }
+        self.latest: Dict[str, Optional[float]] = {metric: None for metric in METRICS}
+        self.last_sample: Optional[float] = None
+        self._process = ProcessSampler()
+        self._tps_command: Optional[str] = None
+        self._unsupported: set = set()
+        self._jobs: List[PeriodicJob] = []
+        # Called with every `list` response (color codes stripped) and its time, e.g. by the player registry
+        self.list_listeners: List[Callable[[str, float], None]] = []
+
+    def start(self, scheduler: PeriodicScheduler, name: str = "server"):
+        if not self._jobs:
+            # Separate jobs, so a slow RCON never delays process sampling
+            self._jobs = [
+                scheduler.add(f"metrics sampling of {name}", self.interval, self._sample),
+                scheduler.add(f"RCON metrics sampling of {name}", self.rcon_interval, self._sample_rcon),
+            ]
+
+    async def stop(self):
+        for job in self._jobs:
+            job.cancel()
+        self._jobs = []
+
+    def reset_tps_command(self):
+        """Look for a working TPS command again, e.g. after the server restarted with other plugins."""
+        self._tps_command = None
+        self._unsupported.clear()
+
+    def record(self, metric: str, value: Optional[float], ts: float):
+        self.latest[metric] = value
+        if value is None:
+            return
+        for series in self.series[metric].values():
+            series.add(ts, value)
+
+    def _sample_process(self, ts: float):
+        pid = self.get_pid()
+        if pid is None:
+            self.latest["rss_bytes"] = self.latest["cpu_percent"] = None
+            return
+        try:
+            rss, cpu_percent = self._process.sample(pid)
+        except (OSError, ValueError, IndexError):
+            return
+        self.record("rss_bytes", rss, ts)
+        self.record("cpu_percent", cpu_percent, ts)
+
+    async def _sample_rcon(self):
+        """Query TPS/MSPT and the player count."""
+        ts = time.time()
+        try:
+            response = COLOR_CODE_PATTERN.sub("", await self.command("list"))
+            players = LIST_PATTERN.search(response)
+            self.record("players", int(players.group(1)) if players else None, ts)
+            for listener in self.list_listeners:
+                listener(response, ts)
+
+            # The command that worked last time first, then the others
+            for command in sorted(TPS_COMMANDS, key=lambda candidate: candidate != self._tps_command):
+                if command in self._unsupported:
+                    continue
+                parsed = parse_tps(await self.command(command))
+                if parsed is None:
+                    if command == self._tps_command:
+                        # It worked before, so it gets another chance once the others were tried
+                        self._tps_command = None
+                    else:
+                        self._unsupported.add(command)
+                    continue
+                self._tps_command = command
+                self.record("tps", parsed[0], ts)
+                self.record("mspt", parsed[1], ts)
+                break
+        except Exception as e:
+            logger.debug(f"Metrics RCON sample failed: {str(e)}")
+            for metric in ("tps", "mspt", "players"):
+                self.latest[metric] = None
+
+    async def _sample(self):
+        ts = time.time()
+        self._sample_process(ts)
+        self.last_sample = ts
+
+    def query(self, resolution: str = "1m", window: Optional[float] = None) -> Dict[str, Any]:
+        steps = {name: step for name, step, _ in RESOLUTIONS}
+        step = steps[resolution]
+        now = time.time()
+        since = now - (window if window is not None else step * 120)
+        return {
+            "resolution": resolution,
+            "latest": self.latest,
+            "last_sample": self.last_sample,
+            "series": {metric: self.series[metric][resolution].points(since, now) for metric in METRICS},
+        }
+
+
+def prometheus_text(values: Dict[str, Tuple[str, List[Tuple[Dict[str, str], Optional[float]]]]]) -> str:
+    """Render gauges in the Prometheus text exposition format, one sample per label set; None values are omitted."""
+    lines = []
+    for name, (description, samples) in values.items():
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {float(value):.17g}" if labels else f"{name} {float(value):.17g}")
+    return "\n".join(lines) + "\n"
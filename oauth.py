@@ -0,0 +1,133 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:  # optional, connections fall back to HTTP/1.1 keep-alive
+    h2 = None
+
+try:
+    import jwt  # PyJWT with the "crypto" extra, for RS256
+except ImportError:  # optional, logins fall back to the userinfo endpoint
+    jwt = None
+
+logger = logging.getLogger("minecraft-server-api")
+
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+GOOGLE_ISSUERS = {"https://accounts.google.com", "accounts.google.com"}
+DEFAULT_CACHE_SECONDS = 3600
+# Don't refetch the JWKS for unknown key ids more often than this
+MIN_JWKS_REFRESH = 60
+CLOCK_SKEW = 60  # seconds
+
+
+class OAuthError(Exception):
+    """The identity provider's response could not be used."""
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Shared client for outgoing requests: keep-alive, and HTTP/2 when h2 is installed."""
+    return httpx.AsyncClient(
+        http2=h2 is not None,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=120)
+    )
+
+
+def email_verified(userinfo: Dict[str, Any]) -> bool:
+    """Whether the provider vouches for the email; older Google responses send the flag as a string.
+
+    ID tokens and the OpenID userinfo endpoint call it email_verified, Google's
+    v1/v2 userinfo endpoints verified_email.
+    """
+    return any(userinfo.get(key) in (True, "true") for key in ("email_verified", "verified_email"))
+
+
+def cache_seconds(response: httpx.Response) -> float:
+    """max-age from Cache-Control, so discovery and keys are refetched when the provider says so."""
+    for directive in response.headers.get("cache-control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        if name.lower() == "max-age" and value.isdigit():
+            return float(value)
+    return DEFAULT_CACHE_SECONDS
+
+
+class OpenIDProvider:
+    """Cached OpenID Connect metadata and local ID-token verification.
+
+    The discovery document and signing keys are fetched once and kept for as
+    long as their Cache-Control allows, so a login only needs the token
+    exchange: the ID token already carries the user's email, name and picture.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, client_id: str, discovery_url: str = GOOGLE_DISCOVERY_URL):
+        self.http = http
+        self.client_id = client_id
+        self.discovery_url = discovery_url
+        self._discovery: Optional[Tuple[float, Dict[str, Any]]] = None  # expires, document
+        self._keys: Dict[str, "jwt.PyJWK"] = {}  # kid -> key
+        self._keys_expire = 0.0
+        self._keys_fetched = 0.0
+        self._discovery_lock = asyncio.Lock()
+        self._keys_lock = asyncio.Lock()
+
+    async def _get_json(self, url: str) -> Tuple[Dict[str, Any], float]:
+        response = await self.http.get(url)
+        response.raise_for_status()
+        return response.json(), cache_seconds(response)
+
+    async def discovery(self) -> Dict[str, Any]:
+        if self._discovery is None or self._discovery[0] < time.time():
+            async with self._discovery_lock:
+                if self._discovery is None or self._discovery[0] < time.time():
+                    document, ttl = await self._get_json(self.discovery_url)
+                    self._discovery = (time.time() + ttl, document)
+        return self._discovery[1]
+
+    async def _signing_key(self, kid: str) -> "jwt.PyJWK":
+        now = time.time()
+        key = self._keys.get(kid)
+        if key is not None and now < self._keys_expire:
+            return key
+        # Keys rotate; fetch again when they expired or an unknown key id shows up
+        if now >= self._keys_expire or now - self._keys_fetched >= MIN_JWKS_REFRESH:
+            async with self._keys_lock:
+                if self._keys.get(kid) is None or time.time() >= self._keys_expire:
+                    jwks, ttl = await self._get_json((await self.discovery())["jwks_uri"])
+                    self._keys = {}
+                    for jwk in jwks.get("keys", []):
+                        if jwk.get("kty") != "RSA" or "kid" not in jwk:
+                            continue
+                        try:
+                            self._keys[jwk["kid"]] = jwt.PyJWK(jwk, algorithm="RS256")
+                        except jwt.PyJWTError as e:
+                            logger.warning(f"Skipping unusable signing key {jwk['kid']}: {str(e)}")
+                    self._keys_fetched = time.time()
+                    self._keys_expire = self._keys_fetched + ttl
+        key = self._keys.get(kid)
+        if key is None:
+            raise OAuthError(f"Unknown signing key: {kid}")
+        return key
+
+    async def verify_id_token(self, id_token: str) -> Dict[str, Any]:
+        """Verify an RS256 ID token's signature, issuer, audience and expiry; return its claims."""
+        if jwt is None:
+            raise OAuthError("PyJWT is not installed, ID tokens can't be verified")
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise OAuthError(f"Malformed ID token: {str(e)}")
+        if header.get("alg") != "RS256":
+            raise OAuthError(f"Unsupported ID token algorithm: {header.get('alg')}")
+
+        key = await self._signing_key(header.get("kid", ""))
+        issuers = GOOGLE_ISSUERS | {(await self.discovery()).get("issuer")}
+        try:
+            return jwt.decode(id_token, key, algorithms=["RS256"], audience=self.client_id, issuer=issuers,
+                              leeway=CLOCK_SKEW, options={"require": ["iss", "aud", "exp", "iat"]})
+        except jwt.PyJWTError as e:
+            raise OAuthError(f"Invalid ID token: {str(e)}")
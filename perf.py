@@ -0,0 +1,301 @@
+import sys
+import time
+import bisect
+import threading
+import contextvars
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+from starlette.responses import JSONResponse as _JSONResponse
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+enabled = False
+_NOOP = nullcontext()
+_current_spans: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "perf_spans", default=None
+)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with approximate percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket that contains the given fraction of samples."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.spans: Dict[str, Histogram] = defaultdict(Histogram)
+
+
+routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+
+
+def reset():
+    routes.clear()
+    executor_stats.reset()
+
+
+@contextmanager
+def _record_span(name: str, spans: Dict[str, float]):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def span(name: str):
+    """Time a block as part of the current request (no-op unless instrumentation is enabled)."""
+    if not enabled:
+        return _NOOP
+    spans = _current_spans.get()
+    if spans is None:
+        return _NOOP
+    return _record_span(name, spans)
+
+
+def add_span(name: str, ms: float):
+    spans = _current_spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + ms
+
+
+class PerfMiddleware:
+    """ASGI middleware recording per-route latency and span breakdowns."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: Dict[str, float] = {}
+        token = _current_spans.set(spans)
+        started = time.perf_counter()
+        scope["perf.started"] = started
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            _current_spans.reset(token)
+            key = f"{scope['method']} {_route_name(scope)}"
+            stats = routes[key]
+            stats.latency.add(elapsed)
+            for name, ms in spans.items():
+                stats.spans[name].add(ms)
+
+
+def _route_name(scope) -> str:
+    """Route template of the request, so /logs?x and /logs?y share stats and raw paths can't grow the table."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path"):
+        return scope["root_path"] + "/*"  # mounted app, e.g. static files
+    return "<unmatched>"
+
+
+class SpanMiddleware:
+    """Wraps another middleware and records the time spent before it calls the app as a span.
+
+    Used for SessionMiddleware, which decodes the session cookie before the route runs.
+    """
+
+    def __init__(self, app, wrapped, span_name: str, **options):
+        self.app = app
+        self.span_name = span_name
+        self.middleware = wrapped(self._inner, **options)
+
+    async def __call__(self, scope, receive, send):
+        if enabled and scope["type"] == "http":
+            scope[f"perf.{self.span_name}"] = time.perf_counter()
+        await self.middleware(scope, receive, send)
+
+    async def _inner(self, scope, receive, send):
+        started = scope.pop(f"perf.{self.span_name}", None)
+        if started is not None:
+            add_span(self.span_name, (time.perf_counter() - started) * 1000)
+        await self.app(scope, receive, send)
+
+
+class JSONResponse(_JSONResponse):
+    """JSONResponse that records rendering as the 'serialization' span.
+
+    The API uses it for its large read responses (logs, events, metrics,
+    history, world stats), where serialization is worth timing.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialization"):
+            return super().render(content)
+
+
+# ----- Thread pool usage -----
+class ExecutorStats:
+    def __init__(self):
+        self.active = 0
+        # Tasks finish on worker threads, and `-=` on an attribute is not atomic
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # `active` is left alone, tasks already running still report back when they finish
+        with self._lock:
+            self.peak = self.active
+            self.submitted = 0
+
+    def task_submitted(self):
+        with self._lock:
+            self.submitted += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def task_done(self, _future=None):
+        with self._lock:
+            self.active -= 1
+
+
+executor_stats = ExecutorStats()
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """Default executor (used by asyncio.to_thread) that counts busy worker threads."""
+
+    def submit(self, fn, *args, **kwargs):
+        executor_stats.task_submitted()
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            # Shut down: the task never runs, so it never reports back either
+            executor_stats.task_done()
+            raise
+        future.add_done_callback(executor_stats.task_done)
+        return future
+
+    def thread_stats(self) -> Dict[str, Any]:
+        return {
+            "threads": len(self._threads),
+            "max_workers": self._max_workers,
+            "active": executor_stats.active,
+            "peak_active": executor_stats.peak,
+            "submitted": executor_stats.submitted,
+        }
+
+
+# ----- Sampling profiler -----
+class SamplingProfiler:
+    """Samples Python stacks of all threads and aggregates them as collapsed stacks
+    ("frame;frame;frame count"), the input format of flamegraph.pl and speedscope."""
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.ends_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.005):
+        if self.running:
+            return
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.ends_at = self.started_at + seconds
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds, interval), daemon=True,
+                                        name="perf-sampler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, seconds: float, interval: float):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(interval)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+profiler = SamplingProfiler()
+
+
+def report(executor: Optional[InstrumentedExecutor] = None) -> Dict[str, Any]:
+    return {
+        "enabled": enabled,
+        "routes": {
+            route: {
+                **stats.latency.summary(),
+                "spans": {name: hist.summary() for name, hist in stats.spans.items()},
+            }
+            for route, stats in sorted(routes.items())
+        },
+        "to_thread": executor.thread_stats() if executor is not None else None,
+        "profiler": {
+            "running": profiler.running,
+            "samples": profiler.samples,
+            "started_at": profiler.started_at,
+            "ends_at": profiler.ends_at,
+        },
+    }
@@ -0,0 +1,252 @@
+import os
+import re
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from log_events import KIND_IDS, ParsedEvent
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    sessions INTEGER NOT NULL,
+    play_seconds REAL NOT NULL,
+    chat_messages INTEGER NOT NULL,
+    commands INTEGER NOT NULL,
+    online_since REAL
+);
+"""
+COLUMNS = ("key", "name", "first_seen", "last_seen", "sessions", "play_seconds", "chat_messages", "commands",
+           "online_since")
+
+# "There are 2 of a max of 20 players online: Alice, Bob" (color codes already stripped)
+LIST_PATTERN = re.compile(r"There are (\d+) of a max(?: of)? (\d+) players online:?(.*)", re.DOTALL)
+NAME_PATTERN = re.compile(r"^\w{1,16}$")
+
+PlayerRow = Tuple[str, str, float, float, int, float, int, int, Optional[float]]
+
+
+def parse_list(response: str) -> Optional[Tuple[int, int, Optional[List[str]]]]:
+    """(online, max, names) from a `list` response; names is None when they can't all be read."""
+    match = LIST_PATTERN.search(response)
+    if match is None:
+        return None
+    online, max_players = int(match.group(1)), int(match.group(2))
+    names = [name.strip() for name in match.group(3).replace("\n", ",").split(",") if name.strip()]
+    if len(names) != online or not all(NAME_PATTERN.match(name) for name in names):
+        return online, max_players, None
+    return online, max_players, names
+
+
+class PlayerRecord:
+    """Everything known about one player; names are case-insensitive, the last seen spelling is kept."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, name: str, ts: float):
+        self.key = name.lower()
+        self.name = name
+        self.first_seen = ts
+        self.last_seen = ts
+        self.sessions = 0
+        self.play_seconds = 0.0
+        self.chat_messages = 0
+        self.commands = 0
+        self.online_since: Optional[float] = None
+
+    @classmethod
+    def from_row(cls, row: PlayerRow) -> "PlayerRecord":
+        record = cls.__new__(cls)
+        for column, value in zip(COLUMNS, row):
+            setattr(record, column, value)
+        return record
+
+    def row(self) -> PlayerRow:
+        return tuple(getattr(self, column) for column in COLUMNS)
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        session = now - self.online_since if self.online_since is not None else None
+        return {
+            "name": self.name,
+            "online": self.online_since is not None,
+            "online_since": self.online_since,
+            "session_seconds": round(session, 1) if session is not None else None,
+            # Including the session in progress
+            "play_seconds": round(self.play_seconds + (session or 0.0), 1),
+            "sessions": self.sessions,
+            "first_seen": self.first_seen,
+            "last_seen": now if self.online_since is not None else self.last_seen,
+            "chat_messages": self.chat_messages,
+            "commands": self.commands,
+        }
+
+
+class PlayerRegistry:
+    """Known players and who is online, kept in memory and updated from console events.
+
+    Joins and leaves update the registry as the lines arrive; the periodic
+    `list` of the metrics sampler reconciles it with what the server
+    reports, which also covers servers whose console isn't captured. Every
+    lookup is a dict access, so the dashboard never causes an RCON call.
+    Changed players are written to a SQLite table by a background task.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.players: Dict[str, PlayerRecord] = {}
+        self.online: Dict[str, PlayerRecord] = {}
+        self.max_players: Optional[int] = None
+        self.reconciled_at: Optional[float] = None
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._job: Optional[PeriodicJob] = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        # Older versions recorded command feedback sources ("Rcon", "Server") that never joined
+        with self._db:
+            self._db.execute("DELETE FROM players WHERE sessions = 0 AND online_since IS NULL")
+        for row in self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM players"):
+            record = PlayerRecord.from_row(row)
+            self.players[record.key] = record
+            if record.online_since is not None:
+                # Online when the API last stopped; the next reconciliation settles it
+                self.online[record.key] = record
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def _record(self, name: str, ts: float) -> PlayerRecord:
+        key = name.lower()
+        record = self.players.get(key)
+        if record is None:
+            record = self.players[key] = PlayerRecord(name, ts)
+        record.name = name
+        self._dirty.add(key)
+        return record
+
+    def _join(self, name: str, ts: float):
+        record = self._record(name, ts)
+        if record.online_since is None:
+            record.online_since = ts
+            record.sessions += 1
+            self.online[record.key] = record
+
+    def _leave(self, record: PlayerRecord, ts: float):
+        if record.online_since is not None:
+            record.play_seconds += max(0.0, ts - record.online_since)
+            record.online_since = None
+        record.last_seen = ts
+        self.online.pop(record.key, None)
+        self._dirty.add(record.key)
+
+    def handle(self, event: ParsedEvent, ts: Optional[float] = None):
+        """Update the registry from a parsed console event."""
+        kind, _, _, player, _, _ = event
+        if player is None or kind == KIND_IDS["other"]:
+            return
+        ts = time.time() if ts is None else ts
+        if kind == KIND_IDS["join"]:
+            self._join(player, ts)
+        elif kind == KIND_IDS["leave"]:
+            record = self.players.get(player.lower())
+            if record is not None:
+                self._leave(record, ts)
+        elif player.lower() not in self.players:
+            # Only names seen joining or in `list` are players; feedback sources like
+            # plugins or named entities are not
+            return
+        elif kind == KIND_IDS["chat"]:
+            self._record(player, ts).chat_messages += 1
+        elif kind == KIND_IDS["command"]:
+            self._record(player, ts).commands += 1
+
+    def reconcile(self, response: str, ts: Optional[float] = None):
+        """Bring the online set in line with a `list` response."""
+        parsed = parse_list(response)
+        if parsed is None:
+            return
+        ts = time.time() if ts is None else ts
+        online, self.max_players, names = parsed
+        if names is None:
+            # Prefixes or a truncated list; joins and leaves from the console still apply
+            return
+        listed = {name.lower(): name for name in names}
+        # Joins and leaves seen on the console after `list` was sent are newer than its answer
+        for key, record in list(self.online.items()):
+            if key not in listed and record.online_since <= ts:
+                logger.debug(f"Player {record.name} is no longer online")
+                self._leave(record, ts)
+        for key, name in listed.items():
+            record = self.players.get(key)
+            if key not in self.online and (record is None or record.last_seen <= ts):
+                self._join(name, ts)
+        self.reconciled_at = ts
+
+    def end_sessions(self, ts: Optional[float] = None):
+        """Everyone leaves, e.g. when the server process exits."""
+        ts = time.time() if ts is None else ts
+        for record in list(self.online.values()):
+            self._leave(record, ts)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        record = self.players.get(name.lower())
+        return record.to_dict(time.time()) if record is not None else None
+
+    def snapshot(self, include_offline: bool = False, limit: int = 100) -> Dict[str, Any]:
+        now = time.time()
+        result = {
+            "online_count": len(self.online),
+            "max_players": self.max_players,
+            "known_players": len(self.players),
+            "reconciled_at": self.reconciled_at,
+            "online": sorted((record.to_dict(now) for record in self.online.values()),
+                             key=lambda player: player["online_since"]),
+        }
+        if include_offline:
+            offline = (record for record in self.players.values() if record.online_since is None)
+            result["offline"] = [record.to_dict(now) for record in
+                                 sorted(offline, key=lambda record: record.last_seen, reverse=True)[:limit]]
+        return result
+
+    def flush(self, rows: Optional[List[PlayerRow]] = None):
+        """Write changed players in one transaction (runs in a thread when given the rows)."""
+        if rows is None:
+            rows = self._take_dirty()
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany(f"INSERT OR REPLACE INTO players VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def _take_dirty(self) -> List[PlayerRow]:
+        # Rows are copied on the event loop, so the thread never sees a record change under it
+        dirty, self._dirty = self._dirty, set()
+        return [self.players[key].row() for key in dirty]
+
+    def start(self, scheduler: PeriodicScheduler, flush_interval: float = 5.0):
+        if self._job is None:
+            self._job = scheduler.add(f"player registry {self.path}", flush_interval, self._flush,
+                                      delay=flush_interval)
+
+    async def stop(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        await asyncio.to_thread(self.flush, self._take_dirty())
+
+    async def _flush(self):
+        rows = self._take_dirty()
+        if rows:
+            await asyncio.to_thread(self.flush, rows)
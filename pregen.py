@@ -0,0 +1,347 @@
+import os
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, model_validator
+
+logger = logging.getLogger("minecraft-server-api")
+
+MAX_RADIUS = 30000  # blocks
+# Responses of vanilla commands that did nothing; the job stops rather than spin on them
+COMMAND_ERRORS = ("Unknown or incomplete command", "Incorrect argument", "Unknown dimension", "I'm sorry",
+                  "You do not have permission", "Too many chunks")
+RATE_WINDOW = 60.0  # seconds of batches the reported rate is averaged over
+
+
+class PregenError(Exception):
+    """A pregeneration job could not be started or changed."""
+
+
+class PregenRequest(BaseModel):
+    """A pregeneration job (POST /api/server/pregen)."""
+    dimension: str = Field(default="minecraft:overworld", pattern=r"^[a-z0-9_.-]+:[a-z0-9_./-]+$")
+    # Center and radius in blocks; the job covers the square of chunks around the center
+    center_x: int = Field(default=0, ge=-MAX_RADIUS, le=MAX_RADIUS)
+    center_z: int = Field(default=0, ge=-MAX_RADIUS, le=MAX_RADIUS)
+    radius: int = Field(ge=16, le=MAX_RADIUS)
+    # "forceload" loads each batch with /forceload and releases it; "command" runs a plugin's
+    # command per chunk, with {x} {z} (chunk), {block_x} {block_z} and {dimension} filled in
+    method: Literal["forceload", "command"] = "forceload"
+    command: str = ""
+    # Chunks per batch at the start and at most; the throttle adjusts it in between
+    batch: int = Field(default=16, ge=1, le=64)
+    max_batch: int = Field(default=64, ge=1, le=256)
+    # Seconds a batch stays loaded so the server can generate it
+    settle: float = Field(default=2.0, ge=0.0, le=60.0)
+    # MSPT the server should stay under while generating
+    target_mspt: float = Field(default=45.0, gt=0.0, le=1000.0)
+    pause_for_players: bool = True
+
+    @model_validator(mode="after")
+    def check_command(self) -> "PregenRequest":
+        if self.method == "command":
+            if not self.command.strip():
+                raise ValueError("The command method needs a command template")
+            # Unknown placeholders or stray braces would only fail once the job runs
+            try:
+                format_command(self.command, 0, 0, "d")
+            except PregenError as e:
+                raise ValueError(str(e))
+        self.max_batch = max(self.max_batch, self.batch)
+        return self
+
+
+def format_command(template: str, x: int, z: int, dimension: str) -> str:
+    """Fill in a command template; the placeholders are {x}, {z}, {block_x}, {block_z} and {dimension}."""
+    try:
+        return template.format(x=x, z=z, block_x=x * 16, block_z=z * 16, dimension=dimension)
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise PregenError(f"Invalid command template {template!r}: {type(e).__name__} {str(e)}")
+
+
+def spiral_chunk(index: int) -> Tuple[int, int]:
+    """Offset of the index-th chunk of a square spiral around (0, 0).
+
+    Ring k (k >= 1) holds the 8k chunks at Chebyshev distance k and starts at
+    index (2k - 1)^2, so any index maps to its chunk without walking the spiral.
+    """
+    if index == 0:
+        return 0, 0
+    k = (math.isqrt(index) + 1) // 2
+    pos = index - (2 * k - 1) ** 2
+    side, step = divmod(pos, 2 * k)
+    if side == 0:
+        return k, -k + 1 + step
+    if side == 1:
+        return k - 1 - step, k
+    if side == 2:
+        return -k, k - 1 - step
+    return -k + 1 + step, -k
+
+
+class ChunkPregenerator:
+    """Generates the chunks around a center ahead of play, in spiral batches over RCON.
+
+    Each batch is force-loaded (or handed to a plugin's command) and given
+    time to generate. The cursor into the spiral is saved after every batch,
+    so a job survives API and server restarts and goes on where it stopped.
+    The job waits while the server is down or players are online, and
+    throttles itself on the server's MSPT and its "Can't keep up!" warnings:
+    smaller batches and longer pauses under lag, larger and shorter again
+    once the server keeps up.
+    """
+
+    def __init__(self, path: str, command: Callable[[str], Awaitable[str]], is_running: Callable[[], bool],
+                 players_online: Callable[[], int], get_mspt: Callable[[], Optional[float]], name: str = "server",
+                 min_delay: float = 0.5, max_delay: float = 60.0, poll_interval: float = 5.0):
+        self.path = path
+        self.command = command
+        self.is_running = is_running
+        self.players_online = players_online
+        self.get_mspt = get_mspt
+        self.name = name
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        # The current or last job, as saved: id, request, status, cursor, total, elapsed...
+        self.job: Optional[Dict[str, Any]] = None
+        self.waiting: Optional[str] = None  # why a running job isn't generating right now
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._lag_events = 0
+        self._rate: Deque[Tuple[float, int]] = deque()  # (monotonic, cursor) after each batch
+        self._loaded: List[Tuple[int, int]] = []  # force-loaded chunks not yet released
+
+    # ----- Persistence -----
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.job = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading pregeneration state from {self.path}: {str(e)}")
+
+    def _save(self, job: Optional[Dict[str, Any]] = None):
+        job = job if job is not None else self.job
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    async def _persist(self):
+        self.job["updated"] = time.time()
+        await asyncio.to_thread(self._save, dict(self.job))
+
+    def start(self):
+        if self.job is not None and self.job["status"] == "running":
+            logger.info(f"Resuming pregeneration {self.job['id']} of {self.name} at chunk {self.job['cursor']}")
+            self._spawn()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _spawn(self):
+        self._rate.clear()
+        self._lag_events = 0
+        self._task = asyncio.create_task(self._run())
+
+    # ----- Control -----
+    def create(self, request: PregenRequest) -> Dict[str, Any]:
+        if self.job is not None and self.job["status"] in ("running", "paused"):
+            raise PregenError("Предварительная генерация уже выполняется")
+        radius = (request.radius + 15) // 16
+        self.job = {
+            "id": uuid.uuid4().hex[:8],
+            "request": request.model_dump(),
+            "status": "running",
+            "cursor": 0,
+            "total": (2 * radius + 1) ** 2,
+            "batch": request.batch,
+            "delay": self.min_delay,
+            "elapsed": 0.0,
+            "created": time.time(),
+            "updated": time.time(),
+            "error": None,
+        }
+        self._save()
+        self._spawn()
+        return self.status()
+
+    async def pause(self):
+        if self.job is None or self.job["status"] != "running":
+            raise PregenError("Нет выполняющейся генерации")
+        await self.stop()
+        self.job["status"] = "paused"
+        await self._persist()
+
+    async def resume(self):
+        if self.job is None or self.job["status"] != "paused":
+            raise PregenError("Нет приостановленной генерации")
+        self.job["status"] = "running"
+        await self._persist()
+        self._spawn()
+
+    async def cancel(self):
+        if self.job is None or self.job["status"] not in ("running", "paused"):
+            raise PregenError("Нет выполняющейся генерации")
+        await self.stop()
+        self.job["status"] = "cancelled"
+        await self._persist()
+
+    def on_lag(self):
+        """A "Can't keep up!" warning from the console."""
+        if self._task is not None:
+            self._lag_events += 1
+
+    def player_joined(self):
+        self._wake.set()
+
+    # ----- The job -----
+    def _chunks(self, start: int, count: int) -> List[Tuple[int, int]]:
+        request = self.job["request"]
+        cx, cz = request["center_x"] >> 4, request["center_z"] >> 4
+        end = min(start + count, self.job["total"])
+        return [(cx + dx, cz + dz) for dx, dz in map(spiral_chunk, range(start, end))]
+
+    def _blocked(self) -> Optional[str]:
+        if not self.is_running():
+            return "Сервер не запущен"
+        if self.job["request"]["pause_for_players"] and self.players_online() > 0:
+            return "На сервере есть игроки"
+        return None
+
+    async def _sleep(self, seconds: float):
+        """Sleep, but wake up early when a player joins."""
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        try:
+            while self.job["cursor"] < self.job["total"]:
+                self.waiting = self._blocked()
+                if self.waiting is not None:
+                    await self._release()
+                    self._rate.clear()
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+
+                started = time.monotonic()
+                chunks = self._chunks(self.job["cursor"], self.job["batch"])
+                try:
+                    await self._generate(chunks)
+                except PregenError:
+                    raise
+                except Exception as e:
+                    # RCON down while the server restarts or stops; the batch is tried again
+                    logger.warning(f"Pregeneration batch of {self.name} failed, retrying: {str(e)}")
+                    await self._release()
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                self.job["cursor"] += len(chunks)
+                self.job["elapsed"] = round(self.job["elapsed"] + time.monotonic() - started, 3)
+                self._rate.append((time.monotonic(), self.job["cursor"]))
+                self._throttle()
+                await self._persist()
+                if self.job["cursor"] < self.job["total"]:
+                    await self._sleep(self.job["delay"])
+
+            self.job["status"] = "done"
+            self.waiting = None
+            logger.info(f"Pregeneration {self.job['id']} of {self.name} done: {self.job['total']} chunks "
+                        f"in {self.job['elapsed']:.0f}s")
+            await self._persist()
+        except PregenError as e:
+            logger.error(f"Pregeneration {self.job['id']} of {self.name} failed: {str(e)}")
+            self.job["status"], self.job["error"], self.waiting = "failed", str(e), None
+            await self._release()
+            await self._persist()
+        except asyncio.CancelledError:
+            # Paused, cancelled or the API is stopping: the chunks must not stay loaded
+            await asyncio.shield(self._release())
+            raise
+
+    async def _generate(self, chunks: List[Tuple[int, int]]):
+        request = self.job["request"]
+        dimension = request["dimension"]
+        if request["method"] == "forceload":
+            for x, z in chunks:
+                self._check(await self.command(f"execute in {dimension} run forceload add {x * 16} {z * 16}"))
+                self._loaded.append((x, z))
+        else:
+            for x, z in chunks:
+                self._check(await self.command(format_command(request["command"], x, z, dimension)))
+        # The server generates the chunks over the next ticks
+        await asyncio.sleep(request["settle"])
+        await self._release()
+
+    @staticmethod
+    def _check(response: Optional[str]):
+        if response and any(error in response for error in COMMAND_ERRORS):
+            raise PregenError(response.strip())
+
+    async def _release(self):
+        """Un-force the chunks of the last batch."""
+        dimension = self.job["request"]["dimension"] if self.job else "minecraft:overworld"
+        while self._loaded:
+            x, z = self._loaded[-1]
+            try:
+                await self.command(f"execute in {dimension} run forceload remove {x * 16} {z * 16}")
+            except Exception as e:
+                logger.error(f"Could not release force-loaded chunk {x}, {z}: {str(e)}")
+                # The server drops forced chunks it doesn't know of after a restart anyway
+                if self.is_running():
+                    return
+            self._loaded.pop()
+
+    def _throttle(self):
+        """Additive increase, multiplicative decrease of the batch size, the reverse for the pause."""
+        request = self.job["request"]
+        mspt = self.get_mspt()
+        # Any lag warning since the last batch, including during the pause before it
+        lagged, self._lag_events = self._lag_events > 0, 0
+        if lagged or (mspt is not None and mspt > request["target_mspt"]):
+            self.job["batch"] = max(1, self.job["batch"] // 2)
+            self.job["delay"] = min(self.max_delay, max(self.job["delay"] * 2, self.min_delay * 2))
+        elif mspt is None or mspt < request["target_mspt"] * 0.8:
+            self.job["batch"] = min(request["max_batch"], self.job["batch"] + 1)
+            self.job["delay"] = max(self.min_delay, self.job["delay"] * 0.8)
+
+    # ----- Reporting -----
+    def _chunks_per_second(self) -> Optional[float]:
+        now = time.monotonic()
+        while len(self._rate) > 2 and now - self._rate[0][0] > RATE_WINDOW:
+            self._rate.popleft()
+        if len(self._rate) < 2:
+            return None
+        (first_ts, first_cursor), (last_ts, last_cursor) = self._rate[0], self._rate[-1]
+        return (last_cursor - first_cursor) / (last_ts - first_ts) if last_ts > first_ts else None
+
+    def status(self) -> Dict[str, Any]:
+        if self.job is None:
+            return {"status": "idle"}
+        job = self.job
+        rate = self._chunks_per_second() if job["status"] == "running" and self.waiting is None else None
+        remaining = job["total"] - job["cursor"]
+        x, z = self._chunks(job["cursor"], 1)[0] if remaining > 0 else (None, None)
+        return {
+            **job,
+            "waiting": self.waiting if job["status"] == "running" else None,
+            "percent": round(100.0 * job["cursor"] / job["total"], 2),
+            "next_chunk": {"x": x, "z": z} if x is not None else None,
+            "chunks_per_second": round(rate, 2) if rate is not None else None,
+            "eta_seconds": round(remaining / rate) if rate else None,
+            "mspt": self.get_mspt(),
+        }
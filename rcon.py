@@ -0,0 +1,310 @@
+import time
+import struct
+import asyncio
+import logging
+import itertools
+from typing import Optional, List, Dict, Any, Tuple, Union
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Packet types of the Source RCON protocol used by Minecraft
+PACKET_RESPONSE = 0
+PACKET_COMMAND = 2
+PACKET_AUTH = 3
+
+# Minecraft splits responses into packets with at most this many bytes of body
+MAX_RESPONSE_FRAGMENT = 4096
+MAX_PACKET_SIZE = 4096 + 10 + 4
+
+
+class RconError(Exception):
+    """Base class for RCON failures."""
+
+
+class RconAuthError(RconError):
+    """The server rejected the RCON password."""
+
+
+class RconUnavailableError(RconError):
+    """The server is not reachable and we are waiting before the next connection attempt."""
+
+
+class RconBatchError(RconError):
+    """A batch failed part way; `completed` holds the results received before the failure."""
+
+    def __init__(self, error: BaseException, completed: List[Tuple[str, float]]):
+        super().__init__(str(error) or type(error).__name__)
+        self.error = error
+        self.completed = completed
+
+
+def encode_packet(request_id: int, packet_type: int, body: Union[str, bytes]) -> bytes:
+    """Build a length-prefixed RCON packet."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    payload = struct.pack("<ii", request_id, packet_type) + body + b"\x00\x00"
+    return struct.pack("<i", len(payload)) + payload
+
+
+async def read_packet(reader: asyncio.StreamReader) -> tuple:
+    """Read one packet and return (request_id, packet_type, body).
+
+    The body is left as bytes: a response split over several packets may cut a
+    UTF-8 character in two, so fragments are joined before decoding.
+    """
+    header = await reader.readexactly(4)
+    (length,) = struct.unpack("<i", header)
+    if length < 10 or length > MAX_PACKET_SIZE:
+        raise RconError(f"Invalid RCON packet length: {length}")
+    payload = await reader.readexactly(length)
+    request_id, packet_type = struct.unpack("<ii", payload[:8])
+    return request_id, packet_type, payload[8:-2]
+
+
+def decode_body(fragments: List[bytes]) -> str:
+    return b"".join(fragments).decode("utf-8", errors="replace")
+
+
+class RconConnection:
+    """A single authenticated RCON connection.
+
+    Vanilla servers only handle one packet per socket read, so requests on a
+    connection are strictly sequential; concurrency comes from the pool.
+    """
+
+    def __init__(self, host: str, port: int, password: str, timeout: float):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        # Keep ids positive 31-bit integers; -1 is reserved for auth failures
+        self._ids = itertools.cycle(range(1, 0x7FFFFFFF))
+
+    @property
+    def connected(self) -> bool:
+        # at_eof() catches connections the server closed while they sat idle in the pool
+        return self.writer is not None and not self.writer.is_closing() and not self.reader.at_eof()
+
+    def _next_id(self) -> int:
+        return next(self._ids)
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        try:
+            request_id = self._next_id()
+            self.writer.write(encode_packet(request_id, PACKET_AUTH, self.password))
+            await self.writer.drain()
+            while True:
+                response_id, packet_type, _ = await asyncio.wait_for(read_packet(self.reader), self.timeout)
+                if response_id == -1:
+                    raise RconAuthError("RCON authentication failed")
+                # Some servers send an empty RESPONSE_VALUE before the auth response
+                if response_id == request_id and packet_type == PACKET_COMMAND:
+                    break
+        except BaseException:
+            await self.close()
+            raise
+
+    async def close(self):
+        writer, self.reader, self.writer = self.writer, None, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _send(self, command: str) -> int:
+        request_id = self._next_id()
+        self.writer.write(encode_packet(request_id, PACKET_COMMAND, command))
+        await self.writer.drain()
+        return request_id
+
+    async def _receive(self, request_id: int) -> str:
+        """Collect the (possibly multi-packet) response for request_id."""
+        fragments: List[bytes] = []
+        sentinel_id: Optional[int] = None
+        while True:
+            response_id, _, body = await read_packet(self.reader)
+            if sentinel_id is not None and response_id == sentinel_id:
+                # The server answered the sentinel, so every fragment has arrived
+                return decode_body(fragments)
+            if response_id != request_id:
+                # Stale answer to a request that timed out earlier
+                continue
+            fragments.append(body)
+            if sentinel_id is None:
+                if len(body) < MAX_RESPONSE_FRAGMENT:
+                    return decode_body(fragments)
+                # A full-size fragment may be followed by more; an invalid request
+                # is answered only after all of them, marking the end of the response
+                sentinel_id = self._next_id()
+                self.writer.write(encode_packet(sentinel_id, PACKET_RESPONSE, ""))
+                await self.writer.drain()
+
+    async def command(self, command: str) -> str:
+        request_id = await self._send(command)
+        return await asyncio.wait_for(self._receive(request_id), self.timeout)
+
+    async def batch(self, commands: List[str], pipelined: bool = False) -> List[Tuple[str, float]]:
+        """Run commands in order and return (response, seconds) for each.
+
+        With pipelined=True all requests are written before the responses are
+        read. Only use that with servers that buffer several packets per read;
+        vanilla drops the connection when packets arrive back to back.
+        """
+        results: List[Tuple[str, float]] = []
+        try:
+            if pipelined:
+                # Responses come back in request order, so fragments are grouped by id and
+                # a single trailing sentinel marks the end of the last response
+                request_ids = [self._next_id() for _ in commands]
+                sentinel_id = self._next_id()
+                for request_id, command in zip(request_ids, commands):
+                    self.writer.write(encode_packet(request_id, PACKET_COMMAND, command))
+                self.writer.write(encode_packet(sentinel_id, PACKET_RESPONSE, ""))
+                started = time.monotonic()
+                await self.writer.drain()
+
+                fragments: Dict[int, List[bytes]] = {request_id: [] for request_id in request_ids}
+                current = 0
+                while current < len(request_ids):
+                    response_id, _, body = await asyncio.wait_for(read_packet(self.reader), self.timeout)
+                    if response_id not in fragments and response_id != sentinel_id:
+                        continue
+                    while current < len(request_ids) and response_id != request_ids[current]:
+                        # A packet for a later request (or the sentinel) ends the current response
+                        now = time.monotonic()
+                        results.append((decode_body(fragments[request_ids[current]]), now - started))
+                        started = now
+                        current += 1
+                    if response_id in fragments:
+                        fragments[response_id].append(body)
+            else:
+                for command in commands:
+                    started = time.monotonic()
+                    response = await self.command(command)
+                    results.append((response, time.monotonic() - started))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+            raise RconBatchError(e, results) from e
+        return results
+
+
+class RconClient:
+    """Pool of persistent RCON connections with reconnect backoff and health reporting."""
+
+    def __init__(self, host: str, port: int, password: str, pool_size: int = 2, timeout: float = 10.0,
+                 min_backoff: float = 0.5, max_backoff: float = 15.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._connections = [RconConnection(host, port, password, timeout) for _ in range(pool_size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+        # Health statistics
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.commands_sent = 0
+
+    def _pool(self) -> asyncio.Queue:
+        # Created lazily so the client can be constructed outside of a running loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for connection in self._connections:
+                self._idle.put_nowait(connection)
+            self._connect_lock = asyncio.Lock()
+        return self._idle
+
+    def reset_backoff(self):
+        """Allow an immediate reconnect, e.g. right after the server was started."""
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    async def _ensure_connected(self, connection: RconConnection):
+        if connection.connected:
+            return
+        async with self._connect_lock:
+            now = time.monotonic()
+            if now < self._retry_at:
+                raise RconUnavailableError(
+                    f"RCON unavailable, retrying in {self._retry_at - now:.1f}s: {self.last_error}"
+                )
+            await connection.connect()
+            logger.info(f"RCON connected to {self.host}:{self.port}")
+
+    def _record_failure(self, error: str):
+        self.consecutive_failures += 1
+        self.last_error = error
+        self._backoff = min(self.max_backoff, max(self.min_backoff, self._backoff * 2))
+        self._retry_at = time.monotonic() + self._backoff
+
+    def _record_success(self, started: float):
+        self.consecutive_failures = 0
+        self.last_error = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.last_success = time.time()
+        self.last_latency = time.monotonic() - started
+
+    async def _run(self, operation):
+        """Run operation(connection) on an idle pooled connection."""
+        pool = self._pool()
+        connection = await pool.get()
+        started = time.monotonic()
+        try:
+            await self._ensure_connected(connection)
+            result = await operation(connection)
+            self._record_success(started)
+            return result
+        except RconUnavailableError:
+            raise
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+            # The connection state is unknown after any failure, start over next time
+            await connection.close()
+            self._record_failure(str(e) or type(e).__name__)
+            raise
+        except BaseException:
+            await connection.close()
+            raise
+        finally:
+            pool.put_nowait(connection)
+
+    async def command(self, command: str) -> str:
+        """Send a command and return the full response text."""
+        self.commands_sent += 1
+        return await self._run(lambda connection: connection.command(command))
+
+    async def batch(self, commands: List[str], pipelined: bool = False) -> List[Tuple[str, float]]:
+        """Send several commands over one connection, in order, with per-command timings."""
+        self.commands_sent += len(commands)
+        return await self._run(lambda connection: connection.batch(commands, pipelined))
+
+    async def close(self):
+        for connection in self._connections:
+            await connection.close()
+
+    def health(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "healthy": self.consecutive_failures == 0,
+            "connections": sum(1 for c in self._connections if c.connected),
+            "pool_size": len(self._connections),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_success": self.last_success,
+            "last_latency_ms": round(self.last_latency * 1000, 2) if self.last_latency is not None else None,
+            "retry_in": round(self._retry_at - now, 2) if self._retry_at > now else 0,
+            "commands_sent": self.commands_sent,
+        }
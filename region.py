@@ -0,0 +1,84 @@
+"""Anvil region (.mca) file layout.
+
+A region holds 32x32 chunks. It starts with two 4 KiB tables of 1024 big-endian
+ints: chunk locations (sector offset << 8 | sector count) and last-save
+timestamps. Every chunk is stored from its first sector as a 4-byte length,
+a 1-byte compression type and the compressed NBT data.
+"""
+import os
+import gzip
+import zlib
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+SECTOR_BYTES = 4096
+HEADER_BYTES = 2 * SECTOR_BYTES
+CHUNKS_PER_REGION = 1024
+CHUNK_PREFIX_BYTES = 5  # length + compression type
+# Compression types; chunks too big for the region have 128 added and live in a .mcc file
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+COMPRESSION_LZ4 = 4
+EXTERNAL_FLAG = 128
+# Long tag (type 4) named "InhabitedTime": the ticks players have spent near the chunk
+INHABITED_TIME_TAG = b"\x04\x00\x0dInhabitedTime"
+
+
+def chunk_locations(header: bytes) -> Iterator[Tuple[int, int, int]]:
+    """Yield (index, sector offset, sector count) of every chunk present in the region."""
+    for index in range(CHUNKS_PER_REGION):
+        location = int.from_bytes(header[index * 4:index * 4 + 4], "big")
+        offset, count = location >> 8, location & 0xFF
+        # Offsets 0 and 1 are the header itself, so they mean "not generated"
+        if offset >= 2 and count:
+            yield index, offset, count
+
+
+def region_coords(name: str) -> Optional[Tuple[int, int]]:
+    """r.-1.2.mca -> (-1, 2); None for anything else."""
+    parts = name.split(".")
+    if len(parts) != 4 or parts[0] != "r" or parts[3] != "mca":
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+def decompress_chunk(compression: int, data: bytes) -> Optional[bytes]:
+    """The chunk's NBT, or None for compressions this module can't read (LZ4, custom, external)."""
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_GZIP:
+        return gzip.decompress(data)
+    if compression == COMPRESSION_NONE:
+        return data
+    return None
+
+
+def inhabited_time(nbt: bytes) -> Optional[int]:
+    """InhabitedTime of a chunk, found without parsing the rest of its NBT.
+
+    The tag sits at the root of the chunk since 1.18 and in its Level
+    compound before; the name is unique either way.
+    """
+    position = nbt.find(INHABITED_TIME_TAG)
+    if position < 0 or position + len(INHABITED_TIME_TAG) + 8 > len(nbt):
+        return None
+    return struct.unpack_from(">q", nbt, position + len(INHABITED_TIME_TAG))[0]
+
+
+def world_names(server_dir: str) -> List[str]:
+    """The level directory from server.properties plus its nether and end, where they exist."""
+    level = "world"
+    try:
+        with open(os.path.join(server_dir, "server.properties"), "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.strip().partition("=")
+                if key == "level-name" and value:
+                    level = value
+    except OSError:
+        pass
+    return [name for name in (level, f"{level}_nether", f"{level}_the_end")
+            if os.path.isdir(os.path.join(server_dir, name))]
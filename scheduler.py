@@ -0,0 +1,141 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("minecraft-server-api")
+
+
+class PeriodicJob:
+    """A function run by PeriodicScheduler every `interval` seconds, or at the times `next_run` picks."""
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable[None]],
+                 next_run: Optional[Callable[[float], Optional[float]]] = None):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        # Wall-clock time of the next run after the given one; None ends the job
+        self.next_run = next_run
+        self.cancelled = False
+        self.runs = 0
+        self.last_duration: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def cancel(self):
+        """Stop scheduling the job and interrupt a run that is in progress."""
+        self.cancelled = True
+        if self._task is not None:
+            self._task.cancel()
+
+
+class PeriodicScheduler:
+    """Runs the periodic work of every server instance from a single task.
+
+    Jobs wait in a heap ordered by their next run time, so the loop only
+    wakes up when something is due, however many instances are configured.
+    Each run gets its own task and the job is rescheduled `interval` seconds
+    after it finishes: a slow job (an RCON query to a server that hangs)
+    never delays the others and never overlaps with itself. Timed jobs (cron
+    schedules) are rescheduled at the next wall-clock time they ask for.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, PeriodicJob]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, job in self._heap if not job.cancelled) + len(self._running)
+
+    def add(self, name: str, interval: float, func: Callable[[], Awaitable[None]],
+            delay: float = 0.0) -> PeriodicJob:
+        """Run `func` every `interval` seconds, the first time after `delay`."""
+        job = PeriodicJob(name, interval, func)
+        self._push(job, time.monotonic() + delay)
+        return job
+
+    def add_timed(self, name: str, next_run: Callable[[float], Optional[float]],
+                  func: Callable[[], Awaitable[None]], first: Optional[float] = None) -> PeriodicJob:
+        """Run `func` at wall-clock times: `first` (default next_run(now)), then next_run(time of the last run end)."""
+        job = PeriodicJob(name, 0.0, func, next_run)
+        first = next_run(time.time()) if first is None else first
+        if first is None:
+            job.cancelled = True
+        else:
+            self._push(job, self._monotonic(first))
+        return job
+
+    @staticmethod
+    def _monotonic(wall: float) -> float:
+        return time.monotonic() + max(0.0, wall - time.time())
+
+    def _push(self, job: PeriodicJob, due: float):
+        heapq.heappush(self._heap, (due, next(self._counter), job))
+        # The loop may be sleeping until a later job
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    async def _run(self):
+        while True:
+            # Cancelled jobs are dropped lazily when they reach the top
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, job = heapq.heappop(self._heap)
+            job._task = asyncio.create_task(self._execute(job))
+            self._running.add(job._task)
+            job._task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job: PeriodicJob):
+        started = time.monotonic()
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            if job.cancelled:
+                return
+            raise
+        except Exception as e:
+            logger.error(f"Error in {job.name}: {str(e)}")
+        finally:
+            job._task = None
+            job.runs += 1
+            job.last_duration = time.monotonic() - started
+
+        if job.cancelled:
+            return
+        if job.next_run is None:
+            self._push(job, time.monotonic() + job.interval)
+            return
+        due = job.next_run(time.time())
+        if due is None:
+            job.cancelled = True
+        else:
+            self._push(job, self._monotonic(due))
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from cron import CronExpression
+from scheduler import PeriodicJob, PeriodicScheduler
+
+logger = logging.getLogger("minecraft-server-api")
+
+ACTION_LABELS = {
+    "restart": "Перезапуск сервера",
+    "stop": "Остановка сервера",
+    "start": "Запуск сервера",
+    "save": "Сохранение мира",
+    "backup": "Резервное копирование",
+    "command": "Команда",
+    "broadcast": "Объявление",
+}
+MAX_COUNTDOWN = 3600  # seconds
+
+
+class ScheduleError(Exception):
+    """A scheduled task could not be created or changed."""
+
+
+class TaskSkipped(Exception):
+    """The action of a scheduled task had nothing to do, e.g. a restart of a stopped server."""
+
+
+class ScheduledTask(BaseModel):
+    """One task of a server's schedule (POST/PUT /api/server/schedules)."""
+    id: str = Field(default="", pattern=r"^([a-z0-9][a-z0-9_-]{0,31})?$")
+    name: str = ""
+    cron: str
+    action: Literal["restart", "stop", "start", "save", "backup", "command", "broadcast"]
+    # The RCON command for "command", the message for "broadcast"
+    argument: str = ""
+    # Seconds before the action at which players are warned in chat, e.g. [300, 60, 10]
+    countdown: List[int] = []
+    countdown_message: str = "{action} через {time}"
+    # "empty": skip while players are online; "occupied": only run while someone is online
+    players: Literal["any", "empty", "occupied"] = "any"
+    enabled: bool = True
+    # After an API restart, run a missed occurrence once if it is at most this many seconds old (0 = never)
+    catch_up: int = Field(default=3600, ge=0)
+
+    @field_validator("cron")
+    @classmethod
+    def check_cron(cls, value: str) -> str:
+        CronExpression(value).next_after(time.time())
+        return value
+
+    @field_validator("countdown")
+    @classmethod
+    def check_countdown(cls, value: List[int]) -> List[int]:
+        if any(not 0 < seconds <= MAX_COUNTDOWN for seconds in value):
+            raise ValueError(f"Countdown times must be between 1 and {MAX_COUNTDOWN} seconds")
+        return sorted(set(value), reverse=True)
+
+    @field_validator("countdown_message")
+    @classmethod
+    def check_countdown_message(cls, value: str) -> str:
+        # Only {action} and {time} are filled in; anything else would fail at the first warning
+        try:
+            value.format(action="", time="")
+        except (KeyError, IndexError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid countdown message: {type(e).__name__} {str(e)}")
+        return value
+
+    @model_validator(mode="after")
+    def check_argument(self) -> "ScheduledTask":
+        if self.action in ("command", "broadcast") and not self.argument.strip():
+            raise ValueError(f"The {self.action} action needs an argument")
+        return self
+
+
+def format_countdown(seconds: int) -> str:
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} ч"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} мин"
+    return f"{seconds} сек"
+
+
+class TaskScheduler:
+    """A server's cron tasks (restarts, saves, broadcasts...), run as timed jobs of the shared scheduler.
+
+    Definitions and the outcome of every task's last run are kept in a JSON
+    file. On start, a task whose occurrence was missed while the API was
+    down runs once, unless it is older than the task's catch_up window.
+    Warnings go out in chat at the countdown times before the action, and the
+    player condition is checked both when the countdown starts and right
+    before the action.
+    """
+
+    def __init__(self, path: str, execute: Callable[[ScheduledTask], Awaitable[str]],
+                 broadcast: Callable[[str], Awaitable[Any]], players_online: Callable[[], int],
+                 record: Optional[Callable[..., Awaitable[Any]]] = None, name: str = "server"):
+        self.path = path
+        self.execute = execute
+        self.broadcast = broadcast
+        self.players_online = players_online
+        self.record = record
+        self.name = name
+        self.tasks: Dict[str, ScheduledTask] = {}
+        # Per task: last_run (the occurrence), created, finished, status, message
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self._jobs: Dict[str, PeriodicJob] = {}
+        self._next: Dict[str, float] = {}  # task id -> the occurrence its job runs for next
+        self._scheduler: Optional[PeriodicScheduler] = None
+        self._save_lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading schedules from {self.path}: {str(e)}")
+            return
+        for entry in data.get("tasks", []):
+            try:
+                task = ScheduledTask.model_validate(entry)
+            except ValueError as e:
+                logger.error(f"Ignoring invalid scheduled task {entry.get('id')}: {str(e)}")
+                continue
+            self.tasks[task.id] = task
+        self.state = {task_id: state for task_id, state in data.get("state", {}).items() if task_id in self.tasks}
+
+    def _save(self, data: Optional[str] = None):
+        """Write the schedule file; runs in a thread when given the data serialized on the event loop."""
+        if data is None:
+            data = self._serialize()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._save_lock:
+            with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(f"{self.path}.tmp", self.path)
+
+    def _serialize(self) -> str:
+        return json.dumps({"tasks": [task.model_dump() for task in self.tasks.values()], "state": self.state},
+                          ensure_ascii=False, indent=2)
+
+    def start(self, scheduler: PeriodicScheduler):
+        if self._scheduler is not None:
+            return
+        self._scheduler = scheduler
+        now = time.time()
+        for task in self.tasks.values():
+            self._schedule(task, self._missed(task, now))
+
+    async def stop(self):
+        for job in self._jobs.values():
+            job.cancel()
+        self._jobs.clear()
+        self._scheduler = None
+
+    def _missed(self, task: ScheduledTask, now: float) -> Optional[float]:
+        """The occurrence to catch up on, if the last one before now never ran."""
+        state = self.state.get(task.id, {})
+        since = state.get("last_run") or state.get("created")
+        if not task.enabled or not task.catch_up or since is None:
+            return None
+        cron = CronExpression(task.cron)
+        # Only the newest missed occurrence counts, and only within the catch-up window
+        missed = None
+        occurrence = cron.next_after(max(since, now - task.catch_up - 1))
+        while occurrence <= now:
+            missed, occurrence = occurrence, cron.next_after(occurrence)
+        return missed
+
+    def _schedule(self, task: ScheduledTask, missed: Optional[float] = None):
+        old = self._jobs.pop(task.id, None)
+        if old is not None:
+            old.cancel()
+        self._next.pop(task.id, None)
+        if not task.enabled or self._scheduler is None:
+            return
+
+        cron = CronExpression(task.cron)
+        lead = task.countdown[0] if task.countdown else 0
+
+        def next_run(after: float) -> Optional[float]:
+            # A job woken a moment early must not get the same occurrence again
+            after = max(after, self.state.get(task.id, {}).get("last_run") or 0)
+            occurrence = cron.next_after(after + lead)
+            self._next[task.id] = occurrence
+            return occurrence - lead
+
+        first = None
+        if missed is not None:
+            logger.info(f"Catching up on scheduled task {task.id} missed at {time.ctime(missed)}")
+            self._next[task.id] = missed
+            first = time.time()
+        self._jobs[task.id] = self._scheduler.add_timed(
+            f"scheduled task {task.id} of {self.name}", next_run, lambda: self._run(task), first
+        )
+
+    def _allowed(self, task: ScheduledTask) -> bool:
+        online = self.players_online()
+        return task.players == "any" or (task.players == "empty") == (online == 0)
+
+    async def _run(self, task: ScheduledTask):
+        started = time.time()
+        occurrence = self._next.get(task.id, started)
+        lead = task.countdown[0] if task.countdown else 0
+        # A catch-up run still gets its whole countdown
+        action_at = occurrence if occurrence >= started else started + lead
+
+        status, message = "success", ""
+        try:
+            if not self._allowed(task):
+                raise TaskSkipped("Условие по игрокам не выполнено")
+            for seconds in task.countdown:
+                delay = action_at - seconds - time.time()
+                if delay < -1:
+                    continue  # this warning's time has passed
+                await asyncio.sleep(max(0.0, delay))
+                await self._warn(task, seconds)
+            await asyncio.sleep(max(0.0, action_at - time.time()))
+            if not self._allowed(task):
+                raise TaskSkipped("Условие по игрокам не выполнено")
+            message = await self.execute(task)
+        except TaskSkipped as e:
+            status, message = "skipped", str(e)
+        except Exception as e:
+            logger.error(f"Scheduled task {task.id} failed: {str(e)}")
+            status, message = "error", str(e)
+
+        finished = time.time()
+        self.state[task.id] = {**self.state.get(task.id, {}), "last_run": occurrence, "finished": finished,
+                               "status": status, "message": message}
+        await asyncio.to_thread(self._save, self._serialize())
+        logger.info(f"Scheduled task {task.id} ({task.action}): {status} {message}")
+        if self.record is not None:
+            command = f"schedule {task.id}: {task.action} {task.argument}".strip()
+            await self.record("scheduler", command, status, message or None, finished - started)
+
+    async def _warn(self, task: ScheduledTask, seconds: int):
+        message = task.countdown_message.format(action=ACTION_LABELS[task.action], time=format_countdown(seconds))
+        try:
+            await self.broadcast(message)
+        except Exception as e:
+            logger.warning(f"Countdown broadcast of {task.id} failed: {str(e)}")
+
+    # ----- CRUD -----
+    def list(self) -> List[Dict[str, Any]]:
+        return [self._describe(task) for task in self.tasks.values()]
+
+    def _describe(self, task: ScheduledTask) -> Dict[str, Any]:
+        return {**task.model_dump(), "next_run": self._next.get(task.id), **self.state.get(task.id, {})}
+
+    async def create(self, task: ScheduledTask) -> Dict[str, Any]:
+        if not task.id:
+            task = task.model_copy(update={"id": uuid.uuid4().hex[:8]})
+        if task.id in self.tasks:
+            raise ScheduleError(f"Задача {task.id} уже существует")
+        self.tasks[task.id] = task
+        self.state[task.id] = {"created": time.time()}
+        await asyncio.to_thread(self._save, self._serialize())
+        self._schedule(task)
+        return self._describe(task)
+
+    async def update(self, task_id: str, task: ScheduledTask) -> Optional[Dict[str, Any]]:
+        if task_id not in self.tasks:
+            return None
+        task = task.model_copy(update={"id": task_id})
+        self.tasks[task_id] = task
+        await asyncio.to_thread(self._save, self._serialize())
+        self._schedule(task)
+        return self._describe(task)
+
+    async def delete(self, task_id: str) -> bool:
+        if self.tasks.pop(task_id, None) is None:
+            return False
+        self.state.pop(task_id, None)
+        job = self._jobs.pop(task_id, None)
+        if job is not None:
+            job.cancel()
+        self._next.pop(task_id, None)
+        await asyncio.to_thread(self._save, self._serialize())
+        return True
@@ -0,0 +1,420 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from audit import AuditLog
+from backups import WorldBackups
+from diagnostics import LagDiagnostics
+from launch import LaunchManager, LaunchProfile
+from log_buffer import LogRingBuffer
+from log_events import KIND_IDS, EventStore, parse_line
+from log_index import LogArchiveIndex
+from metrics import MetricsCollector
+from players import PlayerRegistry
+from pregen import ChunkPregenerator, PregenRequest
+from rcon import RconClient
+from schedules import ScheduledTask, TaskScheduler, TaskSkipped
+from scheduler import PeriodicScheduler
+from supervisor import ServerSupervisor
+from world_stats import WorldAnalyzer
+
+logger = logging.getLogger("minecraft-server-api")
+
+
+class ServerConfig(BaseModel):
+    """One entry of the server registry (SERVERS_CONFIG)."""
+    id: str = Field(pattern=r"^[a-z0-9][a-z0-9_-]{0,31}$")
+    name: str = ""
+    server_dir: str
+    server_jar: str = "server.jar"
+    # Java path with more flexible configuration, usually the same for every server
+    java_path: str = Field(default_factory=lambda: os.getenv("JAVA_PATH", r"server\CustomJAVA\bin\java.exe"))
+    java_args: List[str] = ["-Xmx5000M", "-Xms5000M"]
+    # jcmd for lag diagnostics; defaults to the one next to java_path, then the PATH
+    jcmd_path: str = Field(default_factory=lambda: os.getenv("JCMD_PATH", ""))
+    # JVM settings the server starts with: "default" (java_args), "aikar", "zgc" or one of launch_profiles
+    launch_profile: str = "default"
+    launch_profiles: Dict[str, LaunchProfile] = {}
+    rcon_host: str = "localhost"
+    rcon_port: int = 25575
+    rcon_password: str = ""
+    auto_restart: bool = True
+    # Console spool, command journal and log indexes; defaults to <DATA_DIR>/servers/<id>
+    data_dir: str = ""
+
+    @property
+    def log_dir(self) -> str:
+        return os.path.join(self.server_dir, "logs")
+
+    @property
+    def log_file(self) -> str:
+        return os.path.join(self.log_dir, "latest.log")
+
+
+def default_server_config(data_dir: str) -> ServerConfig:
+    """The single server configured by the environment, as before there was a registry."""
+    return ServerConfig(
+        id=os.getenv("SERVER_ID", "default"),
+        server_dir=os.getenv("SERVER_DIR", "server"),
+        server_jar=os.getenv("SERVER_JAR", "server.jar"),
+        java_args=os.getenv("JAVA_ARGS", "-Xmx5000M -Xms5000M").split(),
+        rcon_host=os.getenv("RCON_HOST", "localhost"),
+        rcon_port=int(os.getenv("RCON_PORT", "25575")),
+        rcon_password=os.getenv("RCON_PASSWORD", ""),
+        auto_restart=os.getenv("AUTO_RESTART", "true").lower() == "true",
+        # Keeps the data of existing single-server installations where it was
+        data_dir=data_dir
+    )
+
+
+def load_server_configs(path: Optional[str], data_dir: str) -> List[ServerConfig]:
+    """Read the server registry, a JSON list of ServerConfig objects.
+
+    Without the file there is one server configured from the environment.
+    The first entry is the default server of the /api/server/... routes.
+    """
+    if not path or not os.path.exists(path):
+        return [default_server_config(data_dir)]
+
+    with open(path, "r", encoding="utf-8") as f:
+        configs = [ServerConfig(**entry) for entry in json.load(f)]
+    if not configs:
+        raise ValueError(f"{path} does not list any servers")
+    ids = [config.id for config in configs]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate server ids in {path}")
+    for config in configs:
+        config.data_dir = config.data_dir or os.path.join(data_dir, "servers", config.id)
+    return configs
+
+
+def find_jcmd(java_path: str) -> str:
+    """The jcmd of the JDK that java_path belongs to, or "jcmd" from the PATH."""
+    name = "jcmd.exe" if java_path.lower().endswith(".exe") else "jcmd"
+    path = os.path.join(os.path.dirname(java_path), name)
+    return path if os.path.exists(path) else "jcmd"
+
+
+def create_rcon_client(config: ServerConfig) -> RconClient:
+    return RconClient(config.rcon_host, config.rcon_port, config.rcon_password,
+                      pool_size=int(os.getenv("RCON_POOL_SIZE", "2")))
+
+
+class ServerControl:
+    """State that must exist once per host and server: the server process, its
+    console output, parsed events, players, metrics, scheduled tasks and the
+    command journal.
+
+    The API uses it in-process when it runs as a single worker; with several
+    workers it lives in the supervisor daemon (daemon.py) and the workers talk
+    to it through DaemonClient, which has the same async methods. All results
+    are plain JSON-compatible values for that reason.
+    """
+
+    def __init__(self, config: ServerConfig, rcon_client: RconClient):
+        self.config = config
+        self.rcon_client = rcon_client
+        data_dir = config.data_dir
+        self.console = LogRingBuffer(
+            capacity=int(os.getenv("CONSOLE_BUFFER_LINES", "20000")),
+            spool_dir=os.path.join(data_dir, "console")
+        )
+        # Typed events (joins, chat, lag warnings...) parsed from every console line as it arrives
+        self.events = EventStore(capacity=int(os.getenv("EVENT_BUFFER_SIZE", "100000")))
+        self.players = PlayerRegistry(os.path.join(data_dir, "players.db"))
+        self.console.listeners.append(self._on_console_line)
+        # The command line of every start, from the active launch profile and its CDS archive
+        self.launch = LaunchManager(
+            config.java_path,
+            config.java_args,
+            config.server_dir,
+            config.server_jar,
+            config.launch_profiles,
+            config.launch_profile,
+            data_dir
+        )
+        self.supervisor = ServerSupervisor(
+            config.server_dir,
+            self.console,
+            self.launch.command,
+            auto_restart=config.auto_restart,
+            on_start=self._on_server_start,
+            on_exit=self._on_server_exit,
+            on_ready=self.launch.ready
+        )
+        self.metrics = MetricsCollector(
+            rcon_client.command,
+            lambda: self.supervisor.pid,
+            interval=float(os.getenv("METRICS_INTERVAL", "1")),
+            rcon_interval=float(os.getenv("METRICS_RCON_INTERVAL", "10"))
+        )
+        # The player count sample doubles as the reconciliation of the player registry
+        self.metrics.list_listeners.append(self.players.reconcile)
+        # Recent commands are kept in memory, the full history in a SQLite journal
+        self.audit = AuditLog(os.path.join(data_dir, "audit.db"))
+        self.backups = WorldBackups(
+            config.server_dir,
+            os.path.join(data_dir, "backups"),
+            rcon_client.command,
+            lambda: self.supervisor.is_running,
+            workers=int(os.getenv("BACKUP_WORKERS", "2")),
+            keep=int(os.getenv("BACKUP_KEEP", "10"))
+        )
+        self.schedules = TaskScheduler(
+            os.path.join(data_dir, "schedules.json"),
+            self._run_scheduled,
+            lambda message: rcon_client.command(f"say {message}"),
+            lambda: len(self.players.online),
+            record=self.record_command,
+            name=config.id
+        )
+        self.pregen = ChunkPregenerator(
+            os.path.join(data_dir, "pregen.json"),
+            rcon_client.command,
+            lambda: self.supervisor.is_running,
+            lambda: len(self.players.online),
+            lambda: self.metrics.latest["mspt"],
+            name=config.id
+        )
+        # Thread dumps and heap histograms taken with jcmd when the server can't keep up
+        self.diagnostics = LagDiagnostics(
+            config.jcmd_path or find_jcmd(config.java_path),
+            os.path.join(data_dir, "diagnostics"),
+            lambda: self.supervisor.pid,
+            interval=float(os.getenv("DIAGNOSTICS_INTERVAL", "600")),
+            min_behind_ms=int(os.getenv("DIAGNOSTICS_MIN_BEHIND_MS", "2000")),
+            keep=int(os.getenv("DIAGNOSTICS_KEEP", "30")),
+            max_bytes=int(os.getenv("DIAGNOSTICS_MAX_MB", "500")) * 1024 * 1024
+        )
+        self.world = WorldAnalyzer(config.server_dir, workers=int(os.getenv("WORLD_STATS_WORKERS", "4")))
+        # Builds the archive indexes that every worker's LogArchiveIndex searches
+        self.log_index = LogArchiveIndex(
+            config.log_dir,
+            os.path.join(data_dir, "log_index"),
+            workers=int(os.getenv("LOG_INDEX_WORKERS", "1"))
+        )
+
+    async def start(self, scheduler: PeriodicScheduler):
+        await asyncio.to_thread(self.console.load)
+        await asyncio.to_thread(self.schedules.load)
+        await asyncio.to_thread(self.launch.load)
+        await asyncio.to_thread(self.pregen.load)
+        await self.launch.prepare()
+        # Periodic work of every server shares the one scheduler of the process
+        self.console.start(scheduler)
+        self.audit.start(scheduler)
+        self.players.start(scheduler)
+        self.schedules.start(scheduler)
+        self.pregen.start()
+        self.log_index.start(scheduler)
+        self.metrics.start(scheduler, self.config.id)
+        self.backups.start()
+        self.world.start()
+
+    async def shutdown(self):
+        await self.schedules.stop()
+        # Releases the chunks it force-loaded while RCON still works
+        await self.pregen.stop()
+        await self.diagnostics.stop()
+        await self.log_index.stop()
+        await self.metrics.stop()
+        await self.backups.stop()
+        await self.world.stop()
+        try:
+            # Try graceful shutdown first, the supervisor escalates to terminate if needed
+            await self.supervisor.shutdown(self._send_stop)
+        except Exception as e:
+            logger.error(f"Error during server shutdown: {str(e)}")
+        await self.audit.stop()
+        await self.players.stop()
+        await self.console.stop()
+
+    def _on_console_line(self, seq: int, line: str):
+        self.launch.check_line(line)
+        # Parsed once for both the event buffer and the player registry
+        event = parse_line(line)
+        if event is None:
+            return
+        ts = time.time()
+        self.events.add(event, ts)
+        self.players.handle(event, ts)
+        if event[0] == KIND_IDS["lag"]:
+            self.pregen.on_lag()
+            self.diagnostics.on_lag(event[4])
+        elif event[0] == KIND_IDS["join"]:
+            self.pregen.player_joined()
+
+    def _on_server_start(self):
+        # Don't make RCON wait out a backoff left over from while the server was down
+        self.rcon_client.reset_backoff()
+        # The server may have been updated or got other plugins, so the TPS command is looked for again
+        self.metrics.reset_tps_command()
+
+    def _on_server_exit(self):
+        self.players.end_sessions()
+        self.launch.exited(self.supervisor.last_exit_code)
+
+    async def _send_stop(self):
+        try:
+            await self.rcon_client.command("stop")
+        except Exception as e:
+            logger.error(f"RCON stop failed, relying on the console: {str(e)}")
+
+    # ----- API -----
+    async def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.supervisor.is_running,
+            "uptime": self.supervisor.uptime(),
+            "server": self.supervisor.status(),
+        }
+
+    async def start_server(self) -> bool:
+        """Start the server; returns False if it is already running."""
+        if self.supervisor.is_running:
+            return False
+        # A new Java binary changes the flags and the CDS archive it can use
+        await self.launch.prepare()
+        # Readiness is tracked by the supervisor in the background
+        await self.supervisor.start()
+        return True
+
+    async def stop_server(self) -> bool:
+        """Stop the server gracefully; returns False if it isn't running."""
+        if not self.supervisor.is_running:
+            return False
+        await self.supervisor.stop(self._send_stop)
+        return True
+
+    async def _run_scheduled(self, task: ScheduledTask) -> str:
+        """Carry out the action of a scheduled task the way the matching API endpoint does."""
+        if task.action == "start":
+            if not await self.start_server():
+                raise TaskSkipped("Сервер уже запущен")
+            return "Сервер запущен"
+        if task.action in ("restart", "stop"):
+            if not await self.stop_server():
+                raise TaskSkipped("Сервер не запущен")
+            if task.action == "stop":
+                return "Сервер выключен"
+            await self.start_server()
+            return "Сервер перезапущен"
+        if task.action == "backup":
+            return f"Резервная копия {self.backups.create()['id']}"
+        command = {"save": "save-all", "broadcast": f"say {task.argument}"}.get(task.action, task.argument)
+        return await self.rcon_client.command(command)
+
+    async def console_lines(self, after: Optional[int] = None, max_lines: int = 50) -> Dict[str, Any]:
+        """Return the newest captured console lines, or those after `after`, as [seq, line] pairs."""
+        reset = False
+        if after is None:
+            entries = self.console.tail(max_lines)
+        else:
+            entries, reset = self.console.since(after, max_lines)
+        return {"lines": entries, "reset": reset, "last_seq": self.console.last_seq, "size": len(self.console)}
+
+    async def query_events(self, kinds: Optional[List[str]] = None, player: Optional[str] = None,
+                           level: Optional[str] = None, after: int = 0, start: Optional[float] = None,
+                           end: Optional[float] = None, limit: int = 100) -> Dict[str, Any]:
+        events = self.events.query(kinds, player, level, after, start, end, limit)
+        return {"events": events, "seq": self.events.next_seq - 1}
+
+    async def list_players(self, include_offline: bool = False, limit: int = 100) -> Dict[str, Any]:
+        return self.players.snapshot(include_offline, limit)
+
+    async def player_info(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.players.get(name)
+
+    async def list_schedules(self) -> List[Dict[str, Any]]:
+        return self.schedules.list()
+
+    async def create_schedule(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a task (a ScheduledTask as a dict); raises ScheduleError if the id is taken."""
+        return await self.schedules.create(ScheduledTask.model_validate(task))
+
+    async def update_schedule(self, task_id: str, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.schedules.update(task_id, ScheduledTask.model_validate(task))
+
+    async def delete_schedule(self, task_id: str) -> bool:
+        return await self.schedules.delete(task_id)
+
+    async def query_metrics(self, resolution: str = "1m", window: Optional[float] = None) -> Dict[str, Any]:
+        return self.metrics.query(resolution, window)
+
+    async def latest_metrics(self) -> Dict[str, Optional[float]]:
+        return self.metrics.latest
+
+    async def record_command(self, user: str, command: str, result: str = "success",
+                             response: Optional[str] = None, duration: Optional[float] = None) -> int:
+        return self.audit.record(user, command, result, response, duration)
+
+    async def command_history(self, user: Optional[str] = None, start: Optional[float] = None,
+                              end: Optional[float] = None, before: Optional[int] = None,
+                              limit: int = 10) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        return await self.audit.query(user, start, end, before, limit)
+
+    async def create_backup(self) -> Dict[str, Any]:
+        """Start a world snapshot in the background; raises BackupError if another operation is running."""
+        return self.backups.create()
+
+    async def list_backups(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backups.list)
+
+    async def restore_backup(self, backup_id: str):
+        await self.backups.restore(backup_id)
+
+    async def prune_backups(self, keep: int) -> List[str]:
+        return await self.backups.prune(keep)
+
+    async def world_stats(self, inhabited_below: int = 0) -> Dict[str, Any]:
+        return await self.world.analyze(inhabited_below)
+
+    async def pregen_status(self) -> Dict[str, Any]:
+        return self.pregen.status()
+
+    async def start_pregen(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self.pregen.create(PregenRequest.model_validate(request))
+
+    async def pause_pregen(self) -> Dict[str, Any]:
+        await self.pregen.pause()
+        return self.pregen.status()
+
+    async def resume_pregen(self) -> Dict[str, Any]:
+        await self.pregen.resume()
+        return self.pregen.status()
+
+    async def cancel_pregen(self) -> Dict[str, Any]:
+        await self.pregen.cancel()
+        return self.pregen.status()
+
+    async def list_diagnostics(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.diagnostics.list)
+
+    async def capture_diagnostics(self) -> Dict[str, Any]:
+        return self.diagnostics.capture()
+
+    async def get_diagnostics(self, capture_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.diagnostics.get, capture_id)
+
+    async def diagnostics_output(self, capture_id: str, kind: str) -> str:
+        return await asyncio.to_thread(self.diagnostics.output, capture_id, kind)
+
+    async def diff_diagnostics(self, old_id: str, new_id: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.diagnostics.diff, old_id, new_id)
+
+    async def delete_diagnostics(self, capture_id: str):
+        await asyncio.to_thread(self.diagnostics.delete, capture_id)
+
+    async def launch_info(self) -> Dict[str, Any]:
+        return self.launch.summary()
+
+    async def set_launch_profile(self, name: str) -> bool:
+        """Make a profile the one of the next starts; returns False if there is no such profile."""
+        return await asyncio.to_thread(self.launch.set_profile, name)
+
+    async def clear_cds_archives(self) -> List[str]:
+        return await asyncio.to_thread(self.launch.clear_archives)
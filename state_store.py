@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("minecraft-server-api")
+
+# update() callbacks receive the current value (or None) and return (new value, result)
+Updater = Callable[[Optional[Any]], Tuple[Any, Any]]
+
+
+class TTLStore:
+    """In-memory key/value store with per-key expiry and a hard size limit.
+
+    Lookups and inserts are O(1) on an OrderedDict kept in LRU order; expiry
+    times go into a heap that a background task drains, so expired keys are
+    removed without scanning. When the store is full the least recently used
+    key is evicted.
+    """
+
+    def __init__(self, max_size: int = 10000, purge_interval: float = 30.0):
+        self.max_size = max_size
+        self.purge_interval = purge_interval
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._expiry: List[Tuple[float, str]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return item[0]
+
+    def _set(self, key: str, value: Any, ttl: float):
+        expires = time.time() + ttl
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        heapq.heappush(self._expiry, (expires, key))
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+        if len(self._expiry) > 2 * self.max_size:
+            # Overwritten keys and LRU evictions leave stale heap entries behind
+            self._expiry = [(expires, key) for key, (_, expires) in self._data.items()]
+            heapq.heapify(self._expiry)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._get(key)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._set(key, value, ttl)
+
+    async def pop(self, key: str) -> Optional[Any]:
+        """Remove a key and return its value; only one caller can get a given value."""
+        value = self._get(key)
+        self._data.pop(key, None)
+        return value
+
+    async def update(self, key: str, updater: Updater, ttl: float) -> Any:
+        """Atomically replace a value with updater(old)[0] and return updater(old)[1]."""
+        value, result = updater(self._get(key))
+        self._set(key, value, ttl)
+        return result
+
+    def purge(self) -> int:
+        """Drop keys whose expiry time has passed, oldest first."""
+        now = time.time()
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            item = self._data.get(key)
+            # The key may have been refreshed since this heap entry was pushed
+            if item is not None and item[1] == expires:
+                del self._data[key]
+                removed += 1
+        return removed
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                await self._purge_async()
+            except Exception as e:
+                logger.error(f"Error purging expired state: {str(e)}")
+
+    async def _purge_async(self):
+        self.purge()
+
+
+class SqliteTTLStore(TTLStore):
+    """TTLStore kept in a local SQLite database so several API workers share it.
+
+    Each store uses its own namespace in the same file. Values are JSON;
+    update() runs in an immediate transaction so concurrent workers can't
+    interleave read-modify-write cycles.
+    """
+
+    def __init__(self, path: str, namespace: str, max_size: int = 10000, purge_interval: float = 30.0):
+        super().__init__(max_size, purge_interval)
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS state (namespace TEXT, key TEXT, value TEXT, expires REAL, "
+                       "touched REAL, PRIMARY KEY (namespace, key))")
+            db.execute("CREATE INDEX IF NOT EXISTS state_expires ON state (namespace, expires)")
+            db.execute("CREATE INDEX IF NOT EXISTS state_touched ON state (namespace, touched)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per worker thread; isolation_level=None so transactions are explicit
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM state WHERE namespace = ?",
+                                       (self.namespace,)).fetchone()[0]
+
+    def _read(self, db: sqlite3.Connection, key: str) -> Optional[Any]:
+        row = db.execute("SELECT value FROM state WHERE namespace = ? AND key = ? AND expires > ?",
+                         (self.namespace, key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, db: sqlite3.Connection, key: str, value: Any, ttl: float):
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?)",
+                   (self.namespace, key, json.dumps(value), now + ttl, now))
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(lambda: self._read(self._connect(), key))
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await asyncio.to_thread(self._transaction, lambda db: self._write(db, key, value, ttl))
+
+    async def pop(self, key: str) -> Optional[Any]:
+        def pop(db):
+            value = self._read(db, key)
+            db.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (self.namespace, key))
+            return value
+        return await asyncio.to_thread(self._transaction, pop)
+
+    async def update(self, key: str, updater: Updater, ttl: float) -> Any:
+        def update(db):
+            value, result = updater(self._read(db, key))
+            self._write(db, key, value, ttl)
+            return result
+        return await asyncio.to_thread(self._transaction, update)
+
+    def purge(self) -> int:
+        """Delete expired keys, then the least recently written ones beyond max_size."""
+        def purge(db):
+            removed = db.execute("DELETE FROM state WHERE namespace = ? AND expires <= ?",
+                                 (self.namespace, time.time())).rowcount
+            removed += db.execute(
+                "DELETE FROM state WHERE namespace = ? AND key IN (SELECT key FROM state WHERE namespace = ? "
+                "ORDER BY touched DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_size)).rowcount
+            return removed
+        return self._transaction(purge)
+
+    async def _purge_async(self):
+        await asyncio.to_thread(self.purge)
+
+
+def open_store(backend: str, namespace: str, path: Optional[str] = None, max_size: int = 10000) -> TTLStore:
+    """Create a store for the configured backend ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SqliteTTLStore(path, namespace, max_size)
+    if backend != "memory":
+        raise ValueError(f"Unknown state backend: {backend}")
+    return TTLStore(max_size)
+
+
+class TokenBucketLimiter:
+    """Token buckets per key plus one shared bucket for everyone.
+
+    Each key gets `burst` tokens refilled at `rate` per second; an action
+    costs one token from both its own bucket and the global one. Buckets
+    live in a TTLStore and expire once they would be full again, so idle
+    users cost nothing.
+    """
+
+    def __init__(self, store: TTLStore, rate: float, burst: float, global_rate: float, global_burst: float):
+        # A bucket that never refills or never holds a whole token would block everyone for good
+        if rate <= 0 or global_rate <= 0:
+            raise ValueError(f"Rate limits must be positive, got {rate} and {global_rate} per second")
+        if burst < 1 or global_burst < 1:
+            raise ValueError(f"Bursts must allow at least one action, got {burst} and {global_burst}")
+        self.store = store
+        self.rate = rate
+        self.burst = burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+
+    @staticmethod
+    def _take(rate: float, burst: float, now: float) -> Updater:
+        def take(bucket: Optional[List[float]]) -> Tuple[List[float], bool]:
+            tokens, updated = bucket if bucket else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                return [tokens - 1, now], True
+            return [tokens, now], False
+        return take
+
+    @staticmethod
+    def _refund(burst: float) -> Updater:
+        def refund(bucket: Optional[List[float]]) -> Tuple[Optional[List[float]], None]:
+            if bucket:
+                bucket = [min(burst, bucket[0] + 1), bucket[1]]
+            return bucket, None
+        return refund
+
+    async def acquire(self, key: str) -> bool:
+        """Take a token for `key`; returns False if either its bucket or the global one is empty."""
+        now = time.time()
+        user_ttl = self.burst / self.rate
+        if not await self.store.update(f"user:{key}", self._take(self.rate, self.burst, now), user_ttl):
+            return False
+        global_ttl = self.global_burst / self.global_rate
+        if not await self.store.update("global", self._take(self.global_rate, self.global_burst, now), global_ttl):
+            # Don't charge the user for a command that wasn't allowed
+            await self.store.update(f"user:{key}", self._refund(self.burst), user_ttl)
+            return False
+        return True
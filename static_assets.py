@@ -0,0 +1,161 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional, Set, Tuple
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # optional, assets are then only precompressed with gzip
+    brotli = None
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Content-hashed names never change content; the plain names are revalidated with the ETag
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+MIN_COMPRESS_SIZE = 256
+COMPRESSIBLE_TYPES = {"application/javascript", "application/json", "image/svg+xml", "image/x-icon"}
+# Pages whose references to other assets are rewritten to the hashed names
+PAGE_EXTENSIONS = (".html",)
+
+
+class Asset:
+    """One file's bytes, precompressed variants and validators."""
+
+    __slots__ = ("body", "media_type", "digest", "encodings")
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.encodings: Dict[str, bytes] = {}
+        if len(body) >= MIN_COMPRESS_SIZE and (media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES):
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            # Only keep variants that are actually smaller
+            self.encodings = {name: data for name, data in variants.items() if len(data) < len(body)}
+
+    def etag(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different representation and needs its own strong validator
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Content codings the client accepts (q=0 excluded)."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def etag_matches(header: str, digest: str) -> bool:
+    """Whether If-None-Match lists any representation of the asset."""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-")[0] == digest:
+            return True
+    return False
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """styles.css -> styles.<hash>.css"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest[:10]}{ext}"
+
+
+class StaticAssets:
+    """The frontend, read and compressed once at startup and served from memory.
+
+    Every file is available under its own name (revalidated with its ETag)
+    and under a content-hashed name that may be cached forever; pages refer
+    to the hashed names, so a deploy is picked up with a single revalidation
+    of index.html.
+    """
+
+    def __init__(self, directory: str, urls: Dict[str, str]):
+        self.directory = directory
+        # URL prefix -> subdirectory it serves, e.g. {"/static": "", "/img": "img"}
+        self.urls = urls
+        self.files: Dict[str, Tuple[Asset, bool]] = {}  # relative path -> (asset, immutable)
+
+    def load(self):
+        files: Dict[str, Tuple[Asset, bool]] = {}
+        pages = []
+        for root, _, names in os.walk(self.directory):
+            for name in sorted(names):
+                path = os.path.relpath(os.path.join(root, name), self.directory).replace(os.sep, "/")
+                if path.endswith(PAGE_EXTENSIONS):
+                    pages.append(path)
+                    continue
+                self._add(files, path, self._read(path))
+
+        # Point pages at the hashed names of the assets they reference
+        references = {}
+        for path, (asset, immutable) in files.items():
+            if immutable:
+                continue
+            for prefix, subdir in self.urls.items():
+                if subdir and not path.startswith(subdir + "/"):
+                    continue
+                url_path = path[len(subdir) + 1:] if subdir else path
+                references[f'"{prefix}/{url_path}"'] = f'"{prefix}/{hashed_name(url_path, asset.digest)}"'
+        for path in pages:
+            body = self._read(path)
+            text = body.decode("utf-8")
+            for old, new in references.items():
+                text = text.replace(old, new)
+            self._add(files, path, text.encode("utf-8"))
+
+        self.files = files
+        logger.info(f"Loaded {len(files) // 2} static assets from {self.directory} "
+                    f"({'gzip, brotli' if brotli is not None else 'gzip'})")
+
+    def _read(self, path: str) -> bytes:
+        with open(os.path.join(self.directory, path), "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _add(files: Dict[str, Tuple[Asset, bool]], path: str, body: bytes):
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        asset = Asset(body, media_type)
+        files[path] = (asset, False)
+        files[hashed_name(path, asset.digest)] = (asset, True)
+
+    def response(self, request: Request, path: str) -> Response:
+        """Serve `path` (relative to the directory) with ETag/304 handling and the best precompressed encoding."""
+        entry = self.files.get(path)
+        if entry is None:
+            return PlainTextResponse("Not Found", status_code=404)
+        asset, immutable = entry
+
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((name for name in ("br", "gzip") if name in accepted and name in asset.encodings), None)
+        headers = {
+            "ETag": asset.etag(encoding),
+            "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match", ""), asset.digest):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(asset.encodings.get(encoding, asset.body), media_type=asset.media_type, headers=headers)
@@ -0,0 +1,243 @@
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from log_buffer import LogRingBuffer
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Printed by vanilla, Paper and Forge once the world is loaded
+READY_PATTERN = re.compile(r"Done \([^)]*\)! For help")
+
+# Server states
+STOPPED = "stopped"
+STARTING = "starting"
+RUNNING = "running"
+STOPPING = "stopping"
+CRASHED = "crashed"
+
+
+class ServerSupervisor:
+    """Owns the Minecraft server process without blocking the event loop.
+
+    Console output (stdout and stderr) is piped into a LogRingBuffer; start/ready
+    times are tracked, readiness is detected from the console and the server is
+    restarted with exponential backoff if it exits without being asked to.
+    """
+
+    def __init__(self, server_dir: str, output: LogRingBuffer, build_command: Callable[[], List[str]],
+                 auto_restart: bool = True, min_restart_delay: float = 5.0, max_restart_delay: float = 300.0,
+                 stable_after: float = 600.0,
+                 on_start: Optional[Callable[[], None]] = None, on_exit: Optional[Callable[[], None]] = None,
+                 on_ready: Optional[Callable[[float], None]] = None):
+        self.server_dir = server_dir
+        self.output = output
+        self.build_command = build_command
+        self.auto_restart = auto_restart
+        self.min_restart_delay = min_restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+        self.on_start = on_start
+        self.on_exit = on_exit
+        # Called with the seconds from launch to "Done"
+        self.on_ready = on_ready
+
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.state = STOPPED
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.last_exit_code: Optional[int] = None
+        self.crash_count = 0
+        self._restart_delay = 0.0
+        self._stop_requested = False
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._output_task: Optional[asyncio.Task] = None
+        self._restart_task: Optional[asyncio.Task] = None
+        self._ready_event: Optional[asyncio.Event] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.is_running else None
+
+    def uptime(self) -> Optional[float]:
+        """Seconds since the process was started, or None if it isn't running."""
+        if not self.is_running or self.started_at is None:
+            return None
+        return time.time() - self.started_at
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "pid": self.pid,
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "startup_seconds": round(self.ready_at - self.started_at, 2) if self.ready_at and self.started_at else None,
+            "uptime_seconds": int(self.uptime()) if self.uptime() is not None else None,
+            "last_exit_code": self.last_exit_code,
+            "crash_count": self.crash_count,
+        }
+
+    async def start(self):
+        """Launch the server process and start watching it."""
+        if self.is_running:
+            raise RuntimeError("Server is already running")
+        if self._restart_task is not None:
+            self._restart_task.cancel()
+            self._restart_task = None
+
+        cmd = self.build_command()
+        logger.info(f"Starting server with command: {' '.join(cmd)}")
+
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=self.server_dir,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        self.state = STARTING
+        self.started_at = time.time()
+        self.ready_at = None
+        self._stop_requested = False
+        self._ready_event = asyncio.Event()
+
+        self._output_task = asyncio.create_task(self._pump_output(self.process))
+        self._monitor_task = asyncio.create_task(self._monitor(self.process))
+        if self.on_start is not None:
+            self.on_start()
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the server reported it finished loading."""
+        if self._ready_event is None:
+            return False
+        try:
+            await asyncio.wait_for(self._ready_event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self, send_stop: Optional[Callable[[], Awaitable[Any]]] = None,
+                   timeout: float = 30.0, terminate_timeout: float = 5.0):
+        """Stop the server gracefully, escalating to terminate and kill if needed."""
+        self._stop_requested = True
+        if self._restart_task is not None:
+            self._restart_task.cancel()
+            self._restart_task = None
+
+        process = self.process
+        if process is None or process.returncode is not None:
+            self.state = STOPPED
+            return
+
+        self.state = STOPPING
+        if send_stop is not None:
+            result = await send_stop()
+            logger.info(f"RCON stop command result: {result}")
+        # Also ask through the console, which works even when RCON is down
+        self._write_console("stop")
+
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Server didn't stop gracefully, forcing termination")
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), terminate_timeout)
+            except asyncio.TimeoutError:
+                logger.error("Server process couldn't be terminated, killing it")
+                process.kill()
+                await process.wait()
+
+        # Let the monitor record the exit before returning
+        if self._monitor_task is not None:
+            await asyncio.gather(self._monitor_task, return_exceptions=True)
+
+    async def restart(self, send_stop: Optional[Callable[[], Awaitable[Any]]] = None):
+        await self.stop(send_stop)
+        await self.start()
+
+    async def shutdown(self, send_stop: Optional[Callable[[], Awaitable[Any]]] = None):
+        """Stop the server on API shutdown without triggering an auto-restart."""
+        self.auto_restart = False
+        await self.stop(send_stop, timeout=10.0)
+
+    def _write_console(self, command: str):
+        if self.process is None or self.process.stdin is None or self.process.stdin.is_closing():
+            return
+        try:
+            self.process.stdin.write(f"{command}\n".encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    async def _pump_output(self, process: asyncio.subprocess.Process):
+        """Copy console lines into the ring buffer and watch for the 'Done (...)! For help' line."""
+        while True:
+            try:
+                raw = await process.stdout.readline()
+            except ValueError:
+                # Line longer than the stream limit; skip what was buffered and go on
+                continue
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace")
+            self.output.append(line)
+            if self.ready_at is None and READY_PATTERN.search(line):
+                self._mark_ready(process)
+
+    def _mark_ready(self, process: asyncio.subprocess.Process):
+        if process is not self.process or self.ready_at is not None:
+            return
+        self.ready_at = time.time()
+        if self.state == STARTING:
+            self.state = RUNNING
+        self._ready_event.set()
+        logger.info(f"Server is ready after {self.ready_at - self.started_at:.1f}s")
+        if self.on_ready is not None:
+            self.on_ready(self.ready_at - self.started_at)
+
+    async def _monitor(self, process: asyncio.subprocess.Process):
+        """Wait for the process to exit and decide whether to restart it."""
+        exit_code = await process.wait()
+        if self._output_task is not None:
+            await asyncio.gather(self._output_task, return_exceptions=True)
+        if process is not self.process:
+            return
+
+        self.last_exit_code = exit_code
+        if self.on_exit is not None:
+            self.on_exit()
+        ran_for = time.time() - (self.started_at or time.time())
+        self.started_at = None
+        self.ready_at = None
+
+        if self._stop_requested:
+            logger.info(f"Server stopped with exit code {exit_code}")
+            self.state = STOPPED
+            return
+
+        self.state = CRASHED
+        self.crash_count += 1
+        logger.error(f"Server exited unexpectedly with code {exit_code} after {ran_for:.0f}s")
+        if not self.auto_restart:
+            return
+
+        if ran_for >= self.stable_after:
+            self._restart_delay = 0.0
+        self._restart_delay = min(self.max_restart_delay, max(self.min_restart_delay, self._restart_delay * 2))
+        logger.info(f"Restarting server in {self._restart_delay:.1f}s")
+        self._restart_task = asyncio.create_task(self._restart_after(self._restart_delay))
+
+    async def _restart_after(self, delay: float):
+        await asyncio.sleep(delay)
+        self._restart_task = None
+        try:
+            await self.start()
+        except Exception as e:
+            logger.error(f"Error restarting crashed server: {str(e)}")
+            self.state = CRASHED
@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import base64
+
+import pytest
+
+# The modules live at the repository root, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SESSION_SECRET = "test-session-secret"
+ADMIN = "admin@example.com"
+OPERATOR = "operator@example.com"
+VIEWER = "viewer@example.com"
+
+
+@pytest.fixture(scope="session")
+def api(tmp_path_factory):
+    """main.py configured for a single server in a temporary directory, and a client for it.
+
+    main reads its configuration at import time and logs to ./api.log, so it
+    is imported once, from inside the temporary directory.
+    """
+    root = tmp_path_factory.mktemp("api")
+    server_dir = root / "server"
+    (server_dir / "logs").mkdir(parents=True)
+    env = {
+        "DATA_DIR": str(root / "data"), "SERVER_DIR": str(server_dir), "SESSION_SECRET": SESSION_SECRET,
+        "ADMIN_USERS": ADMIN, "AUTHORIZED_USERS": OPERATOR, "VIEWER_USERS": VIEWER,
+        "RCON_PORT": "1", "AUTO_RESTART": "false", "CLEAR_LOGS_ON_STOP": "false",
+        "google_client_id": "test-client", "google_client_secret": "test-secret",
+        "google_redirect_uri": "https://testserver/auth/callback",
+        "google_discovery_url": "http://fake-oauth.test/.well-known/openid-configuration",
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in env.items():
+            mp.setenv(key, value)
+        mp.chdir(root)
+        import main
+        from fastapi.testclient import TestClient
+
+        with TestClient(main.app, base_url="https://testserver") as client:
+            client.main = main
+            client.server_dir = server_dir
+            yield client
+
+
+def login(client, email):
+    """Give the client the signed session cookie of a logged-in user (None logs out)."""
+    from itsdangerous import TimestampSigner
+
+    client.cookies.clear()
+    if email is not None:
+        data = base64.b64encode(json.dumps({"user": {"email": email, "name": "n", "picture": "p"}}).encode())
+        client.cookies.set("session", TimestampSigner(SESSION_SECRET).sign(data).decode())
+    return client
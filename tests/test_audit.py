@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from audit import AuditLog
+
+
+def journal(tmp_path, count, recent_size=1000):
+    audit = AuditLog(str(tmp_path / "audit.db"), recent_size)
+    for i in range(1, count + 1):
+        audit.record("admin@example.com" if i % 2 else "operator@example.com", f"say {i}")
+    return audit
+
+
+def pages(audit, limit, **filters):
+    """Follow the cursor from the newest page to the end; returns the ids of each page and the last page."""
+    async def run():
+        result, before = [], None
+        while True:
+            entries, before = await audit.query(before=before, limit=limit, **filters)
+            result.append([entry["id"] for entry in entries])
+            if before is None:
+                return result
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("recent_size", [1000, 4])
+def test_pages_walk_back_to_the_first_entry(tmp_path, recent_size):
+    # A small recent_size makes the older pages come from the journal
+    audit = journal(tmp_path, 10, recent_size)
+    assert pages(audit, 4) == [[7, 8, 9, 10], [3, 4, 5, 6], [1, 2]]
+
+
+def test_full_last_page_is_followed_by_an_empty_one(tmp_path):
+    audit = journal(tmp_path, 8)
+    assert pages(audit, 4) == [[5, 6, 7, 8], [1, 2, 3, 4], []]
+    assert asyncio.run(audit.query(before=1)) == ([], None)
+
+
+def test_filtered_pages(tmp_path):
+    audit = journal(tmp_path, 10)
+    assert pages(audit, 2, user="operator@example.com") == [[8, 10], [4, 6], [2]]
+    entries, _ = asyncio.run(audit.query(user="admin@example.com", limit=1))
+    assert entries[0]["command"] == "say 9"
+    assert set(entries[0]) == {"id", "timestamp", "user", "command", "result", "response", "duration_ms"}
+
+
+def test_entries_survive_a_restart(tmp_path):
+    audit = journal(tmp_path, 6)
+    audit.flush()
+    reopened = AuditLog(str(tmp_path / "audit.db"), recent_size=3)
+    assert pages(reopened, 4) == [[3, 4, 5, 6], [1, 2]]
+    assert reopened.record("admin@example.com", "list") == 7
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from auth import AccessControl
+
+
+@pytest.fixture(autouse=True)
+def no_env_roles(monkeypatch):
+    for name in ("VIEWER_USERS", "AUTHORIZED_USERS", "ADMIN_USERS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_nobody_configured_is_open_access():
+    access = AccessControl()
+    assert access.open_access
+    assert access.role_of("anyone@example.com") == "operator"
+
+
+def test_admin_only_env_denies_unknown_emails(monkeypatch):
+    monkeypatch.setenv("ADMIN_USERS", "Boss@Example.com")
+    access = AccessControl()
+    assert not access.open_access
+    assert access.role_of("boss@example.com") == "admin"
+    assert access.role_of("stranger@example.com") is None
+
+
+def test_admin_only_file_denies_unknown_emails(tmp_path):
+    path = tmp_path / "access.json"
+    path.write_text(json.dumps({"admin": ["boss@example.com"]}))
+    access = AccessControl(str(path))
+    assert access.role_of("boss@example.com") == "admin"
+    assert access.role_of("stranger@example.com") is None
+
+
+def test_highest_role_wins(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIEWER_USERS", "a@example.com, b@example.com")
+    path = tmp_path / "access.json"
+    path.write_text(json.dumps({"operator": ["b@example.com"], "admin": ["c@example.com"]}))
+    access = AccessControl(str(path))
+    assert access.role_of("A@example.com") == "viewer"
+    assert access.role_of("b@example.com") == "operator"
+    assert access.role_of("c@example.com") == "admin"
+
+
+def test_broken_file_keeps_previous_roles(tmp_path):
+    path = tmp_path / "access.json"
+    path.write_text(json.dumps({"operator": ["b@example.com"]}))
+    access = AccessControl(str(path))
+    path.write_text("{not json")
+    access.load()
+    assert access.role_of("b@example.com") == "operator"
@@ -0,0 +1,148 @@
+import os
+import asyncio
+import zlib
+
+import pytest
+
+from backups import BackupError, WorldBackups
+from region import HEADER_BYTES, SECTOR_BYTES
+
+
+def region(chunks):
+    """A region file with the given chunk payloads at indexes 0, 1, ... one sector each."""
+    header = bytearray(HEADER_BYTES)
+    body = b""
+    for index, payload in enumerate(chunks):
+        header[index * 4:index * 4 + 4] = ((2 + index) << 8 | 1).to_bytes(4, "big")
+        data = zlib.compress(payload)
+        sector = (len(data) + 1).to_bytes(4, "big") + b"\x02" + data
+        body += sector.ljust(SECTOR_BYTES, b"\x00")
+    return bytes(header) + body
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read_tree(root):
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def objects(backup_dir):
+    return sum(len(names) for _, _, names in os.walk(os.path.join(backup_dir, "objects")))
+
+
+def test_backup_restore_prune_round_trip(tmp_path):
+    server_dir, backup_dir = str(tmp_path / "server"), str(tmp_path / "backups")
+    world = os.path.join(server_dir, "world")
+    write(os.path.join(world, "level.dat"), b"level v1")
+    write(os.path.join(world, "region", "r.0.0.mca"), region([b"chunk a" * 100, b"chunk b" * 100]))
+    write(os.path.join(world, "session.lock"), b"lock")
+    write(os.path.join(server_dir, "world_nether", "DIM-1", "region", "r.0.0.mca"), region([b"nether"]))
+
+    async def backup(backups):
+        created = backups.create()
+        await backups._task
+        assert backups.current is None
+        # Ids have a one second resolution
+        await asyncio.sleep(1.05)
+        return created["id"]
+
+    async def run():
+        backups = WorldBackups(server_dir, backup_dir, command=None, is_running=lambda: False, keep=10)
+        backups.start()
+        try:
+            first = await backup(backups)
+            original = read_tree(server_dir)
+            first_objects = objects(backup_dir)
+
+            # Only the changed chunk is stored again
+            write(os.path.join(world, "region", "r.0.0.mca"), region([b"chunk a" * 100, b"chunk c" * 100]))
+            write(os.path.join(world, "level.dat"), b"level v2")
+            second = await backup(backups)
+            summaries = backups.list()
+            assert [summary["id"] for summary in summaries] == [second, first]
+            assert summaries[0]["files_changed"] == 2
+            assert objects(backup_dir) == first_objects + 2  # level.dat and the changed chunk
+
+            write(os.path.join(world, "level.dat"), b"broken")
+            await backups.restore(first)
+            restored = read_tree(server_dir)
+            assert {path: data for path, data in restored.items() if ".pre-restore" not in path} == {
+                path: data for path, data in original.items() if not path.endswith("session.lock")}
+            assert restored[os.path.join("world.pre-restore", "level.dat")] == b"broken"
+
+            with pytest.raises(BackupError):
+                await backups.restore("19700101-000000")
+            with pytest.raises(BackupError):
+                await backups.prune(0)
+
+            assert await backups.prune(1) == [first]
+            assert [summary["id"] for summary in backups.list()] == [second]
+            # Objects only the first snapshot used are gone, the second one still restores
+            assert objects(backup_dir) == first_objects
+            await backups.restore(second)
+            with open(os.path.join(world, "level.dat"), "rb") as f:
+                assert f.read() == b"level v2"
+        finally:
+            await backups.stop()
+
+    asyncio.run(run())
+
+
+def test_restore_refuses_while_running(tmp_path):
+    backups = WorldBackups(str(tmp_path), str(tmp_path / "backups"), command=None, is_running=lambda: True)
+    with pytest.raises(BackupError):
+        asyncio.run(backups.restore("anything"))
+
+
+def test_prune_and_stop_right_after_restore(tmp_path):
+    server_dir, backup_dir = str(tmp_path / "server"), str(tmp_path / "backups")
+    write(os.path.join(server_dir, "world", "level.dat"), b"level")
+
+    async def run():
+        backups = WorldBackups(server_dir, backup_dir, command=None, is_running=lambda: False)
+        backups.start()
+        created = backups.create()
+        await backups._task
+        await backups.restore(created["id"])
+        # The restore ran in its own task: nothing is left running afterwards
+        assert backups.current is None
+        assert await backups.prune(1) == []
+        await asyncio.wait_for(backups.stop(), 5)
+
+    asyncio.run(run())
+
+
+def test_dropped_request_does_not_interrupt_restore(tmp_path):
+    server_dir, backup_dir = str(tmp_path / "server"), str(tmp_path / "backups")
+    write(os.path.join(server_dir, "world", "level.dat"), b"level")
+
+    async def run():
+        backups = WorldBackups(server_dir, backup_dir, command=None, is_running=lambda: False)
+        backups.start()
+        created = backups.create()
+        await backups._task
+        write(os.path.join(server_dir, "world", "level.dat"), b"changed")
+
+        request = asyncio.create_task(backups.restore(created["id"]))
+        await asyncio.sleep(0)
+        restore = backups._task
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await restore
+        await asyncio.wait_for(backups.stop(), 5)
+
+    asyncio.run(run())
+    with open(os.path.join(server_dir, "world", "level.dat"), "rb") as f:
+        assert f.read() == b"level"
+    assert not [name for name in os.listdir(server_dir) if name.startswith(".restore-")]
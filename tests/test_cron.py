@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+
+from cron import CronExpression, parse_field
+
+
+def ts(*args):
+    return datetime(*args).timestamp()
+
+
+def test_parse_field():
+    assert parse_field("*/15", "minute", 0, 59, []) == {0, 15, 30, 45}
+    assert parse_field("1-5,10", "hour", 0, 23, []) == {1, 2, 3, 4, 5, 10}
+    assert parse_field("0-30/10", "minute", 0, 59, []) == {0, 10, 20, 30}
+    assert parse_field("5/20", "minute", 0, 59, []) == {5, 25, 45}
+    assert parse_field("mon-fri", "day of week", 0, 7, ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]) == {
+        1, 2, 3, 4, 5}
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *",
+                                        "* * 0 * *", "* * * 13 *", "* * * * funday", "x * * * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_sunday_is_0_and_7():
+    assert CronExpression("0 0 * * 7").weekdays == CronExpression("0 0 * * 0").weekdays == {0}
+
+
+def test_next_after():
+    cron = CronExpression("30 4 * * *")
+    assert cron.next_after(ts(2026, 3, 10, 4, 29, 59)) == ts(2026, 3, 10, 4, 30)
+    # Strictly after: the matching minute itself gives the next day
+    assert cron.next_after(ts(2026, 3, 10, 4, 30)) == ts(2026, 3, 11, 4, 30)
+    assert CronExpression("*/15 * * * *").next_after(ts(2026, 3, 10, 23, 50)) == ts(2026, 3, 11, 0, 0)
+
+
+def test_macros():
+    assert CronExpression("@daily").next_after(ts(2026, 12, 31, 12, 0)) == ts(2027, 1, 1)
+    assert CronExpression("@hourly").next_after(ts(2026, 5, 1, 7, 1)) == ts(2026, 5, 1, 8, 0)
+    assert CronExpression("@monthly").next_after(ts(2026, 1, 31, 0, 0)) == ts(2026, 2, 1)
+    # 2026-05-03 is a Sunday
+    assert CronExpression("@weekly").next_after(ts(2026, 4, 30)) == ts(2026, 5, 3)
+
+
+def test_both_day_fields_restricted_match_either():
+    # The 13th or any Friday; 2026-03-06 is a Friday, 2026-03-13 a Friday too
+    cron = CronExpression("0 12 13 * fri")
+    assert cron.next_after(ts(2026, 3, 1)) == ts(2026, 3, 6, 12, 0)
+    assert cron.next_after(ts(2026, 4, 11)) == ts(2026, 4, 13, 12, 0)
+    # Only one restricted: both must hold
+    assert CronExpression("0 12 * * fri").next_after(ts(2026, 4, 11)) == ts(2026, 4, 17, 12, 0)
+
+
+def test_leap_day():
+    assert CronExpression("0 0 29 2 *").next_after(ts(2026, 3, 1)) == ts(2028, 2, 29)
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError):
+        CronExpression("0 0 31 2 *").next_after(ts(2026, 1, 1))
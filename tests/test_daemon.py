@@ -0,0 +1,123 @@
+import json
+import asyncio
+
+import pytest
+
+from backups import BackupError
+from daemon import DaemonClient, DaemonError, DaemonServer
+
+
+class SlowControl:
+    def __init__(self):
+        self.restored = asyncio.Event()
+
+    async def restore_backup(self, backup_id):
+        await asyncio.sleep(0.2)
+        self.restored.set()
+
+
+def test_restore_outlives_the_connection(tmp_path):
+    async def run():
+        control = SlowControl()
+        server = DaemonServer({"main": control}, str(tmp_path / "daemon.sock"))
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(server.path)
+            request = {"id": 1, "server": "main", "method": "restore_backup", "params": {"backup_id": "x"}}
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            # The worker goes away in the middle of the restore
+            writer.close()
+            await asyncio.wait_for(control.restored.wait(), 5)
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+class FakeControl:
+    def __init__(self, name):
+        self.name = name
+
+    async def status(self):
+        return {"server": self.name}
+
+    async def command_history(self, user=None, start=None, end=None, before=None, limit=10):
+        # The slower call is sent first and answered last
+        await asyncio.sleep(0.1 if before else 0)
+        return [{"id": before or 0, "user": user}], limit
+
+    async def create_backup(self):
+        raise BackupError("Уже выполняется операция: backup")
+
+    async def stop_server(self):
+        raise RuntimeError("boom")
+
+
+def with_daemon(test, tmp_path):
+    async def run():
+        server = DaemonServer({"lobby": FakeControl("lobby"), "survival": FakeControl("survival")},
+                              str(tmp_path / "daemon.sock"))
+        await server.start()
+        clients = []
+
+        def client(server_id):
+            clients.append(DaemonClient(server.path, server_id))
+            return clients[-1]
+
+        try:
+            return await test(server, client)
+        finally:
+            for client in clients:
+                await client.shutdown()
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def test_calls_reach_the_right_server(tmp_path):
+    async def test(server, client):
+        lobby, survival = client("lobby"), client("survival")
+        assert await lobby.status() == {"server": "lobby"}
+        assert await survival.status() == {"server": "survival"}
+        # Concurrent requests on one connection are matched to their replies by id
+        slow, fast = await asyncio.gather(lobby.command_history(before=5), lobby.command_history(user="a", limit=3))
+        assert slow == [[{"id": 5, "user": None}], 10]
+        assert fast == [[{"id": 0, "user": "a"}], 3]
+
+    with_daemon(test, tmp_path)
+
+
+def test_errors_are_raised_in_the_worker(tmp_path):
+    async def test(server, client):
+        lobby = client("lobby")
+        # Errors the API handles keep their type
+        with pytest.raises(BackupError, match="backup"):
+            await lobby.create_backup()
+        with pytest.raises(DaemonError, match="boom"):
+            await lobby.stop_server()
+        with pytest.raises(DaemonError, match="Unknown method"):
+            await lobby.call("__init__")
+        with pytest.raises(DaemonError, match="Unknown server"):
+            await client("creative").status()
+        # The connection is still usable afterwards
+        assert await lobby.status() == {"server": "lobby"}
+
+    with_daemon(test, tmp_path)
+
+
+def test_client_reconnects_after_the_connection_drops(tmp_path):
+    async def test(server, client):
+        lobby = client("lobby")
+        assert await lobby.status() == {"server": "lobby"}
+        lobby._writer.transport.abort()
+        await asyncio.sleep(0.05)
+        assert lobby._writer is None
+        assert await lobby.status() == {"server": "lobby"}
+
+        missing = DaemonClient(str(tmp_path / "missing.sock"), "lobby")
+        with pytest.raises(DaemonError, match="not reachable"):
+            await missing.status()
+
+    with_daemon(test, tmp_path)
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from diagnostics import DiagnosticsError, LagDiagnostics, parse_histogram, summarize
+
+HISTOGRAM = """
+ num     #instances         #bytes  class name (module)
+-------------------------------------------------------
+   1:        120000        9600000  [B (java.base@17)
+   2:         50000        1200000  java.lang.String (java.base@17)
+   3:          1000          48000  net.minecraft.Chunk
+   4:            10            480  net.minecraft.Chunk
+Total        171010       10848480
+"""
+
+THREADS = """2024-05-01 12:00:00
+Full thread dump OpenJDK 64-Bit Server VM:
+
+"Server thread" #30 prio=5 os_prio=0 tid=0x1 nid=0x2 runnable
+   java.lang.Thread.State: RUNNABLE
+\tat net.minecraft.World.tick(World.java:100)
+\t- locked <0x1> (a java.lang.Object)
+\tat net.minecraft.Server.run(Server.java:50)
+
+"Worker-1" #31 prio=5 os_prio=0 tid=0x3 nid=0x4 waiting on condition
+   java.lang.Thread.State: WAITING (parking)
+"""
+
+HEAP = """garbage-first heap   total 4194304K, used 2097152K [0x0, 0x1)
+ region size 2048K, 100 young (204800K), 10 survivors (20480K)"""
+
+
+def test_parse_histogram_adds_up_class_loaders():
+    assert parse_histogram(HISTOGRAM) == {
+        "[B": (120000, 9600000),
+        "java.lang.String": (50000, 1200000),
+        "net.minecraft.Chunk": (1010, 48480),
+    }
+    assert parse_histogram("") == {}
+
+
+def test_summarize():
+    summary = summarize({"threads": THREADS, "heap": HEAP, "histogram": HISTOGRAM})
+    assert summary["threads"] == {
+        "count": 2, "states": {"RUNNABLE": 1, "WAITING": 1},
+        "main_thread": {"state": "RUNNABLE", "frames": [
+            "at net.minecraft.World.tick(World.java:100)", "- locked <0x1> (a java.lang.Object)",
+            "at net.minecraft.Server.run(Server.java:50)"]},
+    }
+    assert summary["heap"] == {"total_bytes": 4194304 * 1024, "used_bytes": 2097152 * 1024}
+    assert summary["histogram"]["classes"] == 3
+    assert summary["histogram"]["bytes"] == 10848480
+    assert summary["histogram"]["top"][0] == {"class": "[B", "instances": 120000, "bytes": 9600000}
+    # A failed command leaves its part out
+    assert summarize({"heap": "jcmd failed"}) == {"heap": {"total_bytes": None, "used_bytes": None}}
+
+
+def diagnostics(tmp_path, **kwargs):
+    return LagDiagnostics("jcmd", str(tmp_path / "diagnostics"), lambda: None, **kwargs)
+
+
+def store(diag, capture_id, created, **outputs):
+    meta = {"id": capture_id, "reason": "test", "pid": 1, "created": created, "seconds": 0.1,
+            "durations": {}, "errors": {}}
+    return diag._store(meta, outputs)
+
+
+def test_prune_keeps_newest_captures(tmp_path):
+    diag = diagnostics(tmp_path, keep=2)
+    for i in range(4):
+        store(diag, f"20240501-12000{i}", i, heap=HEAP)
+    diag._prune()
+    assert diag._capture_ids() == ["20240501-120002", "20240501-120003"]
+
+
+def test_prune_by_size_always_keeps_the_newest(tmp_path):
+    diag = diagnostics(tmp_path, max_bytes=1)
+    for i in range(3):
+        store(diag, f"20240501-12000{i}", i, histogram=HISTOGRAM * 10)
+    diag._prune()
+    assert diag._capture_ids() == ["20240501-120002"]
+
+
+def test_diff(tmp_path):
+    diag = diagnostics(tmp_path)
+    store(diag, "old", 100.0, threads=THREADS, heap=HEAP, histogram=HISTOGRAM)
+    grown = HISTOGRAM.replace("9600000", "19600000").replace("1200000", "200000")
+    store(diag, "new", 160.0, threads=THREADS.replace("WAITING", "BLOCKED"),
+          heap=HEAP.replace("used 2097152K", "used 3145728K"), histogram=grown)
+
+    result = diag.diff("old", "new")
+    assert result["seconds"] == 60.0
+    assert result["heap_used_delta"] == 1048576 * 1024
+    assert result["threads"] == {"count_delta": 0, "states": {"BLOCKED": 1, "RUNNABLE": 0, "WAITING": -1}}
+    assert [(c["class"], c["bytes_delta"]) for c in result["grown"]] == [("[B", 10000000)]
+    assert [(c["class"], c["bytes_delta"]) for c in result["shrunk"]] == [("java.lang.String", -1000000)]
+
+
+@pytest.mark.parametrize("capture_id", ["", ".", "..", "../secrets", "a/b", "/etc", "missing"])
+def test_load_only_reads_captures_of_the_store(tmp_path, capture_id):
+    diag = diagnostics(tmp_path)
+    store(diag, "real", 0, heap=HEAP)
+    # A meta.json right outside the store must not be reachable
+    os.makedirs(tmp_path / "secrets")
+    (tmp_path / "secrets" / "meta.json").write_text("{}")
+    with pytest.raises(DiagnosticsError):
+        diag._load(capture_id)
+    assert diag._load("real")["id"] == "real"
@@ -0,0 +1,89 @@
+import json
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from conftest import VIEWER, login
+from daemon import DaemonClient
+from instances import ServerRegistry
+from scheduler import PeriodicScheduler
+from server_control import load_server_configs
+
+
+def write_configs(tmp_path, entries):
+    path = tmp_path / "servers.json"
+    path.write_text(json.dumps(entries))
+    return str(path)
+
+
+def test_without_a_registry_the_environment_configures_one_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("SERVER_DIR", "/srv/minecraft")
+    monkeypatch.setenv("RCON_PORT", "25580")
+    [config] = load_server_configs(str(tmp_path / "missing.json"), str(tmp_path))
+    assert (config.id, config.server_dir, config.rcon_port) == ("default", "/srv/minecraft", 25580)
+    # Existing single-server data stays where it was
+    assert config.data_dir == str(tmp_path)
+    assert config.log_file == "/srv/minecraft/logs/latest.log"
+
+
+def test_registry_file(tmp_path):
+    path = write_configs(tmp_path, [
+        {"id": "lobby", "server_dir": "/srv/lobby", "rcon_port": 25576},
+        {"id": "survival", "name": "Выживание", "server_dir": "/srv/survival", "data_dir": "/data/survival"},
+    ])
+    lobby, survival = load_server_configs(path, "/data")
+    assert lobby.data_dir == "/data/servers/lobby"
+    assert survival.data_dir == "/data/survival"
+
+    servers = ServerRegistry([lobby, survival], supervisor_socket=str(tmp_path / "daemon.sock"))
+    assert len(servers) == 2
+    # The first server answers the /api/server/... routes
+    assert servers.get(None) is servers.get("lobby")
+    assert servers.get("survival").name == "Выживание"
+    assert servers.get("lobby").name == "lobby"
+    assert servers.get("creative") is None
+    assert isinstance(servers.get("survival").server, DaemonClient)
+    assert servers.get("survival").rcon_client.port == 25575
+
+
+@pytest.mark.parametrize("entries, error", [
+    ([], ValueError),
+    ([{"id": "lobby", "server_dir": "a"}, {"id": "lobby", "server_dir": "b"}], ValueError),
+    ([{"id": "../lobby", "server_dir": "a"}], ValidationError),
+    ([{"id": "lobby"}], ValidationError),
+])
+def test_invalid_registries(tmp_path, entries, error):
+    with pytest.raises(error):
+        load_server_configs(write_configs(tmp_path, entries), str(tmp_path))
+
+
+def test_one_scheduler_runs_every_instance(tmp_path):
+    runs = {"lobby": 0, "survival": 0}
+
+    def job(name):
+        async def run():
+            runs[name] += 1
+        return run
+
+    async def run():
+        scheduler = PeriodicScheduler()
+        scheduler.add("lobby", 0.02, job("lobby"))
+        survival = scheduler.add("survival", 0.02, job("survival"))
+        scheduler.start()
+        await asyncio.sleep(0.15)
+        survival.cancel()
+        stopped = runs["survival"]
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return stopped
+
+    stopped = asyncio.run(run())
+    assert runs["lobby"] > stopped >= 3
+    assert runs["survival"] == stopped
+
+
+def test_unknown_server_routes(api):
+    login(api, VIEWER)
+    assert api.get("/api/servers/creative/logs").status_code == 404
+    assert api.get("/api/servers/default/status").status_code == api.get("/api/server/status").status_code == 200
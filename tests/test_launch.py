@@ -0,0 +1,19 @@
+import os
+
+from launch import LaunchManager, LaunchProfile
+
+
+def test_archives_of_other_profiles_are_kept(tmp_path):
+    manager = LaunchManager("java", [], str(tmp_path), "server.jar",
+                            {"aikar-large": LaunchProfile(aikar=True, heap="16G")}, "aikar", str(tmp_path / "data"))
+    os.makedirs(manager.cds_dir)
+    names = ["aikar-0123456789abcdef.jsa", "aikar-fedcba9876543210.jsa", "aikar-large-0123456789abcdef.jsa",
+             "aikar-notes.txt", "zgc-0123456789abcdef.jsa"]
+    for name in names:
+        open(os.path.join(manager.cds_dir, name), "w").close()
+
+    keep = manager.archive_path("aikar", "0123456789abcdef")
+    assert manager._remove_archives("aikar", keep=keep) == ["aikar-fedcba9876543210.jsa"]
+    assert sorted(manager.clear_archives()) == ["aikar-0123456789abcdef.jsa", "aikar-large-0123456789abcdef.jsa",
+                                                "zgc-0123456789abcdef.jsa"]
+    assert os.listdir(manager.cds_dir) == ["aikar-notes.txt"]
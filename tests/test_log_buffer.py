@@ -0,0 +1,71 @@
+import sys
+import asyncio
+
+from log_buffer import LINE_OVERHEAD, LogRingBuffer
+from supervisor import ServerSupervisor
+
+
+def filled(count, **kwargs):
+    buffer = LogRingBuffer(**kwargs)
+    for i in range(1, count + 1):
+        buffer.append(f"line {i}\n")
+    return buffer
+
+
+def test_ring_wraps_around():
+    buffer = filled(12, capacity=5)
+    assert (buffer.first_seq, buffer.last_seq, len(buffer)) == (8, 12, 5)
+    assert buffer.tail(3) == [(10, "line 10"), (11, "line 11"), (12, "line 12")]
+    assert buffer.tail(100) == [(seq, f"line {seq}") for seq in range(8, 13)]
+
+
+def test_resume_inside_the_buffer():
+    buffer = filled(12, capacity=5)
+    assert buffer.since(9, 2) == ([(10, "line 10"), (11, "line 11")], False)
+    # Resuming right before the oldest line loses nothing
+    assert buffer.since(7, 100) == ([(seq, f"line {seq}") for seq in range(8, 13)], False)
+    assert buffer.since(12, 100) == ([], False)
+
+
+def test_resume_older_than_the_oldest_line_reports_the_gap():
+    buffer = filled(12, capacity=5)
+    lines, reset = buffer.since(3, 2)
+    assert reset
+    assert lines == [(11, "line 11"), (12, "line 12")]
+    # A position the buffer never reached, e.g. from before a restart without the spool
+    assert buffer.since(50, 2) == (lines, True)
+
+
+def test_memory_bound_evicts_oldest_lines():
+    buffer = filled(10, capacity=100, max_bytes=3 * (len("line 10") + LINE_OVERHEAD))
+    assert buffer.first_seq == 8
+    assert buffer.since(5, 10)[1]
+
+
+def test_spool_restores_history_and_sequence(tmp_path):
+    buffer = filled(12, capacity=5, spool_dir=str(tmp_path), segment_bytes=40)
+    buffer.flush()
+    restored = LogRingBuffer(capacity=5, spool_dir=str(tmp_path))
+    restored.load()
+    assert restored.tail(100) == buffer.tail(100)
+    assert restored.append("after restart") == 13
+    assert restored.since(3, 5)[1]
+
+
+def test_supervisor_output_goes_through_the_ring(tmp_path):
+    output = LogRingBuffer(capacity=4)
+    script = "for i in range(10): print(f'out {i}', flush=True)\nimport sys; print('err', file=sys.stderr)"
+    supervisor = ServerSupervisor(str(tmp_path), output, lambda: [sys.executable, "-c", script],
+                                  auto_restart=False)
+
+    async def run():
+        await supervisor.start()
+        await supervisor.process.wait()
+        await supervisor._monitor_task
+
+    asyncio.run(run())
+    assert output.last_seq == 11
+    assert output.tail(2) == [(10, "out 9"), (11, "err")]
+    lines, reset = output.since(1, 10)
+    assert reset
+    assert [seq for seq, _ in lines] == [8, 9, 10, 11]
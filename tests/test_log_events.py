@@ -0,0 +1,73 @@
+import pytest
+
+from log_events import KIND_IDS, LEVEL_IDS, EventStore, parse_line
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("[12:00:00] [Server thread/INFO]: Steve joined the game", ("join", "INFO", "Server thread", "Steve", 0)),
+    ("[12:00:00] [Server thread/INFO]: Steve[/127.0.0.1:5000] joined the game", ("join", "INFO", "Server thread",
+                                                                                 "Steve", 0)),
+    ("[12:00:00 INFO]: Alex left the game", ("leave", "INFO", "", "Alex", 0)),
+    ("[12:00:00] [Async Chat Thread - #0/INFO]: [Not Secure] <Steve> hi <3", ("chat", "INFO", "Async Chat Thread - #0",
+                                                                             "Steve", 0)),
+    ("[12:00:00 INFO]: Steve issued server command: /home", ("command", "INFO", "", "Steve", 0)),
+    ("[12:00:00] [Server thread/INFO]: [Steve: Set the time to 1000]", ("command", "INFO", "Server thread", "Steve", 0)),
+    ("[12:00:00] [Server thread/INFO]: [Rcon: Saved the game]", ("command", "INFO", "Server thread", None, 0)),
+    ("[12:00:00] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 5003ms or 100 ticks behind",
+     ("lag", "WARN", "Server thread", None, 5003)),
+    ("[12:00:00] [Server thread/ERROR]: This crash report has been saved to: crash-reports/crash.txt",
+     ("crash", "ERROR", "Server thread", None, 0)),
+    ("[12:00:00] [Server thread/INFO]: Preparing spawn area: 85%", ("other", "INFO", "Server thread", None, 0)),
+])
+def test_parse_line(line, expected):
+    kind, level, thread, player, value, _ = parse_line(line)
+    assert (kind, level, thread, player, value) == (KIND_IDS[expected[0]], LEVEL_IDS[expected[1]], *expected[2:])
+
+
+def test_lines_without_a_header_are_skipped():
+    assert parse_line("\tat net.minecraft.World.tick(World.java:100)") is None
+    assert parse_line("") is None
+
+
+def test_chat_message_is_the_text_only():
+    assert parse_line("[12:00:00] [Server thread/INFO]: <Steve> [hi]")[5] == "[hi]"
+
+
+def store(lines, **kwargs):
+    events = EventStore(**kwargs)
+    for ts, line in enumerate(lines, 1):
+        events.feed(f"[12:00:00] [Server thread/INFO]: {line}", ts=float(ts))
+    return events
+
+
+def test_query_filters():
+    events = store(["Steve joined the game", "<Steve> hi", "Preparing level", "Alex joined the game",
+                    "<Alex> hello", "Steve left the game"])
+    # Uninteresting lines are not kept
+    assert len(events) == 5
+    assert [e["message"] for e in events.query(player="Steve")] == ["Steve joined the game", "hi",
+                                                                     "Steve left the game"]
+    assert [e["player"] for e in events.query(kinds=["join"])] == ["Steve", "Alex"]
+    assert [e["seq"] for e in events.query(start=2, end=4)] == [2, 3]
+    assert events.query(player="Notch") == []
+    assert events.query(level="bogus") == []
+    assert len(events.query(level="info")) == 5
+
+
+def test_newest_page_and_forward_paging():
+    events = store([f"<Steve> message {i}" for i in range(10)])
+    assert [e["seq"] for e in events.query(limit=3)] == [8, 9, 10]
+    assert [e["seq"] for e in events.query(after=2, limit=3)] == [3, 4, 5]
+    assert events.query(after=10) == []
+
+
+def test_ring_drops_the_oldest_events():
+    events = store([f"<Steve> message {i}" for i in range(10)], capacity=4)
+    assert (events.first_seq, events.next_seq) == (7, 11)
+    assert [e["message"] for e in events.query()] == [f"message {i}" for i in range(6, 10)]
+    assert [e["seq"] for e in events.query(after=1, limit=2)] == [7, 8]
+
+
+def test_keep_other():
+    events = store(["Preparing level", "Done (1.0s)! For help"], keep_other=True)
+    assert [e["kind"] for e in events.query()] == ["other", "other"]
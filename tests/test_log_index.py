@@ -0,0 +1,92 @@
+import gzip
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from log_index import LogArchiveIndex
+
+DAY_ONE = [
+    "[10:00:00] [Server thread/INFO]: Steve joined the game",
+    "[10:00:05] [Server thread/INFO]: <Steve> hello",
+    "[10:30:00] [Server thread/WARN]: Can't keep up! Is the server overloaded?",
+    "[11:00:00] [Server thread/INFO]: Alex joined the game",
+    "[11:00:01] [Server thread/ERROR]: Exception ticking world",
+    "\tat net.minecraft.World.tick(World.java:100)",
+    "[23:59:59] [Server thread/INFO]: <Alex> good night Steve",
+    "[00:00:10] [Server thread/INFO]: Steve left the game",
+]
+DAY_TWO = [f"[09:00:{i:02d}] [Server thread/INFO]: <Steve> message {i}" for i in range(10)]
+
+
+@pytest.fixture
+def index(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    for name, lines in (("2024-05-01-1", DAY_ONE), ("2024-05-03-1", DAY_TWO)):
+        with gzip.open(logs / f"{name}.log.gz", "wt", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    index = LogArchiveIndex(str(logs), str(tmp_path / "index"))
+    asyncio.run(index.refresh())
+    return index
+
+
+def search(index, **kwargs):
+    async def run():
+        return [record async for record in index.search(**kwargs)]
+
+    return asyncio.run(run())
+
+
+def lines(records):
+    return [record["line"] for record in records if "line" in record]
+
+
+def test_player_and_level_filters(index):
+    assert sorted(index.indexed) == ["2024-05-01-1", "2024-05-03-1"]
+    records = search(index, player="alex")
+    assert lines(records) == [DAY_ONE[3], DAY_ONE[6]]
+    assert records[-1] == {"next": None}
+    assert lines(search(index, level="warn")) == [DAY_ONE[2]]
+    assert lines(search(index, q="Steve joined")) == [DAY_ONE[0]]
+    # Whole words only
+    assert lines(search(index, q="Stev")) == []
+
+
+def test_time_range_and_midnight(index):
+    records = search(index, player="steve", start=datetime(2024, 5, 1, 23).timestamp(),
+                     end=datetime(2024, 5, 2, 12).timestamp())
+    assert lines(records) == [DAY_ONE[6], DAY_ONE[7]]
+    # The line after midnight belongs to the next day
+    assert records[1]["time"] == "2024-05-02T00:00:10"
+
+
+def test_stack_trace_lines_keep_the_previous_time(index):
+    [record] = search(index, q="World.java")[:-1]
+    assert record["time"] == "2024-05-01T11:00:01"
+    assert record["level"] is None
+
+
+def test_pages_follow_the_cursor(index):
+    received, cursor = [], None
+    while True:
+        records = search(index, q="message", limit=4, cursor=cursor)
+        received.append(lines(records))
+        cursor = records[-1]["next"]
+        if cursor is None:
+            break
+    assert [len(page) for page in received] == [4, 4, 2]
+    assert sum(received, []) == DAY_TWO
+
+
+def test_index_is_reused_until_the_archive_changes(index, tmp_path):
+    again = LogArchiveIndex(index.log_dir, index.index_dir, build=False)
+    asyncio.run(again.refresh())
+    assert again.indexed == index.indexed
+    assert lines(search(again, player="alex")) == [DAY_ONE[3], DAY_ONE[6]]
+
+    with gzip.open(tmp_path / "logs" / "2024-05-03-1.log.gz", "at", encoding="utf-8") as f:
+        f.write("[10:00:00] [Server thread/INFO]: Notch joined the game\n")
+    assert again._scan() == [str(tmp_path / "logs" / "2024-05-03-1.log.gz")]
+    asyncio.run(index.refresh())
+    assert len(lines(search(index, player="notch"))) == 1
@@ -0,0 +1,110 @@
+import os
+import asyncio
+
+from log_reader import decode_cursor, read_log
+from log_stream import LogBroadcaster
+
+
+def append(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(f"{line}\n" for line in lines)
+
+
+def test_tail_returns_last_lines(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, [f"line {i}" for i in range(10)])
+
+    chunk = read_log(str(log), 3)
+    assert chunk.lines == ["line 7\n", "line 8\n", "line 9\n"]
+    assert decode_cursor(chunk.cursor).offset == os.path.getsize(log)
+    assert not chunk.reset
+
+
+def test_burst_larger_than_max_lines_is_not_lost(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, ["start"])
+    cursor = read_log(str(log), 0).cursor
+    append(log, [f"line {i}" for i in range(120)])
+
+    sizes, received = [], []
+    while True:
+        chunk = read_log(str(log), 50, cursor)
+        if chunk.cursor == cursor:
+            break
+        sizes.append(len(chunk.lines))
+        received += chunk.lines
+        cursor = chunk.cursor
+
+    assert sizes == [50, 50, 20]
+    assert received == [f"line {i}\n" for i in range(120)]
+
+
+def test_partial_last_line_waits_for_newline(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, ["first"])
+    cursor = read_log(str(log), 0).cursor
+    with open(log, "a", encoding="utf-8") as f:
+        f.write("second\nthi")
+
+    chunk = read_log(str(log), 50, cursor)
+    assert chunk.lines == ["second\n"]
+    with open(log, "a", encoding="utf-8") as f:
+        f.write("rd\n")
+    assert read_log(str(log), 50, chunk.cursor).lines == ["third\n"]
+
+
+def test_rotation_resets_cursor(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, [f"old {i}" for i in range(5)])
+    cursor = read_log(str(log), 0).cursor
+
+    os.rename(log, tmp_path / "old.log")
+    append(log, ["new 0"])
+    chunk = read_log(str(log), 50, cursor)
+    assert chunk.reset
+    assert chunk.lines == ["new 0\n"]
+
+
+def test_truncation_resets_cursor(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, [f"old {i}" for i in range(5)])
+    cursor = read_log(str(log), 0).cursor
+
+    with open(log, "w", encoding="utf-8") as f:
+        f.write("fresh\n")
+    chunk = read_log(str(log), 50, cursor)
+    assert chunk.reset
+    assert chunk.lines == ["fresh\n"]
+
+
+def test_malformed_cursor_falls_back_to_tail(tmp_path):
+    log = tmp_path / "latest.log"
+    append(log, ["a", "b"])
+    assert read_log(str(log), 1, "not a cursor!").lines == ["b\n"]
+
+
+def test_broadcaster_publishes_whole_burst(tmp_path, monkeypatch):
+    monkeypatch.setattr("log_stream.READ_BATCH_LINES", 7)
+    log = tmp_path / "latest.log"
+    append(log, ["start"])
+
+    async def run():
+        broadcaster = LogBroadcaster(str(log))
+        sub, (cursor, backlog) = await broadcaster.subscribe(5)
+        assert backlog == ["start\n"]
+
+        append(log, [f"line {i}" for i in range(30)])
+        await broadcaster._advance()
+        received = []
+        while not sub.queue.empty():
+            batch_cursor, lines = sub.queue.get_nowait()
+            received += lines
+        assert received == [f"line {i}\n" for i in range(30)]
+        assert batch_cursor == broadcaster.cursor
+
+        # Resuming from the old cursor more than max_lines behind gives the latest lines
+        _, (resumed, backlog) = await broadcaster.subscribe(5, cursor)
+        assert resumed == broadcaster.cursor
+        assert backlog == [f"line {i}\n" for i in range(25, 30)]
+
+    asyncio.run(run())
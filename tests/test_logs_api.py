@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from conftest import VIEWER, login
+from log_buffer import LogRingBuffer
+
+
+@pytest.fixture
+def server(api):
+    """The default server with an empty console, and a viewer logged in."""
+    login(api, VIEWER)
+    instance = api.main.servers.get(None)
+    console = instance.server.console
+    instance.server.console = LogRingBuffer(capacity=100)
+    yield instance
+    instance.server.console = console
+    if os.path.exists(instance.config.log_file):
+        os.remove(instance.config.log_file)
+
+
+def append(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(f"{line}\n" for line in lines)
+
+
+def test_log_file_cursor_and_not_modified(api, server):
+    log = server.config.log_file
+    append(log, ["first", "second"])
+
+    response = api.get("/api/server/logs", params={"lines": 10})
+    assert response.json()["logs"] == ["first\n", "second\n"]
+    cursor, etag = response.json()["cursor"], response.headers["etag"]
+
+    # Nothing written since: the poll is answered without a body
+    unchanged = api.get("/api/server/logs", params={"since": cursor}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    append(log, ["third", "fourth"])
+    stale = api.get("/api/server/logs", params={"since": cursor}, headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.json()["logs"] == ["third\n", "fourth\n"]
+    assert api.get("/api/servers/default/logs", params={"since": stale.json()["cursor"]}).json()["logs"] == []
+
+
+def test_console_resume_and_not_modified(api, server):
+    for i in range(5):
+        server.server.console.append(f"line {i}")
+
+    response = api.get("/api/server/logs", params={"lines": 3})
+    assert response.json() == {"logs": ["line 2", "line 3", "line 4"], "seq": 5, "reset": False}
+    etag = response.headers["etag"]
+
+    unchanged = api.get("/api/server/logs", params={"after": 5}, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+
+    server.server.console.append("line 5")
+    resumed = api.get("/api/server/logs", params={"after": 5}, headers={"If-None-Match": etag})
+    assert resumed.json() == {"logs": ["line 5"], "seq": 6, "reset": False}
+    assert resumed.headers["etag"] != etag
+
+
+def test_logs_need_a_login(api, server):
+    login(api, None)
+    assert api.get("/api/server/logs").status_code == 401
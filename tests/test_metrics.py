@@ -0,0 +1,52 @@
+import asyncio
+
+from metrics import MetricsCollector
+
+PAPER_TPS = "TPS from last 1m, 5m, 15m: 19.5, 19.9, 20.0"
+TICK_QUERY = "Average time per tick: 12.5ms"
+
+
+def collector(responses):
+    sent = []
+
+    async def command(text):
+        sent.append(text)
+        if text == "list":
+            return "There are 0 of a max of 20 players online:"
+        return responses.get(text, "Unknown or incomplete command")
+
+    return MetricsCollector(command, lambda: None), sent
+
+
+def test_tps_command_is_found_and_reused():
+    metrics, sent = collector({"tick query": TICK_QUERY})
+    asyncio.run(metrics._sample_rcon())
+    assert sent == ["list", "tps", "forge tps", "tick query"]
+    assert metrics.latest["mspt"] == 12.5
+
+    sent.clear()
+    asyncio.run(metrics._sample_rcon())
+    assert sent == ["list", "tick query"]
+
+
+def test_failing_tps_command_falls_through():
+    responses = {"tps": PAPER_TPS, "tick query": TICK_QUERY}
+    metrics, sent = collector(responses)
+    asyncio.run(metrics._sample_rcon())
+    assert metrics.latest["tps"] == 19.5
+
+    # The plugin providing "tps" went away: the same sample uses the next command that works
+    del responses["tps"]
+    sent.clear()
+    asyncio.run(metrics._sample_rcon())
+    assert sent == ["list", "tps", "forge tps", "tick query"]
+    assert metrics.latest["tps"] == 20.0
+    assert metrics.latest["mspt"] == 12.5
+
+    # After a restart every command is tried again
+    responses["tps"] = PAPER_TPS
+    metrics.reset_tps_command()
+    sent.clear()
+    asyncio.run(metrics._sample_rcon())
+    assert sent == ["list", "tps"]
+    assert metrics.latest["tps"] == 19.5
@@ -0,0 +1,166 @@
+import time
+import asyncio
+
+import httpx
+import pytest
+
+jwt = pytest.importorskip("jwt")
+pytest.importorskip("cryptography")
+
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import oauth  # noqa: E402
+from oauth import OAuthError, OpenIDProvider, email_verified  # noqa: E402
+from conftest import login  # noqa: E402
+from tools.fake_oauth import create_app  # noqa: E402
+
+ISSUER = "http://fake-oauth.test"
+CLIENT_ID = "test-client"
+
+
+@pytest.fixture(scope="module")
+def app():
+    return create_app(ISSUER, "player@example.com", CLIENT_ID, "test-secret")
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {"iss": ISSUER, "aud": CLIENT_ID, "iat": now, "exp": now + 3600, "sub": "1",
+            "email": "player@example.com", "email_verified": True, **overrides}
+
+
+def verify(app, *tokens):
+    """Verify tokens with one provider against the stub; returns the claims or the OAuthError."""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url=ISSUER) as http:
+            provider = OpenIDProvider(http, CLIENT_ID, f"{ISSUER}/.well-known/openid-configuration")
+            results = []
+            for token in tokens:
+                if callable(token):
+                    token = await token(http)
+                try:
+                    results.append(await provider.verify_id_token(token))
+                except OAuthError as e:
+                    results.append(e)
+            return results
+
+    return asyncio.run(run())
+
+
+def test_valid_token(app):
+    [result] = verify(app, app.state.keys.sign(claims()))
+    assert result["email"] == "player@example.com"
+
+
+def test_bad_signature(app):
+    kid = app.state.keys.keys[0][0]
+    forged = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    [result] = verify(app, app.state.keys.sign(claims(), kid=kid, key=forged))
+    assert isinstance(result, OAuthError)
+
+
+def test_tampered_payload(app):
+    other = app.state.keys.sign(claims(email="admin@example.com"))
+    header, _, signature = app.state.keys.sign(claims()).split(".")
+    [result] = verify(app, ".".join([header, other.split(".")[1], signature]))
+    assert isinstance(result, OAuthError)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"aud": "another-client"},
+    {"iss": "https://evil.example.com"},
+    {"exp": int(time.time()) - 3600, "iat": int(time.time()) - 7200},
+    {"iat": int(time.time()) + 3600},
+])
+def test_rejected_claims(app, overrides):
+    [result] = verify(app, app.state.keys.sign(claims(**overrides)))
+    assert isinstance(result, OAuthError)
+
+
+def test_missing_expiry(app):
+    token_claims = claims()
+    del token_claims["exp"]
+    [result] = verify(app, app.state.keys.sign(token_claims))
+    assert isinstance(result, OAuthError)
+
+
+def test_other_algorithms_rejected(app):
+    [result] = verify(app, jwt.encode(claims(), "s" * 32, algorithm="HS256",
+                                      headers={"kid": app.state.keys.keys[0][0]}))
+    assert isinstance(result, OAuthError)
+
+
+def test_key_rotation(app, monkeypatch):
+    monkeypatch.setattr(oauth, "MIN_JWKS_REFRESH", 0)
+    old_token = app.state.keys.sign(claims())
+
+    async def rotate_and_sign(http):
+        await http.post("/rotate")
+        return app.state.keys.sign(claims(sub="2"))
+
+    first, rotated, old = verify(app, old_token, rotate_and_sign, old_token)
+    assert first["sub"] == "1"
+    # The new key id is unknown to the cache, so the keys are fetched again
+    assert rotated["sub"] == "2"
+    # The previous key is still published
+    assert old["sub"] == "1"
+
+
+def test_unknown_key_id_is_not_refetched_every_time(app):
+    async def stats(http):
+        return (await http.get("/stats")).json()["jwks"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url=ISSUER) as http:
+            provider = OpenIDProvider(http, CLIENT_ID, f"{ISSUER}/.well-known/openid-configuration")
+            await provider.verify_id_token(app.state.keys.sign(claims()))
+            before = await stats(http)
+            for _ in range(3):
+                with pytest.raises(OAuthError):
+                    await provider.verify_id_token(app.state.keys.sign(claims(), kid="unknown"))
+            return await stats(http) - before
+
+    assert asyncio.run(run()) == 0
+
+
+@pytest.mark.parametrize("value, verified", [(True, True), ("true", True), (False, False), ("false", False),
+                                             (None, False)])
+def test_email_verified(value, verified):
+    userinfo = {"email": "player@example.com"}
+    if value is not None:
+        userinfo["email_verified"] = value
+    assert email_verified(userinfo) is verified
+    # Google's v1/v2 userinfo endpoints name the flag differently
+    assert email_verified({"email": "player@example.com", "verified_email": value}) is verified
+
+
+@pytest.mark.parametrize("userinfo, status", [
+    # Google's v1/v2 userinfo endpoint
+    ({"id": "1", "email": "player@example.com", "verified_email": True, "name": "p", "picture": "x"}, 307),
+    ({"id": "1", "email": "player@example.com", "verified_email": False, "name": "p", "picture": "x"}, 403),
+    ({"sub": "1", "email": "player@example.com", "email_verified": "true", "name": "p", "picture": "x"}, 307),
+    ({"sub": "1", "email": "player@example.com", "name": "p", "picture": "x"}, 403),
+])
+def test_login_through_userinfo(api, app, monkeypatch, userinfo, status):
+    """Without an ID token (or PyJWT) the callback asks the userinfo endpoint for the profile."""
+    main = api.main
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=ISSUER)
+    monkeypatch.setattr(main, "http_client", http)
+    monkeypatch.setattr(main, "openid_provider",
+                        OpenIDProvider(http, CLIENT_ID, f"{ISSUER}/.well-known/openid-configuration"))
+    monkeypatch.setattr(app.state, "userinfo", userinfo)
+
+    client = login(api, None)
+    redirect = client.get("/auth/google", follow_redirects=False).headers["location"]
+    state = httpx.URL(redirect).params["state"]
+    # Without the openid scope the token response has no ID token
+    authorized = TestClient(app, base_url=ISSUER).get("/auth", follow_redirects=False, params={
+        "redirect_uri": "https://testserver/auth/callback", "state": state, "scope": "email profile"})
+    code = httpx.URL(authorized.headers["location"]).params["code"]
+
+    response = client.get("/auth/callback", params={"code": code, "state": state}, follow_redirects=False)
+    assert response.status_code == status
+    assert ("session" in response.cookies) == (status == 307)
@@ -0,0 +1,30 @@
+import perf
+from conftest import ADMIN, login
+from perf import InstrumentedExecutor, executor_stats
+
+
+def test_executor_counts_return_to_zero():
+    executor = InstrumentedExecutor(max_workers=8)
+    executor_stats.reset()
+    futures = [executor.submit(sum, range(100)) for _ in range(5000)]
+    for future in futures:
+        future.result()
+    executor.shutdown(wait=True)
+
+    stats = executor.thread_stats()
+    assert stats["active"] == 0
+    assert stats["submitted"] == 5000
+    assert 1 <= stats["peak_active"] <= 5000
+
+
+def test_serialization_is_timed_for_large_responses_only(api):
+    login(api, ADMIN)
+    api.post("/api/debug/perf", params={"enabled": True, "reset": True})
+    try:
+        assert api.get("/api/server/events").status_code == 200
+        assert api.get("/api/server/schedules").status_code == 200
+        routes = api.post("/api/debug/perf", params={"enabled": False}).json()["routes"]
+    finally:
+        perf.enabled = False
+    assert "serialization" in routes["GET /api/server/events"]["spans"]
+    assert "serialization" not in routes["GET /api/server/schedules"]["spans"]
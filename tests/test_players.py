@@ -0,0 +1,45 @@
+from log_events import KIND_IDS, parse_line
+from players import PlayerRegistry
+
+
+def event(message):
+    return parse_line(f"[12:34:56] [Server thread/INFO]: {message}")
+
+
+def test_feedback_from_console_and_rcon_has_no_player():
+    for source in ("Rcon", "Server"):
+        kind, _, _, player, _, message = event(f"[{source}: Set the time to 1000]")
+        assert kind == KIND_IDS["command"]
+        assert player is None
+        assert message == "Set the time to 1000"
+    assert event("[@: Set the weather to clear]")[3] is None
+    assert event("[Alice: Set the time to 1000]")[3] == "Alice"
+
+
+def test_only_joined_or_listed_names_are_players(tmp_path):
+    registry = PlayerRegistry(str(tmp_path / "players.db"))
+    registry.handle(event("[Server: Saved the game]"), ts=1)
+    registry.handle(event("[Rcon: Set the time to 1000]"), ts=1)
+    registry.handle(event("[Notch: Gave 1 [Diamond] to Notch]"), ts=1)
+    assert len(registry) == 0
+
+    registry.handle(event("Alice joined the game"), ts=2)
+    registry.handle(event("<Alice> hi"), ts=3)
+    registry.handle(event("[Alice: Set the time to 1000]"), ts=4)
+    registry.reconcile("There are 2 of a max of 20 players online: Alice, Bob", ts=5)
+    registry.handle(event("Bob issued server command: /spawn"), ts=6)
+
+    assert sorted(registry.players) == ["alice", "bob"]
+    assert registry.get("alice")["chat_messages"] == 1
+    assert registry.get("alice")["commands"] == 1
+    assert registry.get("bob")["commands"] == 1
+
+
+def test_feedback_only_records_are_dropped_on_load(tmp_path):
+    path = str(tmp_path / "players.db")
+    registry = PlayerRegistry(path)
+    registry.handle(event("Alice joined the game"), ts=1)
+    registry._record("Rcon", 1).commands += 1
+    registry.flush()
+
+    assert sorted(PlayerRegistry(path).players) == ["alice"]
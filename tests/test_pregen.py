@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from pregen import ChunkPregenerator, PregenError, PregenRequest, format_command, spiral_chunk
+
+
+def pregenerator(tmp_path, mspt=None, command=None):
+    async def ok(_):
+        return ""
+
+    return ChunkPregenerator(str(tmp_path / "pregen.json"), command or ok, lambda: True, lambda: 0,
+                             lambda: mspt, min_delay=0.5, max_delay=8.0, poll_interval=0.01)
+
+
+def test_spiral_walks_rings_without_gaps():
+    assert [spiral_chunk(i) for i in range(9)] == [
+        (0, 0), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+    for k in range(1, 30):
+        ring = [spiral_chunk(i) for i in range((2 * k - 1) ** 2, (2 * k + 1) ** 2)]
+        assert len(set(ring)) == 8 * k
+        assert all(max(abs(x), abs(z)) == k for x, z in ring)
+        # Each chunk is next to the one before it
+        for (x1, z1), (x2, z2) in zip(ring, ring[1:]):
+            assert abs(x1 - x2) + abs(z1 - z2) == 1
+
+
+def test_chunks_cover_the_square_around_the_center(tmp_path):
+    gen = pregenerator(tmp_path)
+    gen.job = {"request": PregenRequest(center_x=160, center_z=-40, radius=32).model_dump(), "total": 25}
+    chunks = gen._chunks(0, 100)
+    assert len(chunks) == 25
+    assert set(chunks) == {(x, z) for x in range(8, 13) for z in range(-5, 0)}
+    assert gen._chunks(20, 10) == chunks[20:]
+
+
+def throttled(tmp_path, mspt, batch=16, delay=1.0, lag_events=0):
+    gen = pregenerator(tmp_path, mspt)
+    gen.job = {"request": PregenRequest(radius=64, batch=16, max_batch=18, target_mspt=40).model_dump(),
+               "batch": batch, "delay": delay}
+    gen._lag_events = lag_events
+    gen._throttle()
+    return gen
+
+
+def test_throttle_backs_off_on_lag(tmp_path):
+    gen = throttled(tmp_path, mspt=45.0)
+    assert (gen.job["batch"], gen.job["delay"]) == (8, 2.0)
+    # A lag warning counts even when the tick time looks fine, and is consumed
+    gen = throttled(tmp_path, mspt=10.0, lag_events=2)
+    assert (gen.job["batch"], gen.job["delay"]) == (8, 2.0)
+    assert gen._lag_events == 0
+    # The batch never drops below one chunk and the pause stays within its bounds
+    assert throttled(tmp_path, mspt=45.0, batch=1, delay=6.0).job == {**gen.job, "batch": 1, "delay": 8.0}
+    assert throttled(tmp_path, mspt=45.0, delay=0.5).job["delay"] == 1.0
+
+
+def test_throttle_speeds_up_when_there_is_headroom(tmp_path):
+    gen = throttled(tmp_path, mspt=20.0)
+    assert (gen.job["batch"], gen.job["delay"]) == (17, 0.8)
+    gen = throttled(tmp_path, mspt=None, batch=18, delay=0.55)
+    assert (gen.job["batch"], gen.job["delay"]) == (18, 0.5)
+    # Between 80% and 100% of the target nothing changes
+    gen = throttled(tmp_path, mspt=35.0)
+    assert (gen.job["batch"], gen.job["delay"]) == (16, 1.0)
+
+
+@pytest.mark.parametrize("template", ["tp {player} {x} {z}", "gen {0}", "gen {x", "gen {x.real.bad}", "gen {x:q}"])
+def test_invalid_command_templates_are_rejected(template):
+    with pytest.raises(ValidationError):
+        PregenRequest(radius=64, method="command", command=template)
+    with pytest.raises(PregenError):
+        format_command(template, 1, 2, "minecraft:overworld")
+
+
+def test_command_template():
+    request = PregenRequest(radius=64, method="command", command="chunky {dimension} {block_x} {block_z} {{x}}")
+    assert format_command(request.command, 2, -3, "minecraft:overworld") == "chunky minecraft:overworld 32 -48 {x}"
+
+
+def test_bad_template_fails_the_job_instead_of_retrying(tmp_path):
+    gen = pregenerator(tmp_path)
+
+    async def run():
+        gen.create(PregenRequest(radius=16, settle=0))
+        # A job saved by an older version with a template that was never checked
+        gen.job["request"].update(method="command", command="gen {player}")
+        await asyncio.wait_for(gen._task, 5)
+
+    asyncio.run(run())
+    assert gen.job["status"] == "failed"
+    assert "player" in gen.job["error"]
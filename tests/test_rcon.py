@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from rcon import MAX_RESPONSE_FRAGMENT, RconAuthError, RconClient, RconConnection
+from tools.fake_rcon import FakeRconServer
+
+
+def with_server(test, **kwargs):
+    async def run():
+        server = FakeRconServer(**kwargs)
+        port = await server.start()
+        try:
+            return await test(server, port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [0, 10, MAX_RESPONSE_FRAGMENT - 1, MAX_RESPONSE_FRAGMENT,
+                                  MAX_RESPONSE_FRAGMENT + 1, 2 * MAX_RESPONSE_FRAGMENT, 10000])
+def test_multi_packet_responses(size):
+    async def test(server, port):
+        connection = RconConnection("127.0.0.1", port, "secret", 5.0)
+        await connection.connect()
+        try:
+            response = await connection.command(f"big {size}")
+            # The connection stays in step: the next answer is not a leftover fragment
+            assert await connection.command("echo next") == "next"
+            return response
+        finally:
+            await connection.close()
+
+    assert with_server(test) == "x" * size
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_batch_keeps_responses_apart(pipelined):
+    commands = ["echo a", f"big {MAX_RESPONSE_FRAGMENT}", "echo b", "big 9000", "list"]
+
+    async def test(server, port):
+        connection = RconConnection("127.0.0.1", port, "secret", 5.0)
+        await connection.connect()
+        try:
+            return [response for response, _ in await connection.batch(commands, pipelined)]
+        finally:
+            await connection.close()
+
+    assert with_server(test) == ["a", "x" * MAX_RESPONSE_FRAGMENT, "b", "x" * 9000,
+                                 "There are 2 of a max of 20 players online: Steve, Alex"]
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_character_split_between_packets(pipelined):
+    # "я" is two bytes in UTF-8: the first ends one packet, the second starts the next
+    text = "x" * (MAX_RESPONSE_FRAGMENT - 1) + "я конец"
+    assert len(text[:MAX_RESPONSE_FRAGMENT].encode("utf-8")) == MAX_RESPONSE_FRAGMENT + 1
+
+    async def test(server, port):
+        connection = RconConnection("127.0.0.1", port, "secret", 5.0)
+        await connection.connect()
+        try:
+            single = await connection.command("text")
+            return [single] + [response for response, _ in await connection.batch(["text", "text"], pipelined)]
+        finally:
+            await connection.close()
+
+    assert with_server(test, handler=lambda command: text) == [text] * 3
+
+
+def test_wrong_password():
+    async def test(server, port):
+        connection = RconConnection("127.0.0.1", port, "wrong", 5.0)
+        with pytest.raises(RconAuthError):
+            await connection.connect()
+        assert not connection.connected
+
+    with_server(test)
+
+
+def test_client_pool_reuses_connections():
+    async def test(server, port):
+        client = RconClient("127.0.0.1", port, "secret", pool_size=2)
+        try:
+            responses = await asyncio.gather(*(client.command(f"echo {i}") for i in range(20)))
+        finally:
+            await client.close()
+        assert responses == [str(i) for i in range(20)]
+        assert server.connections <= 2
+        assert client.health()["commands_sent"] == 20
+
+    with_server(test)
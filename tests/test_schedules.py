@@ -0,0 +1,54 @@
+import json
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from schedules import ScheduleError, ScheduledTask, TaskScheduler
+
+
+def scheduler(path):
+    async def execute(task):
+        return "ok"
+
+    async def broadcast(message):
+        pass
+
+    return TaskScheduler(str(path), execute, broadcast, lambda: 0)
+
+
+@pytest.mark.parametrize("message", ["{action} через {time} на {server}", "{0}", "{action", "{time:q}"])
+def test_invalid_countdown_message(message):
+    with pytest.raises(ValidationError):
+        ScheduledTask(cron="@daily", action="save", countdown_message=message)
+
+
+def test_countdown_message():
+    task = ScheduledTask(cron="@daily", action="restart", countdown=[10, 60, 60],
+                         countdown_message="{{Сервер}} {action}: {time}")
+    assert task.countdown == [60, 10]
+
+
+def test_crud_is_saved(tmp_path):
+    path = tmp_path / "schedules.json"
+    schedules = scheduler(path)
+
+    async def run():
+        created = await schedules.create(ScheduledTask(id="nightly", cron="0 4 * * *", action="restart"))
+        assert created["id"] == "nightly"
+        with pytest.raises(ScheduleError):
+            await schedules.create(ScheduledTask(id="nightly", cron="@daily", action="save"))
+        generated = await schedules.create(ScheduledTask(cron="@hourly", action="save"))
+        assert await schedules.update("nightly", ScheduledTask(cron="0 5 * * *", action="restart"))
+        assert await schedules.update("missing", ScheduledTask(cron="@daily", action="save")) is None
+        assert await schedules.delete(generated["id"])
+        assert not await schedules.delete(generated["id"])
+
+    asyncio.run(run())
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert [(task["id"], task["cron"]) for task in saved["tasks"]] == [("nightly", "0 5 * * *")]
+
+    reloaded = scheduler(path)
+    reloaded.load()
+    assert list(reloaded.tasks) == ["nightly"]
+    assert "created" in reloaded.state["nightly"]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import state_store
+from state_store import SqliteTTLStore, TokenBucketLimiter, TTLStore
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(state_store.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteTTLStore(str(tmp_path / "state.db"), "test")
+    return TTLStore()
+
+
+def test_values_expire(store, clock):
+    async def run():
+        await store.set("a", {"x": 1}, 10)
+        assert await store.get("a") == {"x": 1}
+        clock.now += 9.9
+        assert await store.get("a") == {"x": 1}
+        clock.now += 0.2
+        assert await store.get("a") is None
+
+        await store.set("b", 1, 5)
+        await store.set("c", 2, 50)
+        clock.now += 10
+        assert store.purge() >= 1
+        assert len(store) == 1
+        assert await store.pop("c") == 2
+        assert await store.pop("c") is None
+
+    asyncio.run(run())
+
+
+def test_memory_store_evicts_least_recently_used(clock):
+    store = TTLStore(max_size=3)
+
+    async def run():
+        for key in "abc":
+            await store.set(key, key, 60)
+        await store.get("a")
+        await store.set("d", "d", 60)
+        return [await store.get(key) for key in "abcd"]
+
+    assert asyncio.run(run()) == ["a", None, "c", "d"]
+
+
+def test_token_bucket(store, clock):
+    limiter = TokenBucketLimiter(store, rate=1, burst=2, global_rate=10, global_burst=3)
+
+    async def run():
+        assert [await limiter.acquire("alice") for _ in range(3)] == [True, True, False]
+        # The global bucket has one token left, and a refused user isn't charged
+        assert await limiter.acquire("bob")
+        assert not await limiter.acquire("carol")
+        clock.now += 0.1
+        assert await limiter.acquire("carol")
+        # One token per second for alice
+        clock.now += 0.5
+        assert not await limiter.acquire("alice")
+        clock.now += 0.5
+        assert await limiter.acquire("alice")
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("rate, burst, global_rate, global_burst", [
+    (0, 1, 20, 40), (-1, 1, 20, 40), (1, 1, 0, 40), (1, 0.5, 20, 40), (1, 1, 20, 0)])
+def test_token_bucket_rejects_unusable_limits(rate, burst, global_rate, global_burst):
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(TTLStore(), rate, burst, global_rate, global_burst)
@@ -0,0 +1,88 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from static_assets import IMMUTABLE, REVALIDATE, StaticAssets, accepted_encodings, etag_matches, hashed_name
+
+SCRIPT = "console.log('hello');\n" * 40
+
+
+def request(**headers):
+    return Request({"type": "http", "method": "GET", "path": "/",
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "img").mkdir()
+    (tmp_path / "app.js").write_text(SCRIPT)
+    (tmp_path / "img" / "logo.svg").write_text("<svg/>")
+    (tmp_path / "index.html").write_text('<script src="/static/app.js"></script><img src="/img/logo.svg">'
+                                         '<a href="/static/missing.js">')
+    assets = StaticAssets(str(tmp_path), {"/static": "", "/img": "img"})
+    assets.load()
+    return assets
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+    ("br;q=0, gzip;q=0.5", {"gzip"}),
+    ("gzip; q=0.0, BR", {"br"}),
+    ("gzip;q=abc", set()),
+    ("", set()),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def test_etag_matches_any_representation():
+    assert etag_matches('"abc"', "abc")
+    assert etag_matches('"other", W/"abc-gzip"', "abc")
+    assert etag_matches("*", "abc")
+    assert not etag_matches('"abcd"', "abc")
+    assert not etag_matches("", "abc")
+
+
+def test_encoding_selection(assets):
+    plain = assets.response(request(), "app.js")
+    assert plain.body == SCRIPT.encode()
+    assert "content-encoding" not in plain.headers
+
+    compressed = assets.response(request(accept_encoding="gzip"), "app.js")
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(compressed.body) == SCRIPT.encode()
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.headers["vary"] == "Accept-Encoding"
+
+    # Refused with q=0, so the identity body is sent
+    refused = assets.response(request(accept_encoding="gzip;q=0"), "app.js")
+    assert "content-encoding" not in refused.headers
+    assert refused.body == SCRIPT.encode()
+
+    # Too small to be worth compressing
+    assert "content-encoding" not in assets.response(request(accept_encoding="gzip"), "img/logo.svg").headers
+
+
+def test_not_modified(assets):
+    etag = assets.response(request(accept_encoding="gzip"), "app.js").headers["etag"]
+    response = assets.response(request(if_none_match=etag), "app.js")
+    assert response.status_code == 304
+    assert response.body == b""
+    assert assets.response(request(if_none_match='"0123456789abcdef"'), "app.js").status_code == 200
+
+
+def test_cache_headers(assets):
+    digest = assets.files["app.js"][0].digest
+    assert assets.response(request(), "app.js").headers["cache-control"] == REVALIDATE
+    assert assets.response(request(), hashed_name("app.js", digest)).headers["cache-control"] == IMMUTABLE
+    assert assets.response(request(), "nothing.js").status_code == 404
+
+
+def test_pages_refer_to_hashed_names(assets):
+    script = hashed_name("app.js", assets.files["app.js"][0].digest)
+    logo = hashed_name("logo.svg", assets.files["img/logo.svg"][0].digest)
+    page = assets.response(request(), "index.html")
+    assert page.headers["cache-control"] == REVALIDATE
+    assert page.body.decode() == (f'<script src="/static/{script}"></script><img src="/img/{logo}">'
+                                  '<a href="/static/missing.js">')
@@ -0,0 +1,113 @@
+import sys
+import time
+import asyncio
+
+from log_buffer import LogRingBuffer
+from supervisor import CRASHED, RUNNING, STARTING, STOPPED, ServerSupervisor
+
+# Stands in for the server: loads for a moment, then waits for "stop" on the console.
+# "crash" exits on its own; "stubborn" ignores the stop command
+SERVER = """
+import sys, time
+mode = sys.argv[1]
+print("Starting minecraft server", flush=True)
+time.sleep(0.2)
+print('[Server thread/INFO]: Done (0.2s)! For help, type "help"', flush=True)
+if mode == "crash":
+    sys.exit(3)
+for line in sys.stdin:
+    if line.strip() == "stop" and mode != "stubborn":
+        print("Stopping server", flush=True)
+        break
+"""
+
+
+def supervisor(tmp_path, mode="normal", **kwargs):
+    script = tmp_path / "server.py"
+    script.write_text(SERVER)
+    return ServerSupervisor(str(tmp_path), LogRingBuffer(capacity=100),
+                            lambda: [sys.executable, str(script), mode], **kwargs)
+
+
+def test_start_ready_and_stop(tmp_path):
+    readiness = []
+    sup = supervisor(tmp_path, on_ready=readiness.append)
+
+    async def run():
+        await sup.start()
+        assert sup.state == STARTING
+        assert sup.status()["pid"] == sup.process.pid
+        assert await sup.wait_ready(10)
+        assert sup.state == RUNNING
+        status = sup.status()
+        assert 0.2 <= status["startup_seconds"] < 10
+        assert status["uptime_seconds"] is not None
+
+        # The event loop keeps running while the server shuts down
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        await sup.stop(timeout=10)
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 0
+    assert sup.state == STOPPED
+    assert sup.status()["uptime_seconds"] is None
+    assert sup.last_exit_code == 0
+    assert readiness and readiness[0] >= 0.2
+    assert [line for _, line in sup.output.tail(10)][-1] == "Stopping server"
+
+
+def test_stop_escalates_to_terminate(tmp_path):
+    sup = supervisor(tmp_path, "stubborn")
+
+    async def run():
+        await sup.start()
+        await sup.wait_ready(10)
+        started = time.monotonic()
+        await sup.stop(timeout=0.3, terminate_timeout=5)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 5
+    assert sup.state == STOPPED
+    assert sup.last_exit_code != 0
+
+
+def test_crash_is_restarted_with_backoff(tmp_path):
+    sup = supervisor(tmp_path, "crash", min_restart_delay=0.1, max_restart_delay=0.2)
+
+    async def run():
+        await sup.start()
+        first = sup.process
+        await sup._monitor_task
+        assert sup.state == CRASHED
+        assert sup.last_exit_code == 3
+        assert sup._restart_delay == 0.1
+        # The restart comes after the delay, without being asked for
+        await asyncio.sleep(0.5)
+        assert sup.process is not first
+        await sup.shutdown()
+
+    asyncio.run(run())
+    assert sup.crash_count >= 1
+    assert sup.state == STOPPED
+
+
+def test_crash_without_auto_restart_stays_down(tmp_path):
+    sup = supervisor(tmp_path, "crash", auto_restart=False)
+
+    async def run():
+        await sup.start()
+        await sup._monitor_task
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert sup.state == CRASHED
+    assert sup._restart_task is None
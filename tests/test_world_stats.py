@@ -0,0 +1,116 @@
+import os
+import gzip
+import zlib
+import struct
+import asyncio
+
+import pytest
+
+from region import HEADER_BYTES, INHABITED_TIME_TAG, SECTOR_BYTES, chunk_locations, inhabited_time, region_coords
+from world_stats import WorldAnalyzer, analyze_region
+
+
+def nbt(ticks):
+    """Enough of a chunk's NBT to hold its InhabitedTime."""
+    return b"\x0a\x00\x00\x03\x00\x0bDataVersion\x00\x00\x0d\x05" + INHABITED_TIME_TAG + struct.pack(">q", ticks)
+
+
+def region(chunks, corrupt=0):
+    """A region file; chunks are (index, saved, payload, compression) stored one sector each."""
+    header = bytearray(HEADER_BYTES)
+    body = b""
+    for number, (index, saved, payload, compression) in enumerate(chunks):
+        header[index * 4:index * 4 + 4] = ((2 + number) << 8 | 1).to_bytes(4, "big")
+        header[SECTOR_BYTES + index * 4:SECTOR_BYTES + index * 4 + 4] = saved.to_bytes(4, "big")
+        data = {1: gzip.compress, 2: zlib.compress, 3: bytes}[compression](payload)
+        body += ((len(data) + 1).to_bytes(4, "big") + bytes([compression]) + data).ljust(SECTOR_BYTES, b"\x00")
+    for number in range(corrupt):
+        # Points past the end of the file
+        header[(1000 + number) * 4:(1000 + number) * 4 + 4] = (500 << 8 | 1).to_bytes(4, "big")
+    return bytes(header) + body
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_region_helpers():
+    assert region_coords("r.-1.2.mca") == (-1, 2)
+    assert region_coords("r.1.2.mcc") is None
+    assert region_coords("r.a.2.mca") is None
+    assert inhabited_time(nbt(1234)) == 1234
+    assert inhabited_time(b"no tag here") is None
+    assert [index for index, _, _ in chunk_locations(region([(5, 0, b"", 3), (900, 0, b"", 3)]))] == [5, 900]
+
+
+def test_analyze_region(tmp_path):
+    path = str(tmp_path / "r.0.0.mca")
+    write(path, region([(0, 1000, nbt(10), 2), (1, 3000, nbt(500), 1), (2, 2000, nbt(0), 3),
+                        (3, 0, b"garbage", 2)], corrupt=1))
+
+    stats = analyze_region(path, 0)
+    assert stats == {"chunks": 4, "sectors": 4, "data_bytes": stats["data_bytes"], "oldest": 1000,
+                     "newest": 3000, "corrupt": 1}
+    # Without a threshold the chunks are not decompressed
+    assert "unreadable" not in stats
+
+    stats = analyze_region(path, 100)
+    assert (stats["inhabited_below"], stats["max_inhabited"], stats["unreadable"]) == (2, 500, 1)
+
+    empty = str(tmp_path / "r.1.0.mca")
+    write(empty, b"")
+    assert analyze_region(empty, 100)["chunks"] == 0
+
+
+@pytest.fixture
+def server_dir(tmp_path):
+    world = tmp_path / "world"
+    # Visited region, a barely visited one with its entities, and the nether
+    write(str(world / "region" / "r.0.0.mca"), region([(0, 100, nbt(50000), 2), (1, 200, nbt(10), 2)]))
+    write(str(world / "region" / "r.-1.0.mca"), region([(0, 300, nbt(10), 2), (1, 400, nbt(0), 2)]))
+    write(str(world / "entities" / "r.-1.0.mca"), region([(0, 300, b"entities", 2)]))
+    write(str(world / "region" / "notes.txt"), b"not a region")
+    write(str(tmp_path / "world_nether" / "DIM-1" / "region" / "r.0.0.mca"), region([(0, 50, nbt(0), 2)]))
+    return str(tmp_path)
+
+
+def test_world_report_and_pruning(server_dir):
+    analyzer = WorldAnalyzer(server_dir)
+    report = asyncio.run(analyzer.analyze())
+    assert report["totals"]["regions"] == 4
+    assert report["totals"]["chunks"] == 6
+    assert (report["totals"]["oldest"], report["totals"]["newest"]) == (50, 400)
+    assert {d["path"]: d["chunks"] for d in report["directories"]} == {
+        "world/entities": 1, "world/region": 4, "world_nether/DIM-1/region": 1}
+    assert "pruning" not in report
+    assert all("unreadable" not in r for r in report["regions"])
+
+    report = asyncio.run(analyzer.analyze(inhabited_below=1000))
+    pruning = report["pruning"]
+    # The nether region qualifies as well; the visited overworld region does not
+    assert [c["path"] for c in pruning["candidates"]] == ["world/region/r.-1.0.mca",
+                                                          "world_nether/DIM-1/region/r.0.0.mca"]
+    candidate = pruning["candidates"][0]
+    assert candidate["related"] == ["world/entities/r.-1.0.mca"]
+    assert candidate["size"] == 2 * (HEADER_BYTES + SECTOR_BYTES) + SECTOR_BYTES
+
+
+def test_unchanged_regions_come_from_the_cache(server_dir):
+    analyzer = WorldAnalyzer(server_dir)
+
+    async def run():
+        first = await analyzer.analyze()
+        second = await analyzer.analyze()
+        write(os.path.join(server_dir, "world", "region", "r.0.0.mca"), region([(0, 900, nbt(1), 2)]))
+        third = await analyzer.analyze()
+        # Header statistics serve a threshold query only if they were read with that threshold
+        fourth = await analyzer.analyze(inhabited_below=5)
+        return first, second, third, fourth
+
+    first, second, third, fourth = asyncio.run(run())
+    assert (first["analyzed"], first["cached"]) == (4, 0)
+    assert (second["analyzed"], second["cached"]) == (0, 4)
+    assert (third["analyzed"], third["totals"]["newest"]) == (1, 900)
+    assert fourth["analyzed"] == 4
@@ -0,0 +1,60 @@
+"""Throughput benchmark for the structured log parser.
+
+    python tools/bench_log_parser.py --lines 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_events import EventStore  # noqa: E402
+
+PLAYERS = [f"Player{i}" for i in range(200)]
+TEMPLATES = [
+    (40, "[{t}] [Server thread/INFO]: <{p}> hello there, anyone up for the nether?"),
+    (25, "[{t}] [Server thread/INFO]: Saving chunks for level 'ServerLevel[world]'/minecraft:overworld"),
+    (8, "[{t}] [Server thread/INFO]: {p} joined the game"),
+    (8, "[{t}] [Server thread/INFO]: {p} left the game"),
+    (6, "[{t}] [Server thread/INFO]: {p} issued server command: /home base"),
+    (5, "[{t}] [Server thread/INFO]: [{p}: Set the time to 1000]"),
+    (4, "[{t}] [Server thread/WARN]: Can't keep up! Is the server overloaded? Running 2345ms or 46 ticks behind"),
+    (3, "[{t}] [Worker-Main-3/ERROR]: Failed to load chunk at [12, -4]"),
+    (1, "\tat net.minecraft.server.MinecraftServer.run(MinecraftServer.java:123)"),
+]
+
+
+def synthetic_log(count: int):
+    weights = [w for w, _ in TEMPLATES]
+    templates = [t for _, t in TEMPLATES]
+    rng = random.Random(42)
+    lines = []
+    for i in range(count):
+        seconds = i * 86400 // count
+        t = f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        lines.append(rng.choices(templates, weights)[0].format(t=t, p=rng.choice(PLAYERS)) + "\n")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=1000000)
+    args = parser.parse_args()
+
+    lines = synthetic_log(args.lines)
+    store = EventStore(capacity=args.lines)
+
+    started = time.perf_counter()
+    stored = store.feed_many(lines)
+    elapsed = time.perf_counter() - started
+    print(f"parsed {len(lines)} lines in {elapsed:.2f}s: {len(lines) / elapsed:,.0f} lines/sec ({stored} events)")
+
+    started = time.perf_counter()
+    events = store.query(kinds=["lag"], limit=1000)
+    print(f"query newest 1000 lag events: {(time.perf_counter() - started) * 1000:.1f}ms ({len(events)} found)")
+
+
+if __name__ == "__main__":
+    main()
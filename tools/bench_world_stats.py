@@ -0,0 +1,142 @@
+"""Benchmark of the region file analyzer on a synthetic multi-GB world.
+
+Writes a world of full 1024-chunk regions (chunk data is random, so it
+doesn't compress away), then times WorldAnalyzer with every worker count,
+header-only and with the InhabitedTime scan, and once more from its cache:
+
+    python tools/bench_world_stats.py --gigabytes 4 --workers 1 2 4 8
+
+Pass --dir to keep the generated world and reuse it on the next run.
+"""
+import os
+import sys
+import time
+import zlib
+import random
+import shutil
+import struct
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from region import CHUNKS_PER_REGION, COMPRESSION_ZLIB, HEADER_BYTES, SECTOR_BYTES  # noqa: E402
+from world_stats import WorldAnalyzer  # noqa: E402
+
+REGION_SIDE = 32
+VARIANTS = 64  # distinct chunks per kind; regions are assembled from them
+
+
+def chunk_nbt(rng: random.Random, inhabited: int, payload: int) -> bytes:
+    """A root compound with DataVersion, InhabitedTime and a byte array standing in for the sections."""
+    name = lambda text: struct.pack(">H", len(text)) + text.encode()  # noqa: E731
+    return (b"\x0a" + name("")
+            + b"\x03" + name("DataVersion") + struct.pack(">i", 3465)
+            + b"\x07" + name("sections") + struct.pack(">i", payload) + rng.randbytes(payload)
+            + b"\x04" + name("InhabitedTime") + struct.pack(">q", inhabited)
+            + b"\x00")
+
+
+def chunk_variants(rng: random.Random, inhabited: bool):
+    """Chunks as stored in a region: length, compression type and data, padded to whole sectors."""
+    variants = []
+    for _ in range(VARIANTS):
+        ticks = rng.randint(0, 2_000_000) if inhabited else rng.randint(0, 200)
+        data = zlib.compress(chunk_nbt(rng, ticks, rng.randint(2000, 9000)), 1)
+        stored = struct.pack(">IB", len(data) + 1, COMPRESSION_ZLIB) + data
+        sectors = -(-len(stored) // SECTOR_BYTES)
+        variants.append((stored.ljust(sectors * SECTOR_BYTES, b"\0"), sectors))
+    return variants
+
+
+def write_region(path: str, rng: random.Random, variants) -> int:
+    locations = bytearray(SECTOR_BYTES)
+    timestamps = bytearray(SECTOR_BYTES)
+    now = int(time.time())
+    body = []
+    sector = HEADER_BYTES // SECTOR_BYTES
+    for index in range(CHUNKS_PER_REGION):
+        stored, sectors = rng.choice(variants)
+        struct.pack_into(">I", locations, index * 4, sector << 8 | sectors)
+        struct.pack_into(">I", timestamps, index * 4, now - rng.randint(0, 90 * 86400))
+        body.append(stored)
+        sector += sectors
+    with open(path, "wb") as f:
+        f.write(locations)
+        f.write(timestamps)
+        f.writelines(body)
+    return sector * SECTOR_BYTES
+
+
+def generate_world(server_dir: str, gigabytes: float, unvisited: float) -> int:
+    """Fill <server_dir>/world/region up to the size; returns the bytes written."""
+    region_dir = os.path.join(server_dir, "world", "region")
+    os.makedirs(region_dir, exist_ok=True)
+    rng = random.Random(42)
+    visited, barren = chunk_variants(rng, True), chunk_variants(rng, False)
+    target = int(gigabytes * 1024 ** 3)
+    written = 0
+    index = 0
+    while written < target:
+        x, z = index % REGION_SIDE - REGION_SIDE // 2, index // REGION_SIDE - REGION_SIDE // 2
+        variants = barren if rng.random() < unvisited else visited
+        written += write_region(os.path.join(region_dir, f"r.{x}.{z}.mca"), rng, variants)
+        index += 1
+    return written
+
+
+async def timed(analyzer: WorldAnalyzer, inhabited_below: int):
+    started = time.perf_counter()
+    report = await analyzer.analyze(inhabited_below)
+    return time.perf_counter() - started, report
+
+
+async def run(server_dir: str, workers_list, inhabited_below: int, size: int):
+    for workers in workers_list:
+        for threshold in (0, inhabited_below):
+            analyzer = WorldAnalyzer(server_dir, workers=workers)
+            analyzer.start()
+            try:
+                elapsed, report = await timed(analyzer, threshold)
+                cached, _ = await timed(analyzer, threshold)
+            finally:
+                await analyzer.stop()
+            totals = report["totals"]
+            mode = "headers" if threshold == 0 else f"InhabitedTime < {threshold}"
+            extra = ""
+            if "pruning" in report:
+                pruning = report["pruning"]
+                extra = f", {len(pruning['candidates'])} candidates ({pruning['size'] / 1024 ** 2:,.0f} MiB)"
+            print(f"workers={workers} {mode}: {totals['regions']} regions, {totals['chunks']:,} chunks "
+                  f"in {elapsed:.2f}s ({size / 1024 ** 2 / elapsed:,.0f} MiB/s){extra}; "
+                  f"cached {cached * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gigabytes", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--inhabited-below", type=int, default=1200)
+    parser.add_argument("--unvisited", type=float, default=0.3, help="share of regions nobody spent time in")
+    parser.add_argument("--dir", help="server directory to generate the world in and keep")
+    args = parser.parse_args()
+
+    server_dir = args.dir or tempfile.mkdtemp(prefix="bench-world-")
+    try:
+        region_dir = os.path.join(server_dir, "world", "region")
+        if os.path.isdir(region_dir) and os.listdir(region_dir):
+            size = sum(os.path.getsize(os.path.join(region_dir, name)) for name in os.listdir(region_dir))
+            print(f"reusing {size / 1024 ** 3:.2f} GiB world in {server_dir}")
+        else:
+            started = time.perf_counter()
+            size = generate_world(server_dir, args.gigabytes, args.unvisited)
+            print(f"generated {size / 1024 ** 3:.2f} GiB world in {time.perf_counter() - started:.1f}s")
+        asyncio.run(run(server_dir, args.workers, args.inhabited_below, size))
+    finally:
+        if not args.dir:
+            shutil.rmtree(server_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
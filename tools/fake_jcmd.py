@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Local stand-in for the JDK's jcmd, printing Thread.print, GC.heap_info and
+GC.class_histogram output of an imaginary lagging server.
+
+Point the API at it instead of a real JDK:
+    JCMD_PATH=tools/fake_jcmd.py
+
+Heap use and a few classes grow with the clock, so two captures a few
+seconds apart have something to diff. FAKE_JCMD_DELAY makes every command
+take that many seconds, FAKE_JCMD_FAIL makes it fail like a JVM that can't
+be attached to.
+
+Capture, rate-limit, prune and diff with LagDiagnostics against itself:
+    python tools/fake_jcmd.py --selftest
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diagnostics import LagDiagnostics  # noqa: E402
+
+MAIN_STACK = [
+    "net.minecraft.world.level.levelgen.NoiseBasedChunkGenerator.doFill(NoiseBasedChunkGenerator.java:312)",
+    "net.minecraft.world.level.levelgen.NoiseBasedChunkGenerator.fillFromNoise(NoiseBasedChunkGenerator.java:290)",
+    "net.minecraft.server.level.ChunkMap.scheduleChunkGeneration(ChunkMap.java:640)",
+    "net.minecraft.server.level.ServerChunkCache.getChunk(ServerChunkCache.java:198)",
+    "net.minecraft.server.level.ServerLevel.tick(ServerLevel.java:352)",
+    "net.minecraft.server.MinecraftServer.tickChildren(MinecraftServer.java:1005)",
+    "net.minecraft.server.MinecraftServer.tickServer(MinecraftServer.java:889)",
+    "net.minecraft.server.MinecraftServer.runServer(MinecraftServer.java:702)",
+    "java.lang.Thread.run(java.base@17.0.8/Thread.java:833)",
+]
+OTHER_THREADS = [
+    ("Reference Handler", "RUNNABLE",
+     ["java.lang.ref.Reference.waitForReferencePendingList(java.base@17.0.8/Native Method)"]),
+    ("Worker-Main-1", "WAITING", ["jdk.internal.misc.Unsafe.park(java.base@17.0.8/Native Method)",
+                                  "java.util.concurrent.locks.LockSupport.park(java.base@17.0.8/LockSupport.java:341)"]),
+    ("Worker-Main-2", "WAITING", ["jdk.internal.misc.Unsafe.park(java.base@17.0.8/Native Method)"]),
+    ("IO-Worker-3", "TIMED_WAITING", ["java.lang.Thread.sleep(java.base@17.0.8/Native Method)"]),
+    ("Netty Epoll Server IO #0", "RUNNABLE", ["io.netty.channel.epoll.Native.epollWait(Native Method)"]),
+    ("RCON Listener #1", "RUNNABLE", ["sun.nio.ch.Net.accept(java.base@17.0.8/Native Method)"]),
+]
+# class, instances, bytes per instance, growth per minute
+CLASSES = [
+    ("[B (java.base@17.0.8)", 2400000, 96, 40000),
+    ("[J (java.base@17.0.8)", 310000, 400, 9000),
+    ("net.minecraft.world.level.chunk.LevelChunkSection", 420000, 64, 6000),
+    ("net.minecraft.world.level.chunk.PalettedContainer", 840000, 32, 12000),
+    ("java.lang.String (java.base@17.0.8)", 1900000, 24, 0),
+    ("java.util.HashMap$Node (java.base@17.0.8)", 1200000, 32, 0),
+    ("net.minecraft.core.BlockPos", 800000, 24, -3000),
+    ("net.minecraft.world.entity.item.ItemEntity", 15000, 240, 2000),
+]
+
+
+def thread_dump(pid: int) -> str:
+    lines = [f"{pid}:", time.strftime("%Y-%m-%d %H:%M:%S"),
+             "Full thread dump OpenJDK 64-Bit Server VM (17.0.8+7 mixed mode, sharing):", ""]
+    threads = [("Server thread", "RUNNABLE", MAIN_STACK)] + OTHER_THREADS
+    for number, (name, state, stack) in enumerate(threads, start=10):
+        lines.append(f'"{name}" #{number} prio=5 os_prio=0 cpu=1234.56ms elapsed=3600.00s '
+                     f'tid=0x00007f{number:010x} nid=0x{number:x} {state.lower()}  [0x00007f00deadbeef]')
+        lines.append(f"   java.lang.Thread.State: {state}")
+        lines += [f"\tat {frame}" for frame in stack]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def heap_info(pid: int) -> str:
+    used = 2_000_000 + int(time.time() * 1000) % 600_000
+    return (f"{pid}:\n"
+            f" garbage-first heap   total 5120000K, used {used}K [0x00000006c0000000, 0x0000000800000000)\n"
+            f"  region size 4096K, 300 young (1228800K), 20 survivors (81920K)\n"
+            f" Metaspace       used 150000K, committed 152000K, reserved 1179648K\n")
+
+
+def class_histogram(pid: int) -> str:
+    minutes = (time.time() % 3600) / 60
+    rows = []
+    for name, instances, size, growth in CLASSES:
+        count = max(0, instances + int(growth * minutes))
+        rows.append((name, count, count * size))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    lines = [f"{pid}:", " num     #instances         #bytes  class name (module)",
+             "-------------------------------------------------------"]
+    lines += [f"{i:4d}: {count:13d} {size:14d}  {name}" for i, (name, count, size) in enumerate(rows, start=1)]
+    lines.append(f"Total {sum(row[1] for row in rows):13d} {sum(row[2] for row in rows):14d}")
+    return "\n".join(lines) + "\n"
+
+
+COMMANDS = {"Thread.print": thread_dump, "GC.heap_info": heap_info, "GC.class_histogram": class_histogram}
+
+
+def jcmd(pid: int, command: str) -> int:
+    time.sleep(float(os.getenv("FAKE_JCMD_DELAY", "0")))
+    if os.getenv("FAKE_JCMD_FAIL"):
+        print(f"{pid}:\ncom.sun.tools.attach.AttachNotSupportedException: Unable to open socket file")
+        return 1
+    if command not in COMMANDS:
+        print(f"{pid}:\njava.lang.IllegalArgumentException: Unknown diagnostic command {command}")
+        return 1
+    sys.stdout.write(COMMANDS[command](pid))
+    return 0
+
+
+async def selftest():
+    with tempfile.TemporaryDirectory() as store:
+        diagnostics = LagDiagnostics(os.path.abspath(__file__), store, os.getpid, interval=3600, keep=2)
+        # The first warning captures, the next ones are rate-limited
+        for behind_ms in (5000, 8000, 9000):
+            diagnostics.on_lag(behind_ms)
+        await diagnostics._task
+        print(f"after lag warnings: {len(diagnostics.list()['captures'])} capture, "
+              f"{diagnostics.suppressed} suppressed")
+        for _ in range(2):
+            await asyncio.sleep(1.1)
+            diagnostics.capture()
+            await diagnostics._task
+        listing = diagnostics.list()
+        print(f"kept {len(listing['captures'])} captures (keep=2):",
+              ", ".join(capture["id"] for capture in listing["captures"]))
+        newest, older = listing["captures"][0], listing["captures"][1]
+        summary = diagnostics.get(newest["id"])["summary"]
+        print(f"threads: {summary['threads']['states']}, main thread {summary['threads']['main_thread']['state']} "
+              f"{summary['threads']['main_thread']['frames'][0]}")
+        print(f"heap used: {summary['heap']['used_bytes'] / 1024 ** 2:.0f} MB, "
+              f"stored {newest['bytes']} bytes compressed")
+        diff = diagnostics.diff(older["id"], newest["id"])
+        print(f"heap used delta: {diff['heap_used_delta']} bytes; grown: "
+              + ", ".join(f"{change['class']} {change['bytes_delta']:+d}" for change in diff["grown"][:3]))
+
+
+def main():
+    # Called like jcmd, whose command options ("-all") argparse would take for its own
+    args = sys.argv[1:]
+    if args == ["--selftest"]:
+        asyncio.run(selftest())
+    elif len(args) >= 2 and args[0].isdigit():
+        sys.exit(jcmd(int(args[0]), args[1]))
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
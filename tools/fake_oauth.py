@@ -0,0 +1,144 @@
+"""Local stub OpenID Connect provider for testing the login flow without Google.
+
+It approves every authorization request as --email, issues RS256-signed ID
+tokens (POST /rotate switches to a new signing key) and counts the requests
+each endpoint receives (GET /stats):
+
+    python tools/fake_oauth.py --port 9000
+
+and point the API at it:
+
+    google_discovery_url=http://127.0.0.1:9000/.well-known/openid-configuration
+    google_client_id=test-client  google_client_secret=test-secret
+    google_redirect_uri=http://127.0.0.1:8000/auth/callback
+"""
+import time
+import secrets
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode
+
+import jwt
+import uvicorn
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+# Like Google, the previous key stays published for a while after a rotation
+PUBLISHED_KEYS = 2
+
+
+class SigningKeys:
+    """RSA keys the provider signs with; the newest one signs, older ones are still published."""
+
+    def __init__(self, bits: int = 2048):
+        self.bits = bits
+        self.keys: List[Tuple[str, Any]] = []  # (kid, private key), newest first
+        self.rotate()
+
+    def rotate(self) -> str:
+        kid = secrets.token_hex(8)
+        key = rsa.generate_private_key(public_exponent=65537, key_size=self.bits)
+        self.keys = [(kid, key)] + self.keys[:PUBLISHED_KEYS - 1]
+        return kid
+
+    def jwks(self) -> Dict[str, Any]:
+        keys = []
+        for kid, key in self.keys:
+            jwk = jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key(), as_dict=True)
+            keys.append({**jwk, "alg": "RS256", "use": "sig", "kid": kid})
+        return {"keys": keys}
+
+    def sign(self, claims: Dict[str, Any], kid: Optional[str] = None, key: Any = None) -> str:
+        """Sign with the current key, or with `key` under `kid` to forge tokens in tests."""
+        current_kid, current_key = self.keys[0]
+        return jwt.encode(claims, key or current_key, algorithm="RS256",
+                          headers={"kid": kid or current_kid, "typ": "JWT"})
+
+
+def create_app(issuer: str, email: str, client_id: str, client_secret: str, bits: int = 2048) -> FastAPI:
+    app = FastAPI(title="Fake OpenID provider")
+    keys = app.state.keys = SigningKeys(bits)
+    codes = {}
+    stats = Counter()
+    profile = {"sub": "1234567890", "email": email, "email_verified": True, "name": email.split("@")[0],
+               "picture": f"{issuer}/picture.png"}
+    # What /userinfo answers; tests swap in other shapes, e.g. Google's v2 userinfo with verified_email
+    app.state.userinfo = dict(profile)
+    cache = {"Cache-Control": "public, max-age=3600"}
+
+    @app.get("/.well-known/openid-configuration")
+    async def discovery():
+        stats["discovery"] += 1
+        return JSONResponse({
+            "issuer": issuer,
+            "authorization_endpoint": f"{issuer}/auth",
+            "token_endpoint": f"{issuer}/token",
+            "userinfo_endpoint": f"{issuer}/userinfo",
+            "jwks_uri": f"{issuer}/jwks",
+            "id_token_signing_alg_values_supported": ["RS256"],
+        }, headers=cache)
+
+    @app.get("/jwks")
+    async def jwks():
+        stats["jwks"] += 1
+        return JSONResponse(keys.jwks(), headers=cache)
+
+    @app.post("/rotate")
+    async def rotate():
+        stats["rotate"] += 1
+        return JSONResponse({"kid": keys.rotate()})
+
+    @app.get("/auth")
+    async def authorize(redirect_uri: str, state: str, scope: str = ""):
+        stats["auth"] += 1
+        code = secrets.token_urlsafe(16)
+        codes[code] = scope.split()
+        return RedirectResponse(f"{redirect_uri}?{urlencode({'code': code, 'state': state})}")
+
+    @app.post("/token")
+    async def token(request: Request):
+        stats["token"] += 1
+        form = {k: v[0] for k, v in parse_qs((await request.body()).decode()).items()}
+        if form.get("client_id") != client_id or form.get("client_secret") != client_secret:
+            return JSONResponse({"error": "invalid_client"}, status_code=401)
+        scopes = codes.pop(form.get("code"), None)
+        if scopes is None:
+            return JSONResponse({"error": "invalid_grant", "error_description": "Unknown code"}, status_code=400)
+        response = {"access_token": secrets.token_urlsafe(24), "token_type": "Bearer", "expires_in": 3599}
+        if "openid" in scopes:
+            now = int(time.time())
+            response["id_token"] = keys.sign({"iss": issuer, "aud": client_id, "iat": now, "exp": now + 3600,
+                                              **profile})
+        return JSONResponse(response)
+
+    @app.get("/userinfo")
+    async def userinfo():
+        stats["userinfo"] += 1
+        return JSONResponse(app.state.userinfo)
+
+    @app.get("/stats")
+    async def get_stats():
+        return JSONResponse(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--email", default="player@example.com")
+    parser.add_argument("--client-id", default="test-client")
+    parser.add_argument("--client-secret", default="test-secret")
+    parser.add_argument("--bits", type=int, default=2048, help="RSA key size")
+    args = parser.parse_args()
+
+    issuer = f"http://{args.host}:{args.port}"
+    uvicorn.run(create_app(issuer, args.email, args.client_id, args.client_secret, args.bits),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
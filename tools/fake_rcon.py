@@ -0,0 +1,152 @@
+"""Local fake Minecraft RCON server for manual testing and latency benchmarks.
+
+Run a server for the API to talk to:
+    python tools/fake_rcon.py --port 25575 --password secret
+
+Compare the pooled client with connect-per-command:
+    python tools/fake_rcon.py --bench 1000
+"""
+import os
+import sys
+import time
+import struct
+import asyncio
+import argparse
+from typing import Callable, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rcon import (  # noqa: E402
+    MAX_RESPONSE_FRAGMENT, PACKET_AUTH, PACKET_COMMAND, PACKET_RESPONSE,
+    RconClient, RconConnection, decode_body, encode_packet, read_packet
+)
+
+
+def default_handler(command: str) -> str:
+    """Answer a few commands roughly like a vanilla server does."""
+    name = command.split(" ", 1)[0].lstrip("/")
+    if name == "list":
+        return "There are 2 of a max of 20 players online: Steve, Alex"
+    if name == "echo":
+        return command[5:]
+    if name == "big":
+        # Large response that has to be split over several packets
+        return "x" * int(command.split(" ", 1)[1])
+    return f"Unknown or incomplete command: {command}"
+
+
+class FakeRconServer:
+    """Speaks the RCON protocol like the vanilla server: one request at a time,
+    responses split into 4096-byte packets, invalid packet types answered with
+    'Unknown request'."""
+
+    def __init__(self, password: str = "secret", handler: Callable[[str], str] = default_handler,
+                 delay: float = 0.0):
+        self.password = password
+        self.handler = handler
+        self.delay = delay
+        self.connections = 0
+        self.commands = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _send_response(self, writer: asyncio.StreamWriter, request_id: int, body: str):
+        data = body.encode("utf-8")
+        offset = 0
+        while True:
+            # Split on bytes like the vanilla server, even inside a multi-byte character
+            writer.write(encode_packet(request_id, PACKET_RESPONSE, data[offset:offset + MAX_RESPONSE_FRAGMENT]))
+            offset += MAX_RESPONSE_FRAGMENT
+            if offset >= len(data):
+                break
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        authenticated = False
+        try:
+            while True:
+                request_id, packet_type, data = await read_packet(reader)
+                body = decode_body([data])
+                if packet_type == PACKET_AUTH:
+                    authenticated = body == self.password
+                    writer.write(encode_packet(request_id if authenticated else -1, PACKET_COMMAND, ""))
+                    await writer.drain()
+                elif not authenticated:
+                    writer.write(encode_packet(-1, PACKET_COMMAND, ""))
+                    await writer.drain()
+                elif packet_type == PACKET_COMMAND:
+                    self.commands += 1
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    await self._send_response(writer, request_id, self.handler(body))
+                else:
+                    await self._send_response(writer, request_id, f"Unknown request {packet_type:x}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def bench(count: int) -> Dict[str, float]:
+    server = FakeRconServer()
+    port = await server.start()
+    results = {}
+
+    started = time.perf_counter()
+    for _ in range(count):
+        connection = RconConnection("127.0.0.1", port, "secret", 5.0)
+        await connection.connect()
+        await connection.command("list")
+        await connection.close()
+    results["connect_per_command_ms"] = (time.perf_counter() - started) * 1000 / count
+
+    client = RconClient("127.0.0.1", port, "secret", pool_size=2)
+    await client.command("list")
+    started = time.perf_counter()
+    for _ in range(count):
+        await client.command("list")
+    results["pooled_sequential_ms"] = (time.perf_counter() - started) * 1000 / count
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client.command("list") for _ in range(count)))
+    results["pooled_concurrent_ms"] = (time.perf_counter() - started) * 1000 / count
+
+    assert len(await client.command("big 10000")) == 10000
+    await client.close()
+    await server.stop()
+    return results
+
+
+async def serve(host: str, port: int, password: str):
+    server = FakeRconServer(password)
+    await server.start(host, port)
+    print(f"Fake RCON server listening on {host}:{port}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=25575)
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--bench", type=int, metavar="N", help="run N commands per mode and print latencies")
+    args = parser.parse_args()
+
+    if args.bench:
+        for name, value in asyncio.run(bench(args.bench)).items():
+            print(f"{name}: {value:.3f}")
+    else:
+        asyncio.run(serve(args.host, args.port, args.password))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Load test of the API with a varying number of uvicorn workers behind the supervisor daemon.
+
+Starts daemon.py once, then for every worker count starts uvicorn, hammers one
+endpoint with an authenticated session from several client processes and
+prints the throughput:
+
+    python tools/load_test.py --workers 1 2 4 --seconds 10 --path /api/server/status
+"""
+import os
+import sys
+import json
+import time
+import base64
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+
+import httpx
+from itsdangerous import TimestampSigner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = "load-test-secret"
+EMAIL = "load@test.local"
+
+
+def session_cookie() -> str:
+    """Sign a session cookie the same way Starlette's SessionMiddleware does."""
+    data = base64.b64encode(json.dumps({"user": {"email": EMAIL, "name": "Load", "picture": ""}}).encode())
+    return TimestampSigner(SECRET).sign(data).decode()
+
+
+async def hammer(url: str, seconds: float, concurrency: int):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    headers = {"Cookie": f"session={session_cookie()}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code >= 400:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args):
+    return asyncio.run(hammer(*args))
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def run(workers: int, env: dict, args) -> dict:
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers), "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    try:
+        base = f"http://127.0.0.1:{args.port}"
+        wait_until_up(base + "/api/user")
+        url = base + args.path
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client_process, [(url, args.seconds, args.concurrency)] * args.clients)
+    finally:
+        api.send_signal(signal.SIGINT)
+        api.wait(30)
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    errors = sum(count for _, count in results)
+    if not latencies:
+        return {"workers": workers, "rps": 0.0, "p50_ms": None, "p99_ms": None, "errors": errors}
+    return {
+        "workers": workers,
+        "rps": len(latencies) / args.seconds,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per client process")
+    parser.add_argument("--path", default="/api/server/status")
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="mc-load-")
+    env = dict(
+        os.environ,
+        DATA_DIR=data_dir,
+        SUPERVISOR_SOCKET=os.path.join(data_dir, "supervisor.sock"),
+        SESSION_SECRET=SECRET,
+        AUTHORIZED_USERS=EMAIL,
+    )
+    daemon = subprocess.Popen([sys.executable, "daemon.py"], cwd=ROOT, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while not os.path.exists(env["SUPERVISOR_SOCKET"]):
+            if time.monotonic() > deadline or daemon.poll() is not None:
+                raise RuntimeError("Supervisor daemon did not start")
+            time.sleep(0.2)
+
+        print(f"{'workers':>7} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for workers in args.workers:
+            result = run(workers, env, args)
+            p50 = f"{result['p50_ms']:.1f}" if result["p50_ms"] is not None else "-"
+            p99 = f"{result['p99_ms']:.1f}" if result["p99_ms"] is not None else "-"
+            print(f"{workers:>7} {result['rps']:>10.0f} {p50:>8} {p99:>8} {result['errors']:>7}")
+    finally:
+        daemon.send_signal(signal.SIGTERM)
+        daemon.wait(30)
+
+
+if __name__ == "__main__":
+    main()
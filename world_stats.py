@@ -0,0 +1,220 @@
+import os
+import gzip
+import mmap
+import time
+import zlib
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from region import (
+    CHUNK_PREFIX_BYTES, HEADER_BYTES, SECTOR_BYTES, chunk_locations, decompress_chunk, inhabited_time,
+    region_coords, world_names
+)
+
+logger = logging.getLogger("minecraft-server-api")
+
+# Terrain regions; entities/ and poi/ hold region files with the same names and coordinates
+TERRAIN_DIR = "region"
+
+# Region statistics that are only collected when chunks are read for InhabitedTime
+INHABITED_KEYS = ("inhabited_below", "max_inhabited", "unreadable")
+
+RegionStats = Dict[str, Any]
+
+
+def analyze_region(path: str, inhabited_below: int) -> RegionStats:
+    """Chunk count, sizes and save times of one region file (runs in a worker process).
+
+    Only the header tables and the 5-byte prefix of every chunk are read
+    through the memory map. With inhabited_below > 0 the chunks are also
+    decompressed to count those players spent fewer ticks in.
+    """
+    stats: RegionStats = {"chunks": 0, "sectors": 0, "data_bytes": 0, "oldest": None, "newest": None,
+                          "corrupt": 0}
+    if inhabited_below > 0:
+        stats.update(dict.fromkeys(INHABITED_KEYS, 0))
+
+    size = os.path.getsize(path)
+    if size < HEADER_BYTES:
+        # The server leaves empty regions behind as 0-byte files
+        return stats
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as region:
+        header = region[:HEADER_BYTES]
+        for index, offset, count in chunk_locations(header):
+            start = offset * SECTOR_BYTES
+            if start + CHUNK_PREFIX_BYTES > size:
+                stats["corrupt"] += 1
+                continue
+            length = int.from_bytes(region[start:start + 4], "big")
+            compression = region[start + 4]
+            stats["chunks"] += 1
+            stats["sectors"] += count
+            stats["data_bytes"] += 4 + length
+
+            saved = int.from_bytes(header[SECTOR_BYTES + index * 4:SECTOR_BYTES + index * 4 + 4], "big")
+            if saved:
+                stats["oldest"] = saved if stats["oldest"] is None else min(stats["oldest"], saved)
+                stats["newest"] = saved if stats["newest"] is None else max(stats["newest"], saved)
+
+            if inhabited_below > 0:
+                # The length counts the compression byte
+                try:
+                    nbt = decompress_chunk(compression, region[start + CHUNK_PREFIX_BYTES:start + 4 + length])
+                except (zlib.error, gzip.BadGzipFile, EOFError):
+                    nbt = None
+                ticks = inhabited_time(nbt) if nbt is not None else None
+                if ticks is None:
+                    stats["unreadable"] += 1
+                    continue
+                stats["max_inhabited"] = max(stats["max_inhabited"], ticks)
+                if ticks < inhabited_below:
+                    stats["inhabited_below"] += 1
+    return stats
+
+
+def _add_totals(totals: Dict[str, Any], stats: RegionStats):
+    for key in ("regions", "chunks", "size", "data_bytes", "free_bytes"):
+        totals[key] = totals.get(key, 0) + (1 if key == "regions" else stats[key])
+    for key, pick in (("oldest", min), ("newest", max)):
+        if stats[key] is not None:
+            totals[key] = stats[key] if totals.get(key) is None else pick(totals[key], stats[key])
+
+
+class WorldAnalyzer:
+    """Size and chunk statistics of the server's region files, read in a process pool.
+
+    Results are kept per region file by size and mtime, so after the first
+    analysis only the regions the server has saved since are read again.
+    Regions whose every chunk has an InhabitedTime below a threshold are
+    reported as pruning candidates: players have barely been there and the
+    server would generate them again the same way.
+    """
+
+    def __init__(self, server_dir: str, workers: int = 4):
+        self.server_dir = server_dir
+        self.workers = workers
+        # relative path -> ((size, mtime_ns, inhabited_below), stats)
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], RegionStats]] = {}
+        # One analysis at a time; a second request then mostly reads the cache
+        self._lock = asyncio.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _region_files(self) -> List[Tuple[str, int, int]]:
+        """(relative path, size, mtime_ns) of every region file of every dimension."""
+        files = []
+        for world in world_names(self.server_dir):
+            for root, _, names in os.walk(os.path.join(self.server_dir, world)):
+                for name in names:
+                    if region_coords(name) is None:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue  # deleted while walking
+                    files.append((os.path.relpath(path, self.server_dir).replace(os.sep, "/"),
+                                  st.st_size, st.st_mtime_ns))
+        return files
+
+    async def analyze(self, inhabited_below: int = 0) -> Dict[str, Any]:
+        async with self._lock:
+            started = time.monotonic()
+            loop = asyncio.get_running_loop()
+            files = await asyncio.to_thread(self._region_files)
+
+            cache: Dict[str, Tuple[Tuple[int, int, int], RegionStats]] = {}
+            stale = []
+            for rel_path, size, mtime_ns in files:
+                key = (size, mtime_ns, inhabited_below)
+                cached = self._cache.get(rel_path)
+                # Header statistics don't depend on the InhabitedTime threshold they were read with
+                if cached is not None and cached[0][:2] == key[:2] and inhabited_below in (0, cached[0][2]):
+                    cache[rel_path] = cached
+                else:
+                    stale.append((rel_path, key))
+            results = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, analyze_region,
+                                     os.path.join(self.server_dir, rel_path), inhabited_below)
+                for rel_path, _ in stale
+            ), return_exceptions=True)
+            for (rel_path, key), stats in zip(stale, results):
+                if isinstance(stats, Exception):
+                    logger.error(f"Error analyzing region {rel_path}: {str(stats)}")
+                    continue
+                cache[rel_path] = (key, stats)
+            self._cache = cache
+
+            report = self._report(inhabited_below)
+            report["analyzed"] = len(stale)
+            report["cached"] = len(files) - len(stale)
+            report["seconds"] = round(time.monotonic() - started, 3)
+            return report
+
+    def _report(self, inhabited_below: int) -> Dict[str, Any]:
+        regions = []
+        directories: Dict[str, Dict[str, Any]] = {}
+        totals: Dict[str, Any] = {"regions": 0, "chunks": 0, "size": 0, "data_bytes": 0, "free_bytes": 0,
+                                  "oldest": None, "newest": None}
+        for rel_path, ((size, mtime_ns, _), stats) in sorted(self._cache.items()):
+            directory, name = rel_path.rsplit("/", 1)
+            x, z = region_coords(name)
+            # Space the file takes beyond its header and the sectors its chunks use
+            free_bytes = max(0, size - HEADER_BYTES - stats["sectors"] * SECTOR_BYTES) if size else 0
+            region = {"path": rel_path, "x": x, "z": z, "size": size, "modified": mtime_ns / 1e9,
+                      "free_bytes": free_bytes, **stats}
+            if inhabited_below == 0:
+                for key in INHABITED_KEYS:
+                    region.pop(key, None)
+            regions.append(region)
+            if directory not in directories:
+                directories[directory] = {"path": directory, "world": rel_path.split("/", 1)[0],
+                                          "kind": directory.rsplit("/", 1)[-1]}
+            _add_totals(directories[directory], region)
+            _add_totals(totals, region)
+
+        report = {
+            "totals": totals,
+            "directories": list(directories.values()),
+            "regions": sorted(regions, key=lambda r: r["size"], reverse=True),
+        }
+        if inhabited_below > 0:
+            report["pruning"] = self._candidates(regions, inhabited_below)
+        return report
+
+    @staticmethod
+    def _candidates(regions: List[RegionStats], inhabited_below: int) -> Dict[str, Any]:
+        by_path = {region["path"]: region for region in regions}
+        candidates = []
+        for region in regions:
+            directory, name = region["path"].rsplit("/", 1)
+            if directory.rsplit("/", 1)[-1] != TERRAIN_DIR or not region["chunks"]:
+                continue
+            if region["unreadable"] or region["corrupt"] or region["inhabited_below"] < region["chunks"]:
+                continue
+            # The entity and point-of-interest regions of the same area go together with the terrain
+            parent = directory.rsplit("/", 1)[0] if "/" in directory else ""
+            related = [path for path in (f"{parent}/{kind}/{name}".lstrip("/") for kind in ("entities", "poi"))
+                       if path in by_path]
+            candidates.append({
+                "path": region["path"], "x": region["x"], "z": region["z"], "chunks": region["chunks"],
+                "max_inhabited": region["max_inhabited"], "newest": region["newest"],
+                "related": related,
+                "size": region["size"] + sum(by_path[path]["size"] for path in related),
+            })
+        candidates.sort(key=lambda c: c["size"], reverse=True)
+        return {
+            "inhabited_below": inhabited_below,
+            "candidates": candidates,
+            "size": sum(c["size"] for c in candidates),
+        }